@@ -3,6 +3,7 @@ Attachment management service.
 """
 import uuid
 import database
+import response_cache
 from typing import List, Dict, Optional
 
 def create_attachment(
@@ -41,6 +42,8 @@ def create_attachment(
             related_to_id
         )
     )
+    if related_to_type == 'edge':
+        response_cache.invalidate(edges=[related_to_id])
     
     return attachment_id
 
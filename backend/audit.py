@@ -1,22 +1,213 @@
 import database
+import atexit
 import json
+import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-def log_action(action: str, actor: str, target_id: str, details: dict):
+# "async": records go through AuditWriter; "sync": every call inserts inline
+AUDIT_WRITER_MODE = os.environ.get("AUDIT_WRITER", "async")
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 1000
+# How long the writer waits for more records before committing a batch
+AUDIT_FLUSH_INTERVAL = 0.2
+
+INSERT_SQL = "INSERT INTO audit_logs (action, actor, target_id, details, timestamp) VALUES (?, ?, ?, ?, ?)"
+
+Record = Tuple[str, str, str, str, str]
+
+logger = logging.getLogger(__name__)
+
+class _Flush:
+    """Queue marker: set once every record queued before it is committed."""
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+class AuditWriter:
+    """
+    Background thread that commits queued audit records in batches, one
+    transaction per batch. The queue is bounded, so producers block rather
+    than grow memory when the database falls behind.
+    """
+
+    def __init__(self, max_queue: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 interval: float = AUDIT_FLUSH_INTERVAL):
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        # Records queued or being written, not yet committed
+        self.pending = 0
+        self.max_depth = 0
+        self.flushes = 0
+        self.records_written = 0
+        self.records_failed = 0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[str] = None
+        self.durable_waits = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def submit(self, records: List[Record], wait: bool = False):
+        """Queue records; with `wait`, return only once they are committed."""
+        self._start()
+        with self.lock:
+            self.pending += len(records)
+        for record in records:
+            self.queue.put(record)
+        with self.lock:
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+            if wait:
+                self.durable_waits += 1
+        if wait:
+            self._wait(raise_errors=True)
+
+    def _wait(self, raise_errors: bool):
+        marker = _Flush()
+        self.queue.put(marker)
+        marker.done.wait()
+        if raise_errors and marker.error is not None:
+            raise marker.error
+
+    def flush(self, raise_errors: bool = False):
+        """
+        Block until everything queued so far has been written. Failed batches
+        are counted in stats() and logged; `raise_errors` re-raises the error
+        of the batch that completed this flush, if it failed.
+        """
+        if self.thread is not None and self.pending:
+            self._wait(raise_errors)
+
+    def _run(self):
+        while True:
+            batch: List[Record] = []
+            markers: List[_Flush] = []
+            item = self.queue.get()
+            deadline = time.monotonic() + self.interval
+            while True:
+                if isinstance(item, _Flush):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                # A waiting caller means commit what is already queued, now
+                timeout = 0 if markers else deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._write(batch, markers)
+
+    def _write(self, batch: List[Record], markers: List[_Flush]):
+        error = None
+        started = time.perf_counter()
+        if batch:
+            try:
+                with database.transaction():
+                    database.executemany_db(INSERT_SQL, batch)
+                self.records_written += len(batch)
+            except Exception as e:
+                error = e
+                self.records_failed += len(batch)
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.last_error_at = datetime.utcnow().isoformat()
+                logger.error("Audit writer failed to commit %d records: %s", len(batch), e)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+        with self.lock:
+            self.pending -= len(batch)
+        for marker in markers:
+            marker.error = error
+            marker.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": AUDIT_WRITER_MODE,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "queue_capacity": self.queue.maxsize,
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "records_written": self.records_written,
+            "records_failed": self.records_failed,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "durable_waits": self.durable_waits,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else None,
+            "max_flush_ms": round(self.max_flush_ms, 2)
+        }
+
+_writer = AuditWriter()
+
+def _write_records(records: List[Record], durable: bool):
+    if AUDIT_WRITER_MODE != "async":
+        database.executemany_db(INSERT_SQL, records)
+    elif database.in_transaction():
+        if durable:
+            # Commits atomically with the action it records
+            database.executemany_db(INSERT_SQL, records)
+        else:
+            # Queued only if the action commits
+            database.on_commit(lambda: _writer.submit(records))
+    else:
+        # Group commit: concurrent durable callers share the writer's transaction
+        _writer.submit(records, wait=durable)
+
+def log_action(action: str, actor: str, target_id: str, details: dict, durable: bool = True):
     """
     Logs an immutable audit record.
+    `durable` records (user and regulated actions) are committed before
+    this returns, or with the enclosing transaction; others, such as
+    system ingestion, are written asynchronously by the audit writer.
     """
-    database.execute_db(
-        "INSERT INTO audit_logs (action, actor, target_id, details, timestamp) VALUES (?, ?, ?, ?, ?)",
-        (action, actor, target_id, json.dumps(details), datetime.utcnow().isoformat())
-    )
+    _write_records([(action, actor, target_id, json.dumps(details), datetime.utcnow().isoformat())], durable)
+
+def log_actions(entries: Iterable[Tuple[str, str, str, dict]], durable: bool = True):
+    """
+    Logs many audit records in one statement.
+    Each entry is (action, actor, target_id, details).
+    """
+    timestamp = datetime.utcnow().isoformat()
+    records = [(action, actor, target_id, json.dumps(details), timestamp) for action, actor, target_id, details in entries]
+    if records:
+        _write_records(records, durable)
+
+def flush(raise_errors: bool = False):
+    """Wait for queued records to be written (see AuditWriter.flush)."""
+    _writer.flush(raise_errors)
+
+def get_writer_stats() -> Dict[str, Any]:
+    return _writer.stats()
 
 def get_logs_for_node(node_id: str):
     """
     Fetches audit logs for a specific entity.
     """
+    # Include records still queued by this process
+    flush()
     rows = database.query_db(
-        "SELECT * FROM audit_logs WHERE target_id = ? ORDER BY timestamp DESC", 
+        "SELECT * FROM audit_logs WHERE target_id = ? ORDER BY timestamp DESC",
         (node_id,)
     )
     return [dict(row) for row in rows]
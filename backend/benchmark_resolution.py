@@ -0,0 +1,84 @@
+"""
+Benchmark vendor resolution on a synthetic vendor set.
+
+Compares resolve_vendor-style lookups in a loop (blocked and exhaustive)
+with the batched cdist path, checks that all three agree and reports
+check_blocking_recall for the blocked lookups.
+
+Usage:
+    python benchmark_resolution.py --vendors 100000 --names 2000
+"""
+import argparse
+import random
+import time
+
+import resolution
+
+PREFIXES = ["Ace", "Premier", "Elite", "Pro", "Summit", "Urban", "Metro", "North", "South", "Pacific",
+            "Atlantic", "Golden", "Iron", "Stone", "Cedar", "River", "Valley", "Coastal", "Allied", "United"]
+TRADES = ["Steel", "Concrete", "Electric", "Plumbing", "Roofing", "Landscaping", "Equipment", "Drywall",
+          "Paving", "Excavation", "Glass", "Masonry", "Framing", "HVAC", "Flooring", "Lumber", "Supply"]
+SUFFIXES = ["Inc", "LLC", "Ltd", "Co", "Corp", "Group", ""]
+
+def vendor_name(rng: random.Random) -> str:
+    name = f"{rng.choice(PREFIXES)} {rng.choice(PREFIXES)} {rng.choice(TRADES)} {rng.choice(SUFFIXES)}".strip()
+    return f"{name} {rng.randint(1, 999)}" if rng.random() < 0.5 else name
+
+def with_typos(rng: random.Random, name: str) -> str:
+    chars = list(name)
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.3:
+            chars.pop(i)
+        elif op < 0.6:
+            chars.insert(i, rng.choice("abcdefghijklmnop "))
+        else:
+            chars[i] = rng.choice("abcdefghijklmnop")
+    return "".join(chars)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch vs per-name vendor resolution.")
+    parser.add_argument("--vendors", type=int, default=100000)
+    parser.add_argument("--names", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = resolution.VendorIndex()
+    for i in range(args.vendors):
+        index.add(f"node:vendor:{i}", [vendor_name(rng)])
+    # Mostly misspelt existing vendors, plus some unseen ones
+    names = [with_typos(rng, rng.choice(index.keys)) for _ in range(args.names * 2 // 3)]
+    names += [vendor_name(rng) for _ in range(args.names - len(names))]
+    print(f"{len(index.choices)} vendor names, {len(names)} raw names")
+
+    timings = {}
+    started = time.perf_counter()
+    blocked = [index.best_match(name) for name in names]
+    timings["loop_blocked"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    exhaustive = [index.best_match(name, exhaustive=True) for name in names]
+    timings["loop_exhaustive"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = index.best_matches(names)
+    timings["batch_cdist"] = time.perf_counter() - started
+
+    for label, seconds in timings.items():
+        print(f"{label:16s} {seconds:8.2f}s  {len(names) / seconds:10.1f} names/s")
+
+    decisions = [resolution._classify(r)[:2] for r in exhaustive]
+    for label, results in (("loop_blocked", blocked), ("batch_cdist", batch)):
+        agree = sum(1 for r, d in zip(results, decisions) if resolution._classify(r)[:2] == d)
+        print(f"{label} agrees with exhaustive on {agree}/{len(names)} names")
+
+    recall = resolution.check_blocking_recall(names, index)
+    print(f"blocking recall {recall['recall']} ({recall['agree']}/{recall['checked']}), "
+          f"{recall['blocked_ms_per_query']} ms blocked vs {recall['exhaustive_ms_per_query']} ms exhaustive per name")
+    for mismatch in recall["mismatches"]:
+        print(f"  {mismatch}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Sequence-numbered node/edge changes for delta sync and live push.
+
+Triggers from migration M14 append a graph_changes row for every node or
+edge create, update, delete and merge, in the writing transaction. A
+client that remembers the last `seq` it applied asks for everything after
+it and gets each change with the entity's current state (None once
+deleted), in the same shape as /api/graph/nodes and /api/graph/edges.
+
+The log is pruned to the newest CHANGE_LOG_RETENTION rows every
+PRUNE_INTERVAL seconds while the server runs, whichever path did the
+writing; a client whose `since` fell off the end is told to `reset`
+(reload the graph).
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+import database
+
+DEFAULT_CHANGE_LIMIT = 1000
+MAX_CHANGE_LIMIT = 10000
+CHANGE_LOG_RETENTION = int(os.environ.get("CHANGE_LOG_RETENTION", "200000"))
+# SSE: how often to look for new rows, and how long to stay silent before a keep-alive
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+PRUNE_INTERVAL = float(os.environ.get("CHANGE_LOG_PRUNE_INTERVAL", "60"))
+
+def latest_seq() -> int:
+    row = database.query_db("SELECT MAX(seq) AS seq FROM graph_changes", one=True)
+    return row['seq'] or 0
+
+def _entity(row) -> Optional[Dict]:
+    if row['entity'] == 'node':
+        if row['node_type'] is None:
+            return None
+        return {"node_id": row['entity_id'], "type": row['node_type'], "attributes": json.loads(row['node_attributes'])}
+    if row['edge_type'] is None:
+        return None
+    return {
+        "edge_id": row['entity_id'],
+        "type": row['edge_type'],
+        "from_node": row['from_node_id'],
+        "to_node": row['to_node_id'],
+        "attributes": json.loads(row['edge_attributes'])
+    }
+
+def get_changes(since: int = 0, limit: int = DEFAULT_CHANGE_LIMIT) -> Dict:
+    """
+    Changes with seq > `since`, oldest first. Pass `last_seq` back as
+    `since`; `has_more` means another page is already waiting.
+    """
+    limit = max(1, min(limit, MAX_CHANGE_LIMIT))
+    # One read snapshot, so a prune between the two queries cannot hide a gap
+    with database.snapshot():
+        rows = database.query_db(
+            """
+            SELECT c.seq, c.entity, c.op, c.entity_id, c.created_at,
+                   n.type AS node_type, n.attributes AS node_attributes,
+                   e.type AS edge_type, e.from_node_id, e.to_node_id, e.attributes AS edge_attributes
+            FROM graph_changes c
+            LEFT JOIN nodes n ON c.entity = 'node' AND n.node_id = c.entity_id
+            LEFT JOIN edges e ON c.entity = 'edge' AND e.edge_id = c.entity_id
+            WHERE c.seq > ?
+            ORDER BY c.seq
+            LIMIT ?
+            """,
+            (since, limit + 1)
+        )
+        # Sequence numbers are never reused, so a gap after `since` means pruning
+        oldest = database.query_db("SELECT MIN(seq) AS seq FROM graph_changes", one=True)['seq']
+        reset = oldest is not None and oldest > since + 1
+    changes = [
+        {
+            "seq": row['seq'],
+            "entity": row['entity'],
+            "op": row['op'],
+            "id": row['entity_id'],
+            "at": row['created_at'],
+            "data": _entity(row)
+        }
+        for row in rows[:limit]
+    ]
+    return {
+        "changes": changes,
+        "last_seq": changes[-1]["seq"] if changes else max(since, 0),
+        "has_more": len(rows) > limit,
+        "reset": reset
+    }
+
+def prune(keep: int = CHANGE_LOG_RETENTION) -> int:
+    """Drop all but the newest `keep` changes; returns the number removed."""
+    return database.execute_db(
+        "DELETE FROM graph_changes WHERE seq <= (SELECT MAX(seq) FROM graph_changes) - ?", (keep,), rowcount=True
+    )
+
+async def prune_periodically(interval: float = PRUNE_INTERVAL):
+    """Prune every `interval` seconds until cancelled (started with the app)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(prune)
+        except Exception as e:
+            print(f"Change log prune failed: {e}")
+
+def _event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+async def stream_changes(since: Optional[int], is_disconnected: Callable) -> AsyncIterator[str]:
+    """
+    Server-Sent Events: one `changes` event per poll that found rows, with
+    the event id set to its last seq so EventSource resumes via
+    Last-Event-ID. Without `since` the stream starts at the current end.
+    """
+    if since is None:
+        since = await run_in_threadpool(latest_seq)
+    yield _event("ready", {"last_seq": since}, since)
+    idle = 0.0
+    while not await is_disconnected():
+        page = await run_in_threadpool(get_changes, since, MAX_CHANGE_LIMIT)
+        if page["reset"]:
+            yield _event("reset", {"last_seq": page["last_seq"]})
+        if page["changes"]:
+            since = page["last_seq"]
+            yield _event("changes", page, since)
+            idle = 0.0
+            if page["has_more"]:
+                continue
+        elif idle >= HEARTBEAT_INTERVAL:
+            yield ": keep-alive\n\n"
+            idle = 0.0
+        await asyncio.sleep(POLL_INTERVAL)
+        idle += POLL_INTERVAL
@@ -0,0 +1,3 @@
+# test_ingest.py, test_merge.py and test_m4_features.py are scripts that
+# drive a running server on :8002; the pytest suite lives in tests/
+collect_ignore = ["test_ingest.py", "test_merge.py", "test_m4_features.py"]
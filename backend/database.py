@@ -1,65 +1,388 @@
 import sqlite3
 import json
 import os
-from typing import Any
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
 
 DB_PATH = os.path.join(os.path.dirname(__file__), '../database/ontology.db')
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema.sql')
 MIGRATION_M2_PATH = os.path.join(os.path.dirname(__file__), 'migration_m2.sql')
 MIGRATION_M3_PATH = os.path.join(os.path.dirname(__file__), 'migration_m3.sql')
 MIGRATION_M4_PATH = os.path.join(os.path.dirname(__file__), 'migration_m4.sql')
+MIGRATION_M5_PATH = os.path.join(os.path.dirname(__file__), 'migration_m5.sql')
+MIGRATION_M6_PATH = os.path.join(os.path.dirname(__file__), 'migration_m6.sql')
+MIGRATION_M7_PATH = os.path.join(os.path.dirname(__file__), 'migration_m7.sql')
+MIGRATION_M8_PATH = os.path.join(os.path.dirname(__file__), 'migration_m8.sql')
+MIGRATION_M9_PATH = os.path.join(os.path.dirname(__file__), 'migration_m9.sql')
+MIGRATION_M10_PATH = os.path.join(os.path.dirname(__file__), 'migration_m10.sql')
+MIGRATION_M11_PATH = os.path.join(os.path.dirname(__file__), 'migration_m11.sql')
+MIGRATION_M12_PATH = os.path.join(os.path.dirname(__file__), 'migration_m12.sql')
+MIGRATION_M13_PATH = os.path.join(os.path.dirname(__file__), 'migration_m13.sql')
+MIGRATION_M14_PATH = os.path.join(os.path.dirname(__file__), 'migration_m14.sql')
+
+# Applied in order on every startup, so each must be idempotent
+MIGRATIONS = [
+    ("M2", MIGRATION_M2_PATH),  # Reconciliation
+    ("M3", MIGRATION_M3_PATH),  # Central Company + Views
+    ("M4", MIGRATION_M4_PATH),  # Attachments, Invoices, Proposals, Layouts
+    ("M5", MIGRATION_M5_PATH),  # Ingestion checkpoints
+    ("M6", MIGRATION_M6_PATH),  # Change counters for in-memory indexes
+    ("M7", MIGRATION_M7_PATH),  # Normalized vendor alias keys
+    ("M8", MIGRATION_M8_PATH),  # Indexed edge amount/date columns
+    ("M9", MIGRATION_M9_PATH),  # Node flow totals
+    ("M10", MIGRATION_M10_PATH),  # Change counters for the graph summary
+    ("M11", MIGRATION_M11_PATH),  # Edge indexes by amount
+    ("M12", MIGRATION_M12_PATH),  # Layout R*Tree
+    ("M13", MIGRATION_M13_PATH),  # Graph version for ETags
+    ("M14", MIGRATION_M14_PATH),  # Change log
+]
+
+# Connection tuning
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+CACHE_SIZE_KB = 64 * 1024          # 64 MiB page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024      # 256 MiB memory-mapped I/O
+
+def _configure_connection(conn: sqlite3.Connection):
+    """Apply the pragmas every connection should run with."""
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    # Rows removed by INSERT OR REPLACE must fire delete triggers (node_stats)
+    conn.execute("PRAGMA recursive_triggers = ON")
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        isolation_level=None
+    )
     conn.row_factory = sqlite3.Row
+    _configure_connection(conn)
     return conn
 
+class ConnectionPool:
+    """
+    Bounded pool of long-lived connections shared by the request threads.
+    Connections are opened lazily up to `size`; beyond that callers wait
+    for one to be released.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_time_ms": 0.0
+        }
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats["hits"] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                self._stats["misses"] += 1
+                create = True
+            else:
+                self._stats["waits"] += 1
+                create = False
+
+        if create:
+            try:
+                return get_db_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise sqlite3.OperationalError(
+                f"Timed out after {self.timeout}s waiting for a database connection"
+            )
+        with self._lock:
+            self._stats["wait_time_ms"] += (time.perf_counter() - started) * 1000
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["wait_time_ms"] = round(stats["wait_time_ms"], 3)
+            stats["size"] = self.size
+            stats["open"] = self._created
+            stats["idle"] = self._idle.qsize()
+            stats["in_use"] = self._created - stats["idle"]
+        return stats
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, recreating it if DB_PATH was repointed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool counters for /api/metrics."""
+    return get_pool().stats()
+
+_local = threading.local()
+
+@contextmanager
+def _connection():
+    """Yield this thread's transaction connection, or borrow one from the pool."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def transaction():
+    """
+    Unit of work. Every query_db/execute_db issued on this thread inside the
+    block runs on one connection and is committed once on exit, or rolled
+    back if the block raises. Nested blocks become savepoints, so an inner
+    failure can be caught without discarding the outer work.
+
+        with database.transaction() as tx:
+            tx.executemany(...)
+            audit.log_action(...)
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.depth += 1
+        savepoint = f"sp_{_local.depth}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        try:
+            yield conn
+            conn.execute(f"RELEASE {savepoint}")
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+            # Hooks registered inside the rolled-back savepoint never happened
+            _local.on_commit = [(d, fn) for d, fn in _local.on_commit if d < _local.depth]
+            raise
+        finally:
+            _local.depth -= 1
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    _local.depth = 0
+    _local.on_commit = []
+    committed = False
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+            committed = True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+    finally:
+        hooks = _local.on_commit
+        _local.conn = None
+        _local.on_commit = []
+        pool.release(conn)
+
+    if committed:
+        for _, fn in hooks:
+            fn()
+
+@contextmanager
+def snapshot():
+    """
+    Read-only unit of work: every query on this thread inside the block sees
+    the database as of its first read, so rows committed in between (a node
+    and the edges that reference it) are seen together or not at all.
+    Inside a transaction the transaction already is that view.
+    """
+    if in_transaction():
+        yield _local.conn
+        return
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    _local.depth = 0
+    _local.on_commit = []
+    try:
+        conn.execute("BEGIN")
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        _local.conn = None
+        _local.on_commit = []
+        pool.release(conn)
+
+def in_transaction() -> bool:
+    return getattr(_local, 'conn', None) is not None
+
+def on_commit(fn):
+    """
+    Run `fn` once the current transaction commits; dropped on rollback.
+    Outside a transaction the write has already been committed, so `fn`
+    runs immediately.
+    """
+    if in_transaction():
+        _local.on_commit.append((_local.depth, fn))
+    else:
+        fn()
+
+def _upgrade_legacy_invoices(conn: sqlite3.Connection):
+    """
+    The M1 schema shipped an `invoices` table without the M4 columns, which
+    made the M4 migration stop half-way. Move it out of the way so M4 can
+    create the detailed table.
+    """
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(invoices)")]
+    if not columns or 'source_id' in columns:
+        return
+    count = conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+    if count:
+        conn.execute("ALTER TABLE invoices RENAME TO invoices_legacy")
+        conn.execute("DROP INDEX IF EXISTS idx_invoices_vendor")
+    else:
+        conn.execute("DROP TABLE invoices")
+
+# Hot edge attributes as virtual generated columns: always in sync with the
+# JSON, whoever writes it, and indexable (see migration_m8.sql)
+EDGE_COLUMNS = [
+    ("amount", "REAL GENERATED ALWAYS AS (CAST(json_extract(attributes, '$.amount') AS REAL)) VIRTUAL"),
+    ("date", "TEXT GENERATED ALWAYS AS (json_extract(attributes, '$.date')) VIRTUAL"),
+    ("currency", "TEXT GENERATED ALWAYS AS (json_extract(attributes, '$.currency')) VIRTUAL"),
+    ("status", "TEXT GENERATED ALWAYS AS (json_extract(attributes, '$.status')) VIRTUAL"),
+]
+
+def _add_edge_columns(conn: sqlite3.Connection):
+    # table_xinfo, unlike table_info, lists generated columns
+    columns = {row['name'] for row in conn.execute("PRAGMA table_xinfo(edges)")}
+    for name, definition in EDGE_COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE edges ADD COLUMN {name} {definition}")
+
 def init_db():
     conn = get_db_connection()
-    
+    _upgrade_legacy_invoices(conn)
+
     # Apply Base Schema
     with open(SCHEMA_PATH, 'r') as f:
         schema = f.read()
     conn.executescript(schema)
-    
-    # Apply M2 Migration (Reconciliation)
-    try:
-        with open(MIGRATION_M2_PATH, 'r') as f:
-            migration = f.read()
-        conn.executescript(migration)
-    except Exception as e:
-        print(f"M2 Migration warning: {e}")
+    _add_edge_columns(conn)
 
-    # Apply M3 Migration (Central Company + Views)
-    try:
-        with open(MIGRATION_M3_PATH, 'r') as f:
-            migration = f.read()
-        conn.executescript(migration)
-    except Exception as e:
-        print(f"M3 Migration warning: {e}")
-
-    # Apply M4 Migration (Attachments, Invoices, Proposals, Layouts)
-    try:
-        with open(MIGRATION_M4_PATH, 'r') as f:
-            migration = f.read()
-        conn.executescript(migration)
-    except Exception as e:
-        print(f"M4 Migration warning: {e}")
+    for label, path in MIGRATIONS:
+        try:
+            with open(path, 'r') as f:
+                migration = f.read()
+            conn.executescript(migration)
+        except Exception as e:
+            print(f"{label} Migration warning: {e}")
 
     conn.commit()
     conn.close()
 
 def query_db(query: str, args: tuple = (), one: bool = False):
-    conn = get_db_connection()
-    cur = conn.execute(query, args)
-    rv = cur.fetchall()
-    conn.close()
+    with _connection() as conn:
+        cur = conn.execute(query, args)
+        rv = cur.fetchall()
     return (rv[0] if rv else None) if one else rv
 
-def execute_db(query: str, args: tuple = ()):
-    conn = get_db_connection()
-    cur = conn.execute(query, args)
-    conn.commit()
-    last_row_id = cur.lastrowid
-    conn.close()
-    return last_row_id
+def iter_query(query: str, args: tuple = (), batch_size: int = 1000):
+    """
+    Yield rows as they come off the cursor, `batch_size` at a time, so large
+    results are never held in memory at once. The connection is held until
+    the generator is exhausted or closed.
+    """
+    with _connection() as conn:
+        cur = conn.execute(query, args)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+def execute_db(query: str, args: tuple = (), rowcount: bool = False):
+    """Returns the inserted row's id, or with `rowcount` the number of affected rows."""
+    with _connection() as conn:
+        cur = conn.execute(query, args)
+        result = cur.rowcount if rowcount else cur.lastrowid
+    return result
+
+def executemany_db(query: str, seq_of_args):
+    """Set-based variant of execute_db; returns the number of affected rows."""
+    with _connection() as conn:
+        cur = conn.executemany(query, seq_of_args)
+        row_count = cur.rowcount
+    return row_count
+
+def get_graph_version() -> int:
+    """Trigger-maintained counter bumped by every graph write (migration M13)."""
+    row = query_db("SELECT value FROM graph_meta WHERE key = 'graph_version'", one=True)
+    return row['value'] if row else 0
@@ -0,0 +1,183 @@
+"""
+Streaming exports of edges, nodes, invoices and audit logs.
+
+Rows come off the database cursor in batches (database.iter_query) and
+are encoded as they arrive, so neither the server nor the browser ever
+holds the whole export:
+
+    csv      text/csv, optionally gzip-compressed on the fly
+    parquet  one row group per batch (needs pyarrow)
+    arrow    Arrow IPC stream, one record batch per batch (needs pyarrow)
+
+Every export takes the same date_start/date_end filters (inclusive,
+YYYY-MM-DD) against the entity's natural date column.
+"""
+import csv
+import io
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet/arrow exports are unavailable
+    pa = None
+    pq = None
+
+EXPORT_BATCH_SIZE = 5000
+FORMATS = ("csv", "parquet", "arrow")
+
+# entity -> (table, [(column, SQL expression, arrow type name)], date expression, is_timestamp, order by)
+ENTITIES: Dict[str, Tuple] = {
+    "edges": ("edges", [
+        ("edge_id", "edge_id", "string"),
+        ("type", "type", "string"),
+        ("from_node", "from_node_id", "string"),
+        ("to_node", "to_node_id", "string"),
+        ("amount", "amount", "float64"),
+        ("currency", "currency", "string"),
+        ("date", "date", "string"),
+        ("status", "status", "string"),
+    ], "date", False, "edge_id"),
+    "nodes": ("nodes", [
+        ("node_id", "node_id", "string"),
+        ("type", "type", "string"),
+        ("name", "json_extract(attributes, '$.name')", "string"),
+        ("status", "json_extract(attributes, '$.status')", "string"),
+        ("attributes", "attributes", "string"),
+        ("created_at", "created_at", "string"),
+    ], "created_at", True, "node_id"),
+    "invoices": ("invoices", [
+        ("invoice_id", "invoice_id", "string"),
+        ("source", "source", "string"),
+        ("source_id", "source_id", "string"),
+        ("vendor_node_id", "vendor_node_id", "string"),
+        ("job_node_id", "job_node_id", "string"),
+        ("amount", "amount", "float64"),
+        ("currency", "currency", "string"),
+        ("invoice_date", "invoice_date", "string"),
+        ("status", "status", "string"),
+        ("cost_codes", "cost_codes", "string"),
+        ("description", "description", "string"),
+        ("edge_id", "edge_id", "string"),
+        ("created_at", "created_at", "string"),
+    ], "invoice_date", False, "invoice_id"),
+    "audit_logs": ("audit_logs", [
+        ("log_id", "log_id", "int64"),
+        ("action", "action", "string"),
+        ("actor", "actor", "string"),
+        ("target_id", "target_id", "string"),
+        ("details", "details", "string"),
+        ("timestamp", "timestamp", "string"),
+    ], "timestamp", True, "log_id"),
+}
+
+class ExportUnavailable(RuntimeError):
+    """The requested format needs an optional dependency that is not installed."""
+
+def _query(entity: str, date_start: Optional[str], date_end: Optional[str]) -> Tuple[str, tuple]:
+    table, columns, date_column, is_timestamp, order_by = ENTITIES[entity]
+    select = ", ".join(f"{expr} AS {name}" for name, expr, _ in columns)
+    query = f"SELECT {select} FROM {table} WHERE 1=1"
+    args = []
+    if date_start:
+        query += f" AND {date_column} >= ?"
+        args.append(date_start)
+    if date_end:
+        # Timestamps carry a time of day, so compare against the next midnight
+        query += f" AND {date_column} < date(?, '+1 day')" if is_timestamp else f" AND {date_column} <= ?"
+        args.append(date_end)
+    return query + f" ORDER BY {order_by}", tuple(args)
+
+def _batches(entity: str, date_start: Optional[str], date_end: Optional[str]) -> Iterator[List]:
+    query, args = _query(entity, date_start, date_end)
+    batch = []
+    for row in database.iter_query(query, args, batch_size=EXPORT_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def column_names(entity: str) -> List[str]:
+    return [name for name, _, _ in ENTITIES[entity][1]]
+
+def stream_csv(entity: str, date_start: Optional[str] = None, date_end: Optional[str] = None,
+               compress: bool = False) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31 = gzip container
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(column_names(entity))
+    for batch in _batches(entity, date_start, date_end):
+        writer.writerows(tuple(row) for row in batch)
+        chunk = emit(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        if chunk:
+            yield chunk
+    tail = emit(buffer.getvalue())
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after each row group."""
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _schema(entity: str):
+    return pa.schema([(name, getattr(pa, arrow_type)()) for name, _, arrow_type in ENTITIES[entity][1]])
+
+def stream_arrow(entity: str, date_start: Optional[str] = None, date_end: Optional[str] = None,
+                 fmt: str = "parquet") -> Iterator[bytes]:
+    """Parquet (one row group per batch) or Arrow IPC stream (one record batch per batch)."""
+    if pa is None:
+        raise ExportUnavailable(f"{fmt} export requires pyarrow")
+    schema = _schema(entity)
+    names = column_names(entity)
+
+    def generate():
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+        for batch in _batches(entity, date_start, date_end):
+            columns = [[row[i] for row in batch] for i in range(len(names))]
+            record_batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            )
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([record_batch]), row_group_size=len(batch))
+            else:
+                writer.write_batch(record_batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        writer.close()
+        yield sink.drain()
+
+    return generate()
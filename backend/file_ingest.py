@@ -0,0 +1,280 @@
+"""
+Streaming, resumable ingestion of invoice exports (NDJSON or CSV).
+
+The file is read as a generator, so memory stays bounded by the chunk size
+whatever the file size. Each chunk goes through the same resolve ->
+node/edge -> invoice flow as the batch endpoint, and the byte offset just
+past the chunk is written to `ingest_checkpoints` in the same transaction.
+An interrupted load therefore resumes exactly where the last commit ended.
+
+Usage:
+    python file_ingest.py exports/invoices-2024.ndjson --chunk-size 1000
+
+The CLI reads any path it is given. Loads started through the API are
+confined to the import root (INGEST_ROOT, default database/imports).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import database
+import ingest_service
+import resolution
+
+FILE_CHUNK_SIZE = 1000
+FORMATS = ("ndjson", "csv")
+
+# Loads currently running in this process, by absolute path
+_running = set()
+_running_lock = threading.Lock()
+
+class RecordError(ValueError):
+    """A line that could not be parsed into a record."""
+
+class ImportPathError(ValueError):
+    """An API-supplied path that resolves outside the import root."""
+
+def import_root() -> str:
+    root = os.environ.get("INGEST_ROOT") or os.path.join(os.path.dirname(database.DB_PATH), "imports")
+    return os.path.realpath(root)
+
+def resolve_import_path(path: str) -> str:
+    """
+    Resolve `path` (relative to the import root, or absolute) with symlinks
+    followed, and reject anything that ends up outside the root.
+    """
+    root = import_root()
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ImportPathError("Path is outside the import root")
+    return resolved
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Cannot infer format from '{path}', pass ndjson or csv")
+
+def _csv_value(field: str, value: str) -> Any:
+    if field in ("cost_codes", "attachments"):
+        if value.startswith("["):
+            return json.loads(value)
+        return [part.strip() for part in value.split(";") if part.strip()]
+    return value
+
+def read_ndjson(f, start: int) -> Iterator[Tuple[Any, int]]:
+    """Yield (record, end_offset) for each non-blank line after `start`."""
+    f.seek(start)
+    offset = start
+    for line in f:
+        offset += len(line)
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), offset
+        except ValueError as e:
+            yield RecordError(f"invalid JSON at byte {offset - len(line)}: {e}"), offset
+
+def read_csv(f, start: int) -> Iterator[Tuple[Any, int]]:
+    """
+    Yield (record, end_offset) for each CSV row after `start`. The header is
+    always read from the top of the file; quoted fields may span lines.
+    """
+    f.seek(0)
+    header_line = f.readline()
+    header = next(csv.reader([header_line.decode("utf-8-sig")]))
+    offset = max(start, len(header_line))
+    f.seek(offset)
+
+    pending = b""
+    for line in f:
+        offset += len(line)
+        pending += line
+        # An odd number of quotes means a quoted field continues on the next line
+        if pending.count(b'"') % 2:
+            continue
+        text = pending.decode("utf-8")
+        pending = b""
+        if not text.strip():
+            continue
+        try:
+            row = next(csv.reader(io.StringIO(text)))
+            if len(row) != len(header):
+                raise ValueError(f"expected {len(header)} columns, got {len(row)}")
+            yield {
+                field: _csv_value(field, value)
+                for field, value in zip(header, row) if value != ""
+            }, offset
+        except ValueError as e:
+            yield RecordError(f"invalid CSV row ending at byte {offset}: {e}"), offset
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+def is_running(path: str) -> bool:
+    return os.path.abspath(path) in _running
+
+def get_checkpoint(path: str) -> Optional[Dict]:
+    row = database.query_db(
+        "SELECT * FROM ingest_checkpoints WHERE source_path = ?",
+        (os.path.abspath(path),),
+        one=True
+    )
+    return dict(row) if row else None
+
+def get_progress(path: str) -> Optional[Dict]:
+    """Checkpoint row plus percent complete, for the status endpoint and CLI."""
+    checkpoint = get_checkpoint(path)
+    if not checkpoint:
+        return None
+    size = checkpoint.get("file_size") or 0
+    checkpoint["percent"] = round(100.0 * checkpoint["byte_offset"] / size, 2) if size else 100.0
+    checkpoint["running"] = is_running(checkpoint["source_path"])
+    return checkpoint
+
+def _save_checkpoint(path: str, offset: int, counts: Dict[str, int]):
+    database.execute_db(
+        """
+        UPDATE ingest_checkpoints
+        SET byte_offset = ?, records_read = records_read + ?, ingested = ingested + ?,
+            queued = queued + ?, failed = failed + ?, updated_at = CURRENT_TIMESTAMP
+        WHERE source_path = ?
+        """,
+        (offset, counts["total"], counts["ingested"], counts["queued"], counts["failed"], path)
+    )
+
+def _ingest_chunk(path: str, records: List[Tuple[Any, int]], first_index: int) -> Dict[str, int]:
+    """Ingest one chunk and advance the checkpoint in the same transaction."""
+    batch = ingest_service.BatchIngest()
+    parsed = []
+    results = []
+    for position, (record, _) in enumerate(records):
+        if isinstance(record, RecordError):
+            results.append({"index": first_index + position, "status": "failed", "error": str(record)})
+        else:
+            parsed.append(record)
+    valid, failed = batch.validate(parsed, offset=first_index)
+    results += failed
+
+    # Resolution only reads, so keep it outside the write transaction
+    batch.resolve([inv.vendor_name for _, inv in valid])
+
+    with database.transaction():
+        results += batch.write_chunk(valid)
+        counts = {"total": len(records), "ingested": 0, "queued": 0, "failed": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        _save_checkpoint(path, records[-1][1], counts)
+    return counts
+
+def ingest_file(
+    path: str,
+    fmt: Optional[str] = None,
+    chunk_size: int = FILE_CHUNK_SIZE,
+    restart: bool = False,
+    progress=None
+) -> Dict:
+    """
+    Stream `path` into the graph, resuming from its checkpoint unless
+    `restart` is set. `progress` is called with the progress dict after
+    every committed chunk.
+    """
+    path = os.path.abspath(path)
+    fmt = fmt or detect_format(path)
+    if fmt not in READERS:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {FORMATS}")
+    chunk_size = max(1, min(chunk_size, ingest_service.MAX_BATCH_CHUNK_SIZE))
+    file_size = os.path.getsize(path)
+
+    with _running_lock:
+        if path in _running:
+            raise RuntimeError(f"{path} is already being ingested")
+        _running.add(path)
+
+    try:
+        checkpoint = get_checkpoint(path)
+        if restart or not checkpoint or checkpoint["byte_offset"] > file_size:
+            database.execute_db(
+                """
+                INSERT OR REPLACE INTO ingest_checkpoints (source_path, format, byte_offset, file_size)
+                VALUES (?, ?, 0, ?)
+                """,
+                (path, fmt, file_size)
+            )
+            start, first_index = 0, 0
+        else:
+            database.execute_db(
+                "UPDATE ingest_checkpoints SET file_size = ?, status = 'running', error = NULL WHERE source_path = ?",
+                (file_size, path)
+            )
+            start, first_index = checkpoint["byte_offset"], checkpoint["records_read"]
+
+        started = time.perf_counter()
+        processed = 0
+        with open(path, "rb") as f:
+            chunk = []
+            for item in READERS[fmt](f, start):
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    _ingest_chunk(path, chunk, first_index)
+                    first_index += len(chunk)
+                    processed += len(chunk)
+                    chunk = []
+                    if progress:
+                        progress(get_progress(path))
+            if chunk:
+                _ingest_chunk(path, chunk, first_index)
+                processed += len(chunk)
+
+        database.execute_db(
+            "UPDATE ingest_checkpoints SET byte_offset = ?, status = 'completed', updated_at = CURRENT_TIMESTAMP WHERE source_path = ?",
+            (file_size, path)
+        )
+    except Exception as e:
+        database.execute_db(
+            "UPDATE ingest_checkpoints SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP WHERE source_path = ?",
+            (str(e), path)
+        )
+        raise
+    finally:
+        with _running_lock:
+            _running.discard(path)
+
+    elapsed = time.perf_counter() - started
+    result = get_progress(path)
+    result["records_per_second"] = round(processed / elapsed, 1) if elapsed > 0 else None
+    return result
+
+def run_in_background(path: str, fmt: Optional[str], chunk_size: int, restart: bool):
+    """BackgroundTasks entry point; failures are already recorded on the checkpoint."""
+    try:
+        ingest_file(path, fmt, chunk_size, restart)
+    except Exception as e:
+        print(f"File ingestion of {path} failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream an NDJSON/CSV invoice export into the graph.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=FILE_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    database.init_db()
+    resolution.sync_vendor_aliases()
+
+    def report(p):
+        print(f"{p['percent']:6.2f}%  read={p['records_read']} ingested={p['ingested']} "
+              f"queued={p['queued']} failed={p['failed']}")
+
+    result = ingest_file(args.path, args.format, args.chunk_size, args.restart, progress=report)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+"""
+Resident graph engine for multi-hop questions.
+
+The nodes/edges tables are loaded once into compressed-sparse-row arrays
+(NumPy int32 offsets/targets, float64 amounts) for both edge directions.
+BFS expands a whole frontier per NumPy call, so traversals over millions
+of edges take milliseconds instead of one SQL query per hop.
+
+Freshness follows the graph_summary pattern: new node/edge rows are
+appended by rowid, merges are applied in place when their transaction
+commits, and any other update or delete (M10 change counters) reloads.
+
+After every change the arrays are published as a memory-mapped file
+(graph_store), and any worker whose database state matches that file maps
+it instead of rebuilding. Mapped arrays are read-only; they are copied back
+into process memory only when this worker has to apply a change itself.
+"""
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import database
+import graph_store
+from graph_snapshot import intern
+from graph_summary import get_change_versions
+
+DIRECTIONS = ("out", "in", "both")
+MAX_TRACE_HOPS = 10
+DEFAULT_RESULT_LIMIT = 1000
+# Per-edge columns and the two CSR indexes, as stored in the graph file
+ARRAY_COLUMNS = ("src", "dst", "amount", "edge_type", "out_offsets", "out_targets", "out_edges",
+                 "in_offsets", "in_targets", "in_edges")
+
+def _csr(keys: np.ndarray, values: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(offsets, neighbours, edge indices) grouping `values` by `keys`."""
+    order = np.argsort(keys, kind="stable").astype(np.int32)
+    counts = np.bincount(keys, minlength=size)
+    offsets = np.zeros(size + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, values[order], order
+
+def _database_state() -> Tuple:
+    """(change versions, max node rowid, max edge rowid); what a loaded graph must match."""
+    row = database.query_db(
+        "SELECT (SELECT MAX(rowid) FROM nodes) AS nodes, (SELECT MAX(rowid) FROM edges) AS edges", one=True
+    )
+    return get_change_versions(), row['nodes'] or 0, row['edges'] or 0
+
+def _gather(offsets: np.ndarray, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR positions of every neighbour of `frontier`, and the frontier node each came from."""
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+    block_starts = np.cumsum(counts) - counts
+    positions = np.repeat(starts - block_starts, counts) + np.arange(total)
+    return positions, np.repeat(frontier, counts)
+
+class GraphEngine:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.versions: Optional[Tuple[int, int]] = None
+        self.last_node_rowid = 0
+        self.last_edge_rowid = 0
+        self.stats = {
+            "reloads": 0, "incremental_updates": 0, "merges_applied": 0, "stale_updates": 0,
+            "files_published": 0, "files_mapped": 0
+        }
+        self._reset()
+
+    def _reset(self):
+        self.node_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.node_types: List[str] = []
+        self.merged_into: Dict[str, str] = {}
+        self.types: List[str] = []
+        self.type_codes: Dict[str, int] = {}
+        self.edge_ids: List[str] = []
+        self.src = np.empty(0, dtype=np.int32)
+        self.dst = np.empty(0, dtype=np.int32)
+        self.amount = np.empty(0, dtype=np.float64)
+        self.edge_type = np.empty(0, dtype=np.int16)
+        self.mapped: Optional[graph_store.GraphFile] = None
+        self.published = False
+        self.dirty = True
+
+    # --- loading ---
+
+    def _load_nodes(self, after_rowid: int):
+        for row in database.iter_query(
+            "SELECT rowid, node_id, type, attributes FROM nodes WHERE rowid > ? ORDER BY rowid", (after_rowid,)
+        ):
+            attrs = json.loads(row['attributes'])
+            if attrs.get("status") == "merged" and attrs.get("merged_into"):
+                self.merged_into[row['node_id']] = attrs["merged_into"]
+            if row['node_id'] not in self.index:
+                self.index[row['node_id']] = len(self.node_ids)
+                self.node_ids.append(row['node_id'])
+                self.node_types.append(row['type'])
+            self.last_node_rowid = max(self.last_node_rowid, row['rowid'])
+
+    def _type_code(self, edge_type: str) -> int:
+        if edge_type not in self.type_codes:
+            self.type_codes[edge_type] = len(self.types)
+            self.types.append(edge_type)
+        return self.type_codes[edge_type]
+
+    def _load_edges(self, after_rowid: int) -> int:
+        ids, src, dst, amount, types = [], [], [], [], []
+        for row in database.iter_query(
+            "SELECT rowid, edge_id, type, from_node_id, to_node_id, amount FROM edges WHERE rowid > ? ORDER BY rowid",
+            (after_rowid,)
+        ):
+            self.last_edge_rowid = max(self.last_edge_rowid, row['rowid'])
+            source = self.index.get(row['from_node_id'])
+            target = self.index.get(row['to_node_id'])
+            if source is None or target is None:
+                continue
+            ids.append(row['edge_id'])
+            src.append(source)
+            dst.append(target)
+            amount.append(row['amount'] or 0.0)
+            types.append(self._type_code(row['type']))
+        if ids:
+            self.edge_ids += ids
+            self.src = np.concatenate([self.src, np.asarray(src, dtype=np.int32)])
+            self.dst = np.concatenate([self.dst, np.asarray(dst, dtype=np.int32)])
+            self.amount = np.concatenate([self.amount, np.asarray(amount, dtype=np.float64)])
+            self.edge_type = np.concatenate([self.edge_type, np.asarray(types, dtype=np.int16)])
+            self.dirty = True
+        return len(ids)
+
+    def _build_csr(self):
+        n = len(self.node_ids)
+        self.out_offsets, self.out_targets, self.out_edges = _csr(self.src, self.dst, n)
+        self.in_offsets, self.in_targets, self.in_edges = _csr(self.dst, self.src, n)
+        self.dirty = False
+
+    def reload(self, versions: Tuple[int, int]):
+        self._reset()
+        self.last_node_rowid = self.last_edge_rowid = 0
+        self._load_nodes(0)
+        self._load_edges(0)
+        self.versions = versions
+        self.stats["reloads"] += 1
+
+    def state(self) -> Tuple:
+        return self.versions, self.last_node_rowid, self.last_edge_rowid
+
+    @staticmethod
+    def _covers(state: Tuple, database_state: Tuple) -> bool:
+        versions, last_node, last_edge = state
+        current_versions, max_node, max_edge = database_state
+        return versions == current_versions and last_node >= max_node and last_edge >= max_edge
+
+    def refresh(self):
+        # One read view: an edge read after a commit its node missed would be
+        # skipped for good, since last_edge_rowid moves past it
+        with database.snapshot():
+            database_state = _database_state()
+            if not self._covers(self.state(), database_state) and not self.map_published(database_state):
+                self._detach()
+                versions = database_state[0]
+                if versions != self.versions:
+                    self.reload(versions)
+                else:
+                    self._load_nodes(self.last_node_rowid)
+                    if self._load_edges(self.last_edge_rowid):
+                        self.stats["incremental_updates"] += 1
+                    # The file on disk no longer covers what was just loaded
+                    self.published = False
+        if self.dirty:
+            self._build_csr()
+        if not self.published:
+            self.publish()
+
+    # --- shared graph file ---
+
+    def map_published(self, database_state: Tuple) -> bool:
+        """Map the published graph file if it is current and not already mapped."""
+        path = graph_store.graph_file_path()
+        identity = graph_store.file_identity(path)
+        if identity is None or (self.mapped is not None and self.mapped.identity == identity):
+            return False
+        try:
+            graph_file = graph_store.GraphFile(path)
+        except (OSError, ValueError):
+            return False
+        if not self._covers(graph_file.state, database_state):
+            return False
+        self._map(graph_file)
+        return True
+
+    def _map(self, graph_file: graph_store.GraphFile):
+        header = graph_file.header
+        self.versions = tuple(header["versions"])
+        self.last_node_rowid = header["last_node_rowid"]
+        self.last_edge_rowid = header["last_edge_rowid"]
+        self.node_ids = graph_file.strings("node_id")
+        self.index = graph_store.MappedIndex(self.node_ids, graph_file.array("node_order"))
+        self.node_types = graph_store.CodedStrings(graph_file.array("node_type"), header["node_types"])
+        self.merged_into = header["merged_into"]
+        self.types = header["edge_types"]
+        self.type_codes = {name: code for code, name in enumerate(self.types)}
+        self.edge_ids = graph_file.strings("edge_id")
+        for name in ARRAY_COLUMNS:
+            setattr(self, name, graph_file.array(name))
+        self.mapped = graph_file
+        self.published = True
+        self.dirty = False
+        self.stats["files_mapped"] += 1
+
+    def _detach(self):
+        """Copy mapped (read-only) data into process memory before changing it."""
+        if self.mapped is None:
+            return
+        self.node_ids = list(self.node_ids)
+        self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.node_types = list(self.node_types)
+        self.merged_into = dict(self.merged_into)
+        self.types = list(self.types)
+        self.edge_ids = list(self.edge_ids)
+        for name in ARRAY_COLUMNS:
+            setattr(self, name, np.array(getattr(self, name)))
+        self.mapped = None
+
+    def publish(self):
+        """Write the current arrays as the shared graph file and switch to mapping it."""
+        self.published = True
+        node_types, node_type_codes = intern(self.node_types)
+        header = {
+            "versions": self.versions,
+            "last_node_rowid": self.last_node_rowid,
+            "last_edge_rowid": self.last_edge_rowid,
+            "node_types": node_types,
+            "edge_types": self.types,
+            "merged_into": self.merged_into
+        }
+        arrays = {
+            "node_order": np.asarray(sorted(range(len(self.node_ids)), key=self.node_ids.__getitem__), dtype=np.int32),
+            "node_type": node_type_codes
+        }
+        for name in ARRAY_COLUMNS:
+            arrays[name] = getattr(self, name)
+        path = graph_store.graph_file_path()
+        try:
+            graph_store.write_graph_file(path, header, arrays, {"node_id": self.node_ids, "edge_id": self.edge_ids})
+            graph_file = graph_store.GraphFile(path)
+        except OSError as e:
+            print(f"Warning: could not publish graph file {path}: {e}")
+            return
+        self.stats["files_published"] += 1
+        # Another worker may have replaced the file in the meantime
+        if graph_file.state == self.state():
+            self._map(graph_file)
+
+    def apply(self, versions: Tuple[int, int], bumps: Tuple[int, int], update: Callable[["GraphEngine"], None]):
+        """Apply a committed change that moved the change counters by `bumps` to `versions`."""
+        with self.lock:
+            if self.versions is not None and tuple(v + b for v, b in zip(self.versions, bumps)) == tuple(versions):
+                self._detach()
+                update(self)
+                self.versions = tuple(versions)
+                self.published = False
+            else:
+                self.versions = None
+                self.stats["stale_updates"] += 1
+
+    def merge(self, survivor_id: str, victim_id: str):
+        self.merged_into[victim_id] = survivor_id
+        victim, survivor = self.index.get(victim_id), self.index.get(survivor_id)
+        if victim is not None and survivor is not None:
+            self.src[self.src == victim] = survivor
+            self.dst[self.dst == victim] = survivor
+            self.dirty = True
+        self.stats["merges_applied"] += 1
+
+    # --- traversal helpers ---
+
+    def resolve(self, node_id: str) -> int:
+        """Array index of `node_id`, following merges to the survivor."""
+        hops = 0
+        while node_id in self.merged_into and hops < len(self.merged_into):
+            node_id, hops = self.merged_into[node_id], hops + 1
+        if node_id not in self.index:
+            raise KeyError(node_id)
+        return self.index[node_id]
+
+    def _type_mask(self, edge_types: Optional[Sequence[str]]) -> Optional[np.ndarray]:
+        if not edge_types:
+            return None
+        codes = [self.type_codes[t] for t in edge_types if t in self.type_codes]
+        return np.isin(self.edge_type, codes)
+
+    def _expand(self, frontier: np.ndarray, direction: str, allowed: Optional[np.ndarray]):
+        """(origin, neighbour, edge index) arrays for one hop from `frontier`."""
+        parts = []
+        if direction in ("out", "both"):
+            positions, origin = _gather(self.out_offsets, frontier)
+            parts.append((origin, self.out_targets[positions], self.out_edges[positions]))
+        if direction in ("in", "both"):
+            positions, origin = _gather(self.in_offsets, frontier)
+            parts.append((origin, self.in_targets[positions], self.in_edges[positions]))
+        origin = np.concatenate([p[0] for p in parts])
+        neighbours = np.concatenate([p[1] for p in parts])
+        edges = np.concatenate([p[2] for p in parts])
+        if allowed is not None:
+            keep = allowed[edges]
+            origin, neighbours, edges = origin[keep], neighbours[keep], edges[keep]
+        return origin, neighbours, edges
+
+    def _edge_dict(self, e: int) -> Dict:
+        return {
+            "edge_id": self.edge_ids[e],
+            "type": self.types[self.edge_type[e]],
+            "from_node": self.node_ids[self.src[e]],
+            "to_node": self.node_ids[self.dst[e]],
+            "amount": float(self.amount[e])
+        }
+
+    # --- traversals ---
+
+    def bfs(self, node_id: str, max_hops: int = 3, direction: str = "both",
+            edge_types: Optional[Sequence[str]] = None, stop_at: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(distance, parent edge) arrays; -1 where unreached. Stops early once `stop_at` is reached."""
+        start = self.resolve(node_id)
+        n = len(self.node_ids)
+        distance = np.full(n, -1, dtype=np.int32)
+        parent = np.full(n, -1, dtype=np.int32)
+        distance[start] = 0
+        allowed = self._type_mask(edge_types)
+        frontier = np.array([start], dtype=np.int32)
+        for hop in range(1, max_hops + 1):
+            _, neighbours, edges = self._expand(frontier, direction, allowed)
+            fresh = distance[neighbours] < 0
+            neighbours, edges = neighbours[fresh], edges[fresh]
+            if not len(neighbours):
+                break
+            frontier, first = np.unique(neighbours, return_index=True)
+            distance[frontier] = hop
+            parent[frontier] = edges[first]
+            if stop_at is not None and distance[stop_at] >= 0:
+                break
+        return distance, parent
+
+    def _path_from_parents(self, target: int, parent, start: int) -> List[int]:
+        edges = []
+        node = target
+        while node != start:
+            e = int(parent[node])
+            edges.append(e)
+            node = int(self.src[e]) if int(self.dst[e]) == node else int(self.dst[e])
+        return edges[::-1]
+
+    def shortest_path(self, source_id: str, target_id: str, weight: str = "hops", direction: str = "both",
+                      edge_types: Optional[Sequence[str]] = None, max_hops: int = MAX_TRACE_HOPS) -> Optional[Dict]:
+        """
+        Path from source to target within max_hops. weight="hops" is a BFS;
+        weight="amount" uses cost 1/amount, preferring the heaviest flows.
+        """
+        start, goal = self.resolve(source_id), self.resolve(target_id)
+        if weight == "hops":
+            distance, parent = self.bfs(source_id, max_hops, direction, edge_types, stop_at=goal)
+            if distance[goal] < 0:
+                return None
+            edges = self._path_from_parents(goal, parent, start)
+            cost = float(len(edges))
+        elif weight == "amount":
+            edges, cost = self._cheapest_paths(start, goal, max_hops, direction, self._type_mask(edge_types))
+            if edges is None:
+                return None
+        else:
+            raise ValueError("weight must be 'hops' or 'amount'")
+        nodes = [start]
+        for e in edges:
+            nodes.append(int(self.dst[e]) if int(self.src[e]) == nodes[-1] else int(self.src[e]))
+        return {
+            "nodes": [self.node_ids[i] for i in nodes],
+            "edges": [self._edge_dict(e) for e in edges],
+            "cost": cost
+        }
+
+    def _cheapest_paths(self, start: int, goal: int, max_hops: int, direction: str,
+                        allowed: Optional[np.ndarray]) -> Tuple[Optional[List[int]], Optional[float]]:
+        """
+        Hop-bounded Bellman-Ford with cost 1/amount. Each round relaxes only the
+        edges leaving nodes whose cost improved in the previous round. A node
+        can improve again in a later round (a cheaper path with more hops), so
+        every round keeps its own parents: an edge relaxed in round k left a
+        node that improved in round k - 1, and the path is read back that way.
+        """
+        cost = 1.0 / np.maximum(self.amount, 1.0)
+        n = len(self.node_ids)
+        best = np.full(n, np.inf)
+        best[start] = 0.0
+        # rounds[k][v] = (edge, predecessor) for each node that improved in round k
+        rounds: List[Dict[int, Tuple[int, int]]] = [{start: (-1, -1)}]
+        changed = np.array([start], dtype=np.int32)
+        for hop in range(1, max_hops + 1):
+            origin, neighbours, edges = self._expand(changed, direction, allowed)
+            candidate = best[origin] + cost[edges]
+            better = candidate < best[neighbours]
+            if not better.any():
+                break
+            origin, neighbours, edges, candidate = origin[better], neighbours[better], edges[better], candidate[better]
+            order = np.lexsort((candidate, neighbours))
+            changed, first = np.unique(neighbours[order], return_index=True)
+            picked = order[first]
+            best[changed] = candidate[picked]
+            rounds.append(dict(zip(changed.tolist(), zip(edges[picked].tolist(), origin[picked].tolist()))))
+            changed = changed.astype(np.int32)
+        if not np.isfinite(best[goal]):
+            return None, None
+
+        path = []
+        node, hop = goal, max(k for k, parents in enumerate(rounds) if goal in parents)
+        while hop > 0:
+            edge, node = rounds[hop][node]
+            path.append(edge)
+            hop -= 1
+        return path[::-1], float(best[goal])
+
+    def trace_flow(self, node_id: str, direction: str = "out", max_hops: int = 3,
+                   edge_types: Optional[Sequence[str]] = None, limit: int = DEFAULT_RESULT_LIMIT) -> Dict:
+        """
+        Follow edges layer by layer from `node_id` and total the amounts
+        reaching each node, e.g. job -> GCs -> subcontractors. Only edges that
+        move one layer further out are counted.
+        """
+        if direction not in ("out", "in"):
+            raise ValueError("direction must be 'out' or 'in'")
+        distance, _ = self.bfs(node_id, max_hops, direction, edge_types)
+        allowed = self._type_mask(edge_types)
+        start = self.resolve(node_id)
+
+        layer_edges = []
+        frontier = np.array([start], dtype=np.int32)
+        for hop in range(1, max_hops + 1):
+            _, neighbours, edges = self._expand(frontier, direction, allowed)
+            forward = distance[neighbours] == hop
+            if not forward.any():
+                break
+            layer_edges.append(edges[forward])
+            frontier = np.flatnonzero(distance == hop).astype(np.int32)
+        traced = np.concatenate(layer_edges) if layer_edges else np.empty(0, dtype=np.int32)
+
+        received = self.dst[traced] if direction == "out" else self.src[traced]
+        totals = np.bincount(received, weights=self.amount[traced], minlength=len(self.node_ids))
+        reached = np.flatnonzero(distance > 0)
+        reached = reached[np.argsort(-totals[reached], kind="stable")]
+        heaviest = traced[np.argsort(-self.amount[traced], kind="stable")][:limit]
+        return {
+            "source": self.node_ids[start],
+            "direction": direction,
+            "total_amount": float(self.amount[traced].sum()),
+            "nodes": [
+                {"node_id": self.node_ids[i], "type": self.node_types[i], "hop": int(distance[i]), "amount": float(totals[i])}
+                for i in reached[:limit]
+            ],
+            "edges": [self._edge_dict(int(e)) for e in heaviest],
+            "truncated": len(reached) > limit or len(traced) > limit
+        }
+
+_engine = GraphEngine()
+
+def _current() -> GraphEngine:
+    _engine.refresh()
+    return _engine
+
+def warm_start():
+    """Map the published graph file at startup if it matches the database."""
+    with _engine.lock:
+        _engine.map_published(_database_state())
+
+def edge_list() -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Copies of (node ids, merged mask, edge sources, edge targets) plus the
+    edge rowid they cover, for batch jobs that should not hold the lock.
+    """
+    with _engine.lock:
+        engine = _current()
+        node_ids = list(engine.node_ids)
+        merged = np.fromiter((node_id in engine.merged_into for node_id in node_ids), dtype=bool, count=len(node_ids))
+        return node_ids, merged, np.array(engine.src), np.array(engine.dst), engine.last_edge_rowid
+
+def engine_merge(survivor_id: str, victim_id: str, edges_moved: int, node_updated: bool):
+    """
+    Called from merge_vendors inside its transaction, after the edge moves
+    and victim update; the engine is patched once the transaction commits.
+    """
+    versions = get_change_versions()
+    bumps = (1 if node_updated else 0, edges_moved)
+    database.on_commit(lambda: _engine.apply(versions, bumps, lambda engine: engine.merge(survivor_id, victim_id)))
+
+def bfs(node_id: str, max_hops: int = 3, direction: str = "both",
+        edge_types: Optional[Sequence[str]] = None, limit: int = DEFAULT_RESULT_LIMIT) -> Dict:
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    with _engine.lock:
+        engine = _current()
+        started = time.perf_counter()
+        distance, parent = engine.bfs(node_id, min(max_hops, MAX_TRACE_HOPS), direction, edge_types)
+        reached = np.flatnonzero(distance >= 0)
+        reached = reached[np.argsort(distance[reached], kind="stable")]
+        elapsed = time.perf_counter() - started
+        return {
+            "source": engine.node_ids[engine.resolve(node_id)],
+            "reached": len(reached),
+            "nodes": [
+                {
+                    "node_id": engine.node_ids[i],
+                    "type": engine.node_types[i],
+                    "hop": int(distance[i]),
+                    "via_edge": engine.edge_ids[parent[i]] if parent[i] >= 0 else None
+                }
+                for i in reached[:limit]
+            ],
+            "truncated": len(reached) > limit,
+            "elapsed_ms": round(elapsed * 1000, 3)
+        }
+
+def shortest_path(source_id: str, target_id: str, weight: str = "hops", direction: str = "both",
+                  edge_types: Optional[Sequence[str]] = None, max_hops: int = MAX_TRACE_HOPS) -> Optional[Dict]:
+    with _engine.lock:
+        engine = _current()
+        started = time.perf_counter()
+        result = engine.shortest_path(source_id, target_id, weight, direction, edge_types,
+                                      min(max_hops, MAX_TRACE_HOPS))
+        if result is not None:
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+def trace_flow(node_id: str, direction: str = "out", max_hops: int = 3,
+               edge_types: Optional[Sequence[str]] = None, limit: int = DEFAULT_RESULT_LIMIT) -> Dict:
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    with _engine.lock:
+        engine = _current()
+        started = time.perf_counter()
+        result = engine.trace_flow(node_id, direction, min(max_hops, MAX_TRACE_HOPS), edge_types, limit)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+def get_engine_stats() -> Dict:
+    with _engine.lock:
+        return {
+            "nodes": len(_engine.node_ids),
+            "edges": len(_engine.edge_ids),
+            "versions": _engine.versions,
+            "mapped": _engine.mapped is not None,
+            **_engine.stats
+        }
@@ -0,0 +1,382 @@
+"""
+Server-side force-directed layout.
+
+Fruchterman-Reingold over the graph engine's edge arrays, fully vectorized
+with NumPy. Repulsion uses a grid approximation: nodes repel the centre of
+mass of every other cell, and exactly only the nodes in their own cell.
+Cells are equal-count (split by x, then by y), about n^(1/4) per side, so
+both halves cost about n^1.5 per iteration instead of n^2 even when the
+graph is tightly clustered.
+
+Positions are stored in `graph_layouts` under user_id "server". A relayout
+after ingestion is incremental: only nodes without a position, the
+endpoints of edges added since the last run, and their neighbours (except
+through hubs) move. Everything else stays pinned. If that set is too large, the whole layout
+is recomputed.
+
+Usage:
+    python graph_layout.py [--full]
+"""
+import argparse
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import database
+import graph_engine
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_USER = "server"
+SPRING_LENGTH = 30.0
+FULL_ITERATIONS = 120
+INCREMENTAL_ITERATIONS = 40
+# Above this share of moving nodes an incremental run becomes a full one
+INCREMENTAL_MAX_FRACTION = 0.3
+# Nodes with more edges than this move on their own, without their neighbours
+HUB_DEGREE = 50
+GRAVITY = 0.05
+MAX_GRID = 32
+REPULSION_CHUNK = 2048
+# Node ids per IN (...) lookup, under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 900
+# Single-record ingestion relays out at most once per interval, or sooner
+# once this many edges have arrived since the last layout
+RELAYOUT_INTERVAL = 30.0
+RELAYOUT_EDGES = 500
+
+_lock = threading.Lock()
+_running = False
+_pending = False
+_pending_full = False
+_last_run: Dict = {}
+_deferred: Optional[threading.Timer] = None
+
+def save_positions(user_id: str, positions: Iterable[Tuple[str, float, float]]) -> int:
+    """Set-based upsert of (node_id, x, y) rows; returns the number written."""
+    return database.executemany_db(
+        """
+        INSERT INTO graph_layouts (user_id, node_id, position_x, position_y, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id, node_id) DO UPDATE SET
+            position_x = excluded.position_x,
+            position_y = excluded.position_y,
+            updated_at = excluded.updated_at
+        """,
+        ((user_id, node_id, x, y) for node_id, x, y in positions)
+    )
+
+def _stored_positions(user_id: str, node_ids: List[str]) -> Dict[str, Tuple[float, float]]:
+    stored = {}
+    for lo in range(0, len(node_ids), LOOKUP_CHUNK):
+        chunk = node_ids[lo:lo + LOOKUP_CHUNK]
+        rows = database.query_db(
+            f"""
+            SELECT node_id, position_x, position_y FROM graph_layouts
+            WHERE user_id = ? AND node_id IN ({','.join('?' * len(chunk))})
+            """,
+            (user_id, *chunk)
+        )
+        stored.update((row['node_id'], (row['position_x'], row['position_y'])) for row in rows)
+    return stored
+
+def save_layout_delta(user_id: str, node_ids: List[str], positions: List[float], threshold: float = 0.0) -> Dict:
+    """
+    Save packed [x0, y0, x1, y1, ...] positions, skipping nodes that moved
+    `threshold` or less from their stored position. One transaction.
+    """
+    if len(positions) != 2 * len(node_ids):
+        raise ValueError("positions must hold an x and a y for every node id")
+    xy = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    with database.transaction():
+        if threshold > 0:
+            stored = _stored_positions(user_id, node_ids)
+            previous = np.array([stored.get(node_id, (np.nan, np.nan)) for node_id in node_ids],
+                                dtype=np.float64).reshape(-1, 2)
+            moved = np.hypot(*(xy - previous).T)
+            changed = np.flatnonzero(~(moved <= threshold))
+        else:
+            changed = np.arange(len(node_ids))
+        saved = save_positions(user_id, ((node_ids[i], float(xy[i, 0]), float(xy[i, 1])) for i in changed))
+    return {"received": len(node_ids), "saved": saved, "skipped": len(node_ids) - saved}
+
+def get_packed_layout(user_id: str, since: Optional[str] = None) -> Dict:
+    """
+    Positions as parallel arrays: node_ids and a flat [x0, y0, x1, y1, ...]
+    list. With `since` (an earlier `as_of`), only rows updated since then;
+    timestamps have one-second resolution, so rows from that second repeat.
+    """
+    query = "SELECT node_id, position_x, position_y, updated_at FROM graph_layouts WHERE user_id = ?"
+    args = [user_id]
+    if since:
+        query += " AND updated_at >= ?"
+        args.append(since)
+    node_ids, positions, as_of = [], [], since
+    for row in database.iter_query(query, tuple(args)):
+        node_ids.append(row['node_id'])
+        positions += (row['position_x'], row['position_y'])
+        if as_of is None or row['updated_at'] > as_of:
+            as_of = row['updated_at']
+    return {"user_id": user_id, "count": len(node_ids), "as_of": as_of, "node_ids": node_ids, "positions": positions}
+
+def _cells(pos: np.ndarray, grid: int) -> np.ndarray:
+    """
+    Equal-count cells: split by x into `grid` slabs, then each slab by y,
+    so every cell holds about n / grid^2 nodes however clustered they are.
+    """
+    n = len(pos)
+    slab = np.empty(n, dtype=np.int64)
+    slab[np.argsort(pos[:, 0], kind="stable")] = np.arange(n) * grid // n
+    order = np.lexsort((pos[:, 1], slab))
+    slab_sizes = np.bincount(slab, minlength=grid)
+    slab_starts = np.cumsum(slab_sizes) - slab_sizes
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - slab_starts[slab[order]]
+    return slab * grid + rank * grid // np.maximum(slab_sizes[slab], 1)
+
+def _repulsion(pos: np.ndarray, active: np.ndarray, k: float) -> np.ndarray:
+    """Repulsive displacement (k^2 / d) on the `active` nodes from all nodes."""
+    n = len(pos)
+    grid = int(min(MAX_GRID, max(1, round(n ** 0.25))))
+    cell = _cells(pos, grid)
+    cells = grid * grid
+    mass = np.bincount(cell, minlength=cells).astype(np.float64)
+    centre = np.stack([
+        np.bincount(cell, weights=pos[:, 0], minlength=cells),
+        np.bincount(cell, weights=pos[:, 1], minlength=cells)
+    ], axis=1) / np.maximum(mass, 1)[:, None]
+
+    disp = np.zeros((len(active), 2))
+    # Far field: every other cell as a point mass at its centre
+    centre_sq = (centre ** 2).sum(axis=1)
+    for lo in range(0, len(active), REPULSION_CHUNK):
+        chunk = active[lo:lo + REPULSION_CHUNK]
+        p = pos[chunk]
+        d2 = (p ** 2).sum(axis=1)[:, None] + centre_sq[None, :] - 2 * p @ centre.T
+        weight = mass[None, :] / np.maximum(d2, 1e-2)
+        weight[np.arange(len(chunk)), cell[chunk]] = 0.0
+        disp[lo:lo + REPULSION_CHUNK] = p * weight.sum(axis=1)[:, None] - weight @ centre
+
+    # Near field: exact pairs within each cell holding an active node,
+    # batched as a (cells, size, size) block padded with -1
+    order = np.argsort(cell, kind="stable")
+    starts = np.searchsorted(cell[order], np.arange(cells))
+    size = int(mass.max())
+    members = np.full((cells, size), -1)
+    members[cell[order], np.arange(n) - starts[cell[order]]] = order
+    active_slot = np.full(n, -1)
+    active_slot[active] = np.arange(len(active))
+    wanted = np.unique(cell[active])
+    step = max(1, REPULSION_CHUNK * 64 // max(size * size, 1))
+    for lo in range(0, len(wanted), step):
+        block = members[wanted[lo:lo + step]]
+        valid = block >= 0
+        p = pos[np.where(valid, block, 0)]
+        delta = p[:, :, None, :] - p[:, None, :, :]
+        weight = 1.0 / np.maximum((delta ** 2).sum(axis=3), 1e-2)
+        weight *= valid[:, :, None] & valid[:, None, :]
+        weight[:, np.arange(size), np.arange(size)] = 0.0
+        force = p * weight.sum(axis=2)[:, :, None] - weight @ p
+        slot = active_slot[np.where(valid, block, 0)]
+        take = valid & (slot >= 0)
+        disp[slot[take]] += force[take]
+    return disp * k * k
+
+def simulate(pos: np.ndarray, src: np.ndarray, dst: np.ndarray, movable: np.ndarray,
+             iterations: int, temperature: float, k: float = SPRING_LENGTH) -> np.ndarray:
+    """
+    Run `iterations` cooling steps in place, moving only `movable` node
+    indices. Edges are (src, dst) index arrays; duplicates are collapsed.
+    """
+    n = len(pos)
+    is_movable = np.zeros(n, dtype=bool)
+    is_movable[movable] = True
+    pairs = np.unique(np.stack([np.minimum(src, dst), np.maximum(src, dst)], axis=1), axis=0)
+    pairs = pairs[(pairs[:, 0] != pairs[:, 1]) & (is_movable[pairs[:, 0]] | is_movable[pairs[:, 1]])]
+    a, b = pairs[:, 0], pairs[:, 1]
+    centre = pos.mean(axis=0)
+
+    for step in range(iterations):
+        t = temperature * (1.0 - step / iterations) + 0.01 * k
+        disp = np.zeros((n, 2))
+        disp[movable] = _repulsion(pos, movable, k)
+        # Attraction d^2 / k along each edge
+        delta = pos[a] - pos[b]
+        pull = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+        for axis in (0, 1):
+            disp[:, axis] -= np.bincount(a, weights=pull[:, axis], minlength=n)
+            disp[:, axis] += np.bincount(b, weights=pull[:, axis], minlength=n)
+        disp -= GRAVITY * (pos - centre)
+
+        step_disp = disp[movable]
+        length = np.maximum(np.sqrt((step_disp ** 2).sum(axis=1)), 1e-9)
+        pos[movable] += step_disp / length[:, None] * np.minimum(length, t)[:, None]
+    return pos
+
+def _load_positions(node_ids) -> Tuple[np.ndarray, np.ndarray]:
+    """(positions, has_position) aligned with `node_ids`."""
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    pos = np.zeros((len(node_ids), 2))
+    known = np.zeros(len(node_ids), dtype=bool)
+    for row in database.iter_query(
+        "SELECT node_id, position_x, position_y FROM graph_layouts WHERE user_id = ?", (LAYOUT_USER,)
+    ):
+        i = index.get(row['node_id'])
+        if i is not None and row['position_x'] is not None and row['position_y'] is not None:
+            pos[i] = (row['position_x'], row['position_y'])
+            known[i] = True
+    return pos, known
+
+def _last_layout_rowid() -> int:
+    row = database.query_db("SELECT value FROM graph_meta WHERE key = 'layout_edge_rowid'", one=True)
+    return row['value'] if row else 0
+
+def compute_layout(full: bool = False, seed: Optional[int] = None) -> Dict:
+    """Lay out the current graph, incrementally unless `full`, and persist the moved nodes."""
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    node_ids, merged, src, dst, edge_rowid = graph_engine.edge_list()
+    n = len(node_ids)
+    k = SPRING_LENGTH
+    live = ~merged
+    pos, known = _load_positions(node_ids)
+
+    moving = live & ~known
+    if not full:
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        for row in database.iter_query(
+            "SELECT from_node_id, to_node_id FROM edges WHERE rowid > ? AND rowid <= ?",
+            (_last_layout_rowid(), edge_rowid)
+        ):
+            for node_id in (row['from_node_id'], row['to_node_id']):
+                if node_id in index:
+                    moving[index[node_id]] = True
+        # Neighbours follow, except those of hubs (a job or the company node)
+        degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+        expand = moving & (degree <= HUB_DEGREE)
+        touched = expand[src] | expand[dst]
+        moving[src[touched]] = True
+        moving[dst[touched]] = True
+        moving &= live
+    if full or not known[live].any() or moving.sum() > INCREMENTAL_MAX_FRACTION * live.sum():
+        full = True
+        moving = live.copy()
+        radius = k * np.sqrt(max(n, 1))
+        pos = rng.uniform(-radius, radius, size=(n, 2))
+        iterations, temperature = FULL_ITERATIONS, radius / 10
+    else:
+        # Start new nodes next to their already-placed neighbours
+        unplaced = np.flatnonzero(moving & ~known)
+        anchor_sum = np.zeros((n, 2))
+        anchor_count = np.zeros(n)
+        for x, y in ((src, dst), (dst, src)):
+            placed = known[y]
+            np.add.at(anchor_sum, x[placed], pos[y[placed]])
+            np.add.at(anchor_count, x[placed], 1)
+        fallback = pos[known].mean(axis=0) if known.any() else np.zeros(2)
+        anchored = anchor_count[unplaced] > 0
+        pos[unplaced] = np.where(
+            anchored[:, None], anchor_sum[unplaced] / np.maximum(anchor_count[unplaced], 1)[:, None], fallback
+        ) + rng.normal(scale=k, size=(len(unplaced), 2))
+        iterations, temperature = INCREMENTAL_ITERATIONS, 3 * k
+
+    movable = np.flatnonzero(moving)
+    if len(movable):
+        # Merged nodes neither move nor push others around
+        keep = np.flatnonzero(live)
+        remap = np.full(n, -1)
+        remap[keep] = np.arange(len(keep))
+        edge_mask = live[src] & live[dst]
+        sub = pos[keep]
+        simulate(sub, remap[src[edge_mask]], remap[dst[edge_mask]], remap[movable], iterations, temperature, k)
+        pos[keep] = sub
+
+    with database.transaction():
+        written = save_positions(LAYOUT_USER, ((node_ids[i], float(pos[i, 0]), float(pos[i, 1])) for i in movable))
+        database.execute_db(
+            "INSERT OR REPLACE INTO graph_meta (key, value) VALUES ('layout_edge_rowid', ?)", (edge_rowid,)
+        )
+    result = {
+        "mode": "full" if full else "incremental",
+        "nodes": int(live.sum()),
+        "moved": written,
+        "iterations": iterations if len(movable) else 0,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+    _last_run.clear()
+    _last_run.update(result, finished_at=time.time())
+    return result
+
+def schedule_relayout(full: bool = False):
+    """
+    BackgroundTasks entry point. Calls that arrive while a layout is running
+    are coalesced into one more run afterwards, full if any of them asked
+    for a full one.
+    """
+    global _running, _pending, _pending_full
+    with _lock:
+        if _running:
+            _pending = True
+            _pending_full |= full
+            return
+        _running = True
+    try:
+        while True:
+            compute_layout(full)
+            with _lock:
+                if not _pending:
+                    _running = False
+                    return
+                full = _pending_full
+                _pending = _pending_full = False
+    except Exception:
+        logger.exception("Graph layout failed")
+        with _lock:
+            _running = _pending = _pending_full = False
+
+def _run_deferred():
+    global _deferred
+    with _lock:
+        _deferred = None
+    schedule_relayout()
+
+def request_relayout():
+    """
+    Debounced schedule_relayout for single-record writes. Runs now if
+    RELAYOUT_EDGES edges arrived since the last layout or RELAYOUT_INTERVAL
+    has passed since the last run; otherwise one deferred run at the end of
+    the interval picks up everything that arrived in between.
+    """
+    global _deferred
+    row = database.query_db("SELECT MAX(rowid) AS rowid FROM edges", one=True)
+    new_edges = (row['rowid'] or 0) - _last_layout_rowid()
+    if new_edges <= 0:
+        return
+    with _lock:
+        wait = _last_run.get("finished_at", 0.0) + RELAYOUT_INTERVAL - time.time()
+        if new_edges < RELAYOUT_EDGES and wait > 0:
+            if _deferred is None:
+                _deferred = threading.Timer(wait, _run_deferred)
+                _deferred.daemon = True
+                _deferred.start()
+            return
+    schedule_relayout()
+
+def get_layout_status() -> Dict:
+    with _lock:
+        return {"running": _running, "pending": _pending, "pending_full": _pending_full,
+                "deferred": _deferred is not None,
+                "last_run": dict(_last_run)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the server-side graph layout.")
+    parser.add_argument("--full", action="store_true", help="recompute every position")
+    args = parser.parse_args()
+    database.init_db()
+    print(compute_layout(args.full))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+K-hop ego network around one node, with fan-out caps.
+
+Each hop expands the frontier through the (from_node_id, amount) and
+(to_node_id, amount) indexes, keeping only the heaviest edges of each node,
+so a hub like node:company:central costs max_edges_per_node rows rather than
+its full degree.
+"""
+import json
+from typing import Dict, List, Optional
+
+import database
+
+MAX_HOPS = 4
+DEFAULT_EDGES_PER_NODE = 50
+MAX_EDGES_PER_NODE = 500
+DEFAULT_MAX_NODES = 500
+MAX_NODES = 5000
+
+def _heaviest_edges(node_id: str, limit: int) -> List:
+    """Up to `limit` heaviest edges touching `node_id`, plus whether more exist."""
+    rows = database.query_db(
+        """
+        SELECT * FROM (SELECT * FROM edges WHERE from_node_id = ? ORDER BY amount DESC LIMIT ?)
+        UNION ALL
+        SELECT * FROM (SELECT * FROM edges WHERE to_node_id = ? AND from_node_id != ? ORDER BY amount DESC LIMIT ?)
+        """,
+        (node_id, limit + 1, node_id, node_id, limit + 1)
+    )
+    rows = sorted(rows, key=lambda row: -(row['amount'] or 0.0))
+    return rows[:limit], len(rows) > limit
+
+def _fetch_nodes(node_ids: List[str]) -> Dict[str, Dict]:
+    nodes = {}
+    for start in range(0, len(node_ids), 500):
+        chunk = node_ids[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for row in database.query_db(f"SELECT * FROM nodes WHERE node_id IN ({placeholders})", tuple(chunk)):
+            nodes[row['node_id']] = {
+                "node_id": row['node_id'],
+                "type": row['type'],
+                "attributes": json.loads(row['attributes'])
+            }
+    return nodes
+
+def get_neighborhood(
+    node_id: str,
+    hops: int = 1,
+    max_edges_per_node: int = DEFAULT_EDGES_PER_NODE,
+    max_nodes: int = DEFAULT_MAX_NODES
+) -> Optional[Dict]:
+    """
+    Nodes within `hops` of `node_id` and the edges used to reach them.
+    `truncated` is set when a node's fan-out or the node budget was capped.
+    Returns None if the node does not exist.
+    """
+    center = _fetch_nodes([node_id]).get(node_id)
+    if not center:
+        return None
+    hops = max(0, min(hops, MAX_HOPS))
+    max_edges_per_node = max(1, min(max_edges_per_node, MAX_EDGES_PER_NODE))
+    max_nodes = max(1, min(max_nodes, MAX_NODES))
+
+    distance = {node_id: 0}
+    edges = {}
+    capped_nodes = []
+    budget_exhausted = False
+    frontier = [node_id]
+    for hop in range(1, hops + 1):
+        next_frontier = []
+        for current in frontier:
+            rows, capped = _heaviest_edges(current, max_edges_per_node)
+            if capped:
+                capped_nodes.append(current)
+            for row in rows:
+                other = row['to_node_id'] if row['from_node_id'] == current else row['from_node_id']
+                if other not in distance:
+                    if len(distance) >= max_nodes:
+                        budget_exhausted = True
+                        continue
+                    distance[other] = hop
+                    next_frontier.append(other)
+                edges[row['edge_id']] = row
+            if budget_exhausted:
+                break
+        frontier = next_frontier
+        if budget_exhausted or not frontier:
+            break
+
+    nodes = _fetch_nodes(list(distance))
+    # Merged nodes have no edges of their own; drop any stragglers
+    visible = {
+        nid: {**node, "hop": distance[nid]}
+        for nid, node in nodes.items()
+        if node["attributes"].get("status") != "merged" or nid == node_id
+    }
+    return {
+        "center": node_id,
+        "hops": hops,
+        "nodes": sorted(visible.values(), key=lambda node: (node["hop"], node["node_id"])),
+        "edges": [
+            {
+                "edge_id": row['edge_id'],
+                "type": row['type'],
+                "from_node": row['from_node_id'],
+                "to_node": row['to_node_id'],
+                "attributes": json.loads(row['attributes'])
+            }
+            for row in edges.values()
+            if row['from_node_id'] in visible and row['to_node_id'] in visible
+        ],
+        "truncated": bool(capped_nodes) or budget_exhausted,
+        "capped_nodes": capped_nodes
+    }
@@ -0,0 +1,148 @@
+"""
+Compact columnar graph snapshot for the 3D renderer.
+
+Layout (little-endian):
+
+    magic "APWG" | uint32 format version | uint32 header length | header JSON
+    | column data
+
+The header lists the interned node/edge type dictionaries, the counts and,
+for every column, its name, dtype, byte offset (from the start of the
+column data) and length. Columns start on 8-byte boundaries so the browser
+can wrap them in typed arrays without copying:
+
+    node_type     uint8    index into header.node_types
+    node_size     float32  total inflow + outflow (node_stats)
+    edge_source   int32    index into the node arrays
+    edge_target   int32
+    edge_type     uint8    index into header.edge_types
+    edge_amount   float32
+
+String columns (`node_id`, optional `edge_id` and projected attributes) are
+stored as a uint32 offsets column (count + 1 entries) plus a UTF-8 blob.
+"""
+import json
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import database
+
+MAGIC = b"APWG"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+
+class ColumnWriter:
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.columns: List[Dict] = []
+        self.offset = 0
+
+    def add(self, name: str, array: np.ndarray):
+        data = array.tobytes()
+        self.columns.append({
+            "name": name, "dtype": array.dtype.name, "offset": self.offset, "length": len(array)
+        })
+        self.chunks.append(data)
+        self.offset += len(data)
+        padding = -self.offset % ALIGNMENT
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.offset += padding
+
+    def add_strings(self, name: str, values: List[str]):
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        self.add(f"{name}.offsets", offsets)
+        self.add(f"{name}.data", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+def intern(values: List[str]):
+    """Return (dictionary, uint8 codes) for a low-cardinality string column."""
+    dictionary = list(dict.fromkeys(values))
+    if len(dictionary) > 255:
+        raise ValueError("too many distinct types for a uint8 code column")
+    codes = {value: code for code, value in enumerate(dictionary)}
+    return dictionary, np.fromiter((codes[v] for v in values), dtype=np.uint8, count=len(values))
+
+def _projected(value) -> str:
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else json.dumps(value)
+
+def build_snapshot(fields: Optional[List[str]] = None, include_edge_ids: bool = False) -> bytes:
+    """
+    Encode every visible node and the edges between them. `fields` projects
+    node attributes (e.g. ["name", "status"]) into extra string columns.
+    """
+    fields = fields or []
+    node_ids, node_types, node_sizes = [], [], []
+    projections = {field: [] for field in fields}
+    # Nodes and edges from one read snapshot, so an edge committed between
+    # the two scans is never dropped as dangling
+    with database.snapshot():
+        for row in database.iter_query(
+            """
+            SELECT n.node_id, n.type, n.attributes,
+                   COALESCE(s.inflow_total, 0) + COALESCE(s.outflow_total, 0) AS size
+            FROM nodes n LEFT JOIN node_stats s ON s.node_id = n.node_id
+            WHERE json_extract(n.attributes, '$.status') IS NOT 'merged'
+            ORDER BY n.node_id
+            """
+        ):
+            node_ids.append(row['node_id'])
+            node_types.append(row['type'])
+            node_sizes.append(row['size'])
+            if fields:
+                attrs = json.loads(row['attributes'])
+                for field in fields:
+                    projections[field].append(_projected(attrs.get(field)))
+
+        positions = {node_id: i for i, node_id in enumerate(node_ids)}
+        edge_ids, sources, targets, edge_types, amounts = [], [], [], [], []
+        dropped = 0
+        for row in database.iter_query(
+            "SELECT edge_id, type, from_node_id, to_node_id, amount FROM edges ORDER BY edge_id"
+        ):
+            source = positions.get(row['from_node_id'])
+            target = positions.get(row['to_node_id'])
+            if source is None or target is None:
+                # Dangling or pointing at a merged node
+                dropped += 1
+                continue
+            edge_ids.append(row['edge_id'])
+            sources.append(source)
+            targets.append(target)
+            edge_types.append(row['type'])
+            amounts.append(row['amount'] or 0.0)
+
+    node_type_dict, node_type_codes = intern(node_types)
+    edge_type_dict, edge_type_codes = intern(edge_types)
+
+    writer = ColumnWriter()
+    writer.add("node_type", node_type_codes)
+    writer.add("node_size", np.asarray(node_sizes, dtype="<f4"))
+    writer.add("edge_source", np.asarray(sources, dtype="<i4"))
+    writer.add("edge_target", np.asarray(targets, dtype="<i4"))
+    writer.add("edge_type", edge_type_codes)
+    writer.add("edge_amount", np.asarray(amounts, dtype="<f4"))
+    writer.add_strings("node_id", node_ids)
+    if include_edge_ids:
+        writer.add_strings("edge_id", edge_ids)
+    for field in fields:
+        writer.add_strings(f"node.{field}", projections[field])
+
+    header = json.dumps({
+        "node_count": len(node_ids),
+        "edge_count": len(sources),
+        "dropped_edges": dropped,
+        "node_types": node_type_dict,
+        "edge_types": edge_type_dict,
+        "fields": fields,
+        "columns": writer.columns
+    }).encode("utf-8")
+    # Pad the header so the column data starts on an aligned offset
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+
+    return b"".join([MAGIC, struct.pack("<II", FORMAT_VERSION, len(header)), header] + writer.chunks)
@@ -0,0 +1,149 @@
+"""
+Memory-mapped graph file shared by uvicorn worker processes.
+
+The engine's arrays are written next to the database (ontology.db ->
+ontology.graph) using the graph_snapshot column layout under its own magic:
+
+    magic "APGE" | uint32 format version | uint32 header length | header JSON
+    | column data
+
+The header carries the change versions and last rowids the file was built
+from, so a worker can tell whether it is current before mapping it. Columns
+are mapped read-only and wrapped with np.frombuffer, so every worker shares
+the same page-cache copy. String columns are decoded on access and looked up
+through a sorted-order column instead of being materialized into a dict.
+
+A new file is written to a temporary name and moved into place with
+os.replace, so readers only ever see a complete file.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import database
+from graph_snapshot import ALIGNMENT, ColumnWriter
+
+MAGIC = b"APGE"
+FORMAT_VERSION = 1
+
+def graph_file_path() -> str:
+    return os.path.splitext(database.DB_PATH)[0] + ".graph"
+
+def file_identity(path: str) -> Optional[Tuple[int, int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size
+
+class MappedStrings:
+    """Read-only string column: uint32 offsets plus a UTF-8 blob."""
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class MappedIndex:
+    """dict-like string -> position lookup by binary search over a sorted order column."""
+    def __init__(self, strings: MappedStrings, order: np.ndarray):
+        self.strings = strings
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def get(self, key: str, default=None):
+        i = bisect_left(range(len(self.order)), key, key=lambda j: self.strings[self.order[j]])
+        if i < len(self.order) and self.strings[self.order[i]] == key:
+            return int(self.order[i])
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> int:
+        position = self.get(key)
+        if position is None:
+            raise KeyError(key)
+        return position
+
+class CodedStrings:
+    """Low-cardinality string column stored as codes into a dictionary."""
+    def __init__(self, codes: np.ndarray, names: List[str]):
+        self.codes = codes
+        self.names = names
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i) -> str:
+        return self.names[self.codes[i]]
+
+    def __iter__(self):
+        return (self.names[code] for code in self.codes)
+
+class GraphFile:
+    """A read-only mapping of one published graph file."""
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a graph file")
+        version, header_length = struct.unpack_from("<II", self.buffer, len(MAGIC))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        start = len(MAGIC) + 8
+        self.header = json.loads(self.buffer[start:start + header_length])
+        self.base = start + header_length
+        self.columns = {col["name"]: col for col in self.header["columns"]}
+
+    @property
+    def state(self) -> Tuple:
+        return tuple(self.header["versions"]), self.header["last_node_rowid"], self.header["last_edge_rowid"]
+
+    def array(self, name: str) -> np.ndarray:
+        col = self.columns[name]
+        if not col["length"]:
+            return np.empty(0, dtype=col["dtype"])
+        return np.frombuffer(self.buffer, dtype=col["dtype"], count=col["length"], offset=self.base + col["offset"])
+
+    def strings(self, name: str) -> MappedStrings:
+        return MappedStrings(self.array(f"{name}.offsets"), self.array(f"{name}.data"))
+
+def write_graph_file(path: str, header: Dict, arrays: Dict[str, np.ndarray], strings: Dict[str, List[str]]):
+    """Write a graph file to a temporary name and atomically move it over `path`."""
+    writer = ColumnWriter()
+    for name, array in arrays.items():
+        writer.add(name, array)
+    for name, values in strings.items():
+        writer.add_strings(name, values)
+    encoded = json.dumps(dict(header, columns=writer.columns)).encode("utf-8")
+    encoded += b" " * (-(len(MAGIC) + 8 + len(encoded)) % ALIGNMENT)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<II", FORMAT_VERSION, len(encoded)) + encoded)
+            f.writelines(writer.chunks)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,328 @@
+"""
+Server-side clustering: supernodes and aggregated flows between them.
+
+Nodes are grouped by one of GROUPINGS; PaymentFlow/Invoice/Payment edges are
+summed per (from group, to group, edge type). The client draws the summary
+and expands one supernode into its members on demand, so the browser never
+holds the full graph.
+
+Each grouping is cached in-process. New node and edge rows are folded in
+by rowid; updates and deletes (merges, edits) move the M10 change counters
+and trigger a rebuild, as does growth beyond REBUILD_AFTER_GROWTH.
+"""
+import json
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import database
+
+FLOW_EDGE_TYPES = ("PaymentFlow", "Invoice", "Payment")
+GROUPINGS = ("type", "vendor_type", "job", "community")
+
+# Label propagation passes for the community grouping
+COMMUNITY_ITERATIONS = 10
+# Incremental placement is greedy; rebuild once the edge count has grown this much
+REBUILD_AFTER_GROWTH = 0.2
+
+def get_change_versions() -> Tuple[int, int]:
+    rows = database.query_db(
+        "SELECT key, value FROM graph_meta WHERE key IN ('node_change_version', 'edge_change_version')"
+    )
+    values = {row['key']: row['value'] for row in rows}
+    return values.get('node_change_version', 0), values.get('edge_change_version', 0)
+
+class GraphSummary:
+    """Cached grouping of the graph for one `group_by` strategy."""
+
+    def __init__(self, group_by: str):
+        if group_by not in GROUPINGS:
+            raise ValueError(f"group_by must be one of {GROUPINGS}")
+        self.group_by = group_by
+        self.lock = threading.RLock()
+        self.versions: Optional[Tuple[int, int]] = None
+        self.last_node_rowid = 0
+        self.last_edge_rowid = 0
+        self.edges_at_rebuild = 0
+        self.stats = {"rebuilds": 0, "incremental_updates": 0}
+        self._reset()
+
+    def _reset(self):
+        # node_id -> (type, name, attributes)
+        self.nodes: Dict[str, Tuple[str, str, Dict]] = {}
+        self.node_group: Dict[str, str] = {}
+        self.group_labels: Dict[str, str] = {}
+        self.group_members: Dict[str, set] = defaultdict(set)
+        # (edge_id, from, to, type, amount)
+        self.edges: List[Tuple[str, str, str, str, float]] = []
+        self.node_edges: Dict[str, List[int]] = defaultdict(list)
+        # (from group, to group, edge type) -> [count, amount]
+        self.links: Dict[Tuple[str, str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+
+    # --- loading ---
+
+    def _load_nodes(self, after_rowid: int) -> List[str]:
+        new_nodes = []
+        for row in database.iter_query(
+            """
+            SELECT rowid, node_id, type, attributes FROM nodes
+            WHERE rowid > ? AND json_extract(attributes, '$.status') IS NOT 'merged'
+            ORDER BY rowid
+            """,
+            (after_rowid,)
+        ):
+            attrs = json.loads(row['attributes'])
+            self.nodes[row['node_id']] = (row['type'], attrs.get("name") or row['node_id'], attrs)
+            new_nodes.append(row['node_id'])
+        row = database.query_db("SELECT MAX(rowid) AS last FROM nodes", one=True)
+        self.last_node_rowid = max(self.last_node_rowid, row['last'] or 0)
+        return new_nodes
+
+    def _load_edges(self, after_rowid: int) -> List[int]:
+        placeholders = ",".join("?" * len(FLOW_EDGE_TYPES))
+        new_edges = []
+        for row in database.iter_query(
+            f"""
+            SELECT rowid, edge_id, from_node_id, to_node_id, type, amount FROM edges
+            WHERE rowid > ? AND type IN ({placeholders})
+            ORDER BY rowid
+            """,
+            (after_rowid, *FLOW_EDGE_TYPES)
+        ):
+            if row['from_node_id'] not in self.nodes or row['to_node_id'] not in self.nodes:
+                continue
+            index = len(self.edges)
+            self.edges.append((row['edge_id'], row['from_node_id'], row['to_node_id'], row['type'], row['amount'] or 0.0))
+            self.node_edges[row['from_node_id']].append(index)
+            self.node_edges[row['to_node_id']].append(index)
+            new_edges.append(index)
+        row = database.query_db("SELECT MAX(rowid) AS last FROM edges", one=True)
+        self.last_edge_rowid = max(self.last_edge_rowid, row['last'] or 0)
+        return new_edges
+
+    # --- grouping ---
+
+    def _static_group(self, node_id: str) -> Tuple[str, str]:
+        """Group that does not depend on edges: (group id, label)."""
+        node_type, name, attrs = self.nodes[node_id]
+        if self.group_by == "vendor_type" and node_type == "Vendor":
+            vendor_type = attrs.get("vendor_type") or "Unknown"
+            return f"vendor_type:{vendor_type}", f"{vendor_type} vendors"
+        if self.group_by == "job" and node_type == "Job":
+            return f"job:{node_id}", name
+        if self.group_by == "community":
+            return f"community:{node_id}", f"{name} cluster"
+        return f"type:{node_type}", node_type
+
+    def _neighbour_weights(self, node_id: str) -> Counter:
+        weights = Counter()
+        for index in self.node_edges.get(node_id, ()):
+            _, source, target, _, _ = self.edges[index]
+            weights[target if source == node_id else source] += 1
+        return weights
+
+    def _primary_job(self, node_id: str) -> Optional[str]:
+        """The Job this node has the most flow edges with."""
+        jobs = Counter({
+            other: weight for other, weight in self._neighbour_weights(node_id).items()
+            if self.nodes[other][0] == "Job"
+        })
+        if not jobs:
+            return None
+        return min(jobs, key=lambda job: (-jobs[job], job))
+
+    def _assign(self, node_id: str, group_id: str, label: str):
+        previous = self.node_group.get(node_id)
+        if previous is not None:
+            self.group_members[previous].discard(node_id)
+            if not self.group_members[previous]:
+                del self.group_members[previous]
+                self.group_labels.pop(previous, None)
+        self.node_group[node_id] = group_id
+        self.group_members[group_id].add(node_id)
+        self.group_labels.setdefault(group_id, label)
+
+    def _label_propagation(self) -> Dict[str, str]:
+        """node_id -> community representative; ties go to the smallest label."""
+        labels = {node_id: node_id for node_id in self.nodes}
+        order = sorted(self.nodes)
+        for _ in range(COMMUNITY_ITERATIONS):
+            changed = 0
+            for node_id in order:
+                weights = Counter()
+                for other, weight in self._neighbour_weights(node_id).items():
+                    weights[labels[other]] += weight
+                if not weights:
+                    continue
+                best = min(weights, key=lambda label: (-weights[label], label))
+                if best != labels[node_id]:
+                    labels[node_id] = best
+                    changed += 1
+            if not changed:
+                break
+        return labels
+
+    def _group_all(self):
+        if self.group_by == "community":
+            labels = self._label_propagation()
+            for node_id, label in labels.items():
+                self._assign(node_id, f"community:{label}", f"{self.nodes[label][1]} cluster")
+            return
+        for node_id in self.nodes:
+            group_id, label = self._static_group(node_id)
+            if self.group_by == "job" and self.nodes[node_id][0] != "Job":
+                job = self._primary_job(node_id)
+                if job:
+                    group_id, label = f"job:{job}", self.nodes[job][1]
+            self._assign(node_id, group_id, label)
+
+    def _place_new_node(self, node_id: str, edge_index: int):
+        """Greedy placement of a node on its first flow edge."""
+        _, source, target, _, _ = self.edges[edge_index]
+        other = target if source == node_id else source
+        if self.group_by == "community":
+            group_id = self.node_group[other]
+            self._assign(node_id, group_id, self.group_labels[group_id])
+        elif self.group_by == "job" and self.nodes[node_id][0] != "Job" and self.nodes[other][0] == "Job":
+            self._assign(node_id, f"job:{other}", self.nodes[other][1])
+
+    def _add_link(self, edge_index: int):
+        _, source, target, edge_type, amount = self.edges[edge_index]
+        link = self.links[(self.node_group[source], self.node_group[target], edge_type)]
+        link[0] += 1
+        link[1] += amount
+
+    # --- refresh ---
+
+    def rebuild(self, versions: Tuple[int, int]):
+        self._reset()
+        self.last_node_rowid = self.last_edge_rowid = 0
+        self._load_nodes(0)
+        self._load_edges(0)
+        self._group_all()
+        for index in range(len(self.edges)):
+            self._add_link(index)
+        self.versions = versions
+        self.edges_at_rebuild = len(self.edges)
+        self.stats["rebuilds"] += 1
+
+    def _apply_inserts(self):
+        for node_id in self._load_nodes(self.last_node_rowid):
+            self._assign(node_id, *self._static_group(node_id))
+        new_edges = self._load_edges(self.last_edge_rowid)
+        for index in new_edges:
+            _, source, target, _, _ = self.edges[index]
+            for node_id in (source, target):
+                # Only a node's first edge places it, so no link needs re-aggregating
+                if self.node_edges[node_id][0] == index:
+                    self._place_new_node(node_id, index)
+            self._add_link(index)
+        if new_edges:
+            self.stats["incremental_updates"] += 1
+
+    def refresh(self, force: bool = False):
+        # Nodes, edges and their max rowids from one read view (see graph_engine)
+        with database.snapshot():
+            versions = get_change_versions()
+            grown = len(self.edges) - self.edges_at_rebuild > REBUILD_AFTER_GROWTH * max(self.edges_at_rebuild, 1000)
+            if force or versions != self.versions or grown:
+                self.rebuild(versions)
+            else:
+                self._apply_inserts()
+
+    # --- views ---
+
+    def _supernode(self, group_id: str) -> Dict:
+        members = self.group_members[group_id]
+        internal = [link for (g_from, g_to, _), link in self.links.items() if g_from == g_to == group_id]
+        return {
+            "id": group_id,
+            "label": self.group_labels[group_id],
+            "member_count": len(members),
+            "member_types": dict(Counter(self.nodes[node_id][0] for node_id in members)),
+            "internal_edges": sum(link[0] for link in internal),
+            "internal_amount": sum(link[1] for link in internal)
+        }
+
+    def summary(self) -> Dict:
+        return {
+            "group_by": self.group_by,
+            "node_count": len(self.nodes),
+            "edge_count": len(self.edges),
+            "supernodes": [self._supernode(group_id) for group_id in sorted(self.group_members)],
+            "superedges": [
+                {"from": g_from, "to": g_to, "type": edge_type, "count": link[0], "amount": link[1]}
+                for (g_from, g_to, edge_type), link in sorted(self.links.items())
+                if g_from != g_to
+            ]
+        }
+
+    def members(self, group_id: str) -> Dict:
+        """
+        Expand one supernode: its member nodes, the flow edges among them, and
+        their flows to other groups aggregated per (member, group, type).
+        """
+        if group_id not in self.group_members:
+            raise KeyError(group_id)
+        members = self.group_members[group_id]
+        internal = []
+        external: Dict[Tuple[str, str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+        seen = set()
+        for node_id in members:
+            for index in self.node_edges.get(node_id, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                edge_id, source, target, edge_type, amount = self.edges[index]
+                if source in members and target in members:
+                    internal.append({
+                        "edge_id": edge_id, "from": source, "to": target, "type": edge_type, "amount": amount
+                    })
+                elif source in members:
+                    link = external[(source, self.node_group[target], edge_type)]
+                    link[0] += 1
+                    link[1] += amount
+                else:
+                    link = external[(self.node_group[source], target, edge_type)]
+                    link[0] += 1
+                    link[1] += amount
+        return {
+            "group": self._supernode(group_id),
+            "nodes": [
+                {"node_id": node_id, "type": self.nodes[node_id][0], "name": self.nodes[node_id][1]}
+                for node_id in sorted(members)
+            ],
+            "edges": internal,
+            "external_edges": [
+                {"from": source, "to": target, "type": edge_type, "count": link[0], "amount": link[1]}
+                for (source, target, edge_type), link in sorted(external.items())
+            ]
+        }
+
+_summaries: Dict[str, GraphSummary] = {}
+_summaries_lock = threading.Lock()
+
+def _get(group_by: str) -> GraphSummary:
+    with _summaries_lock:
+        if group_by not in _summaries:
+            _summaries[group_by] = GraphSummary(group_by)
+        return _summaries[group_by]
+
+def get_summary(group_by: str = "type", refresh: bool = False) -> Dict:
+    summary = _get(group_by)
+    with summary.lock:
+        summary.refresh(force=refresh)
+        return summary.summary()
+
+def get_members(group_by: str, group_id: str) -> Dict:
+    summary = _get(group_by)
+    with summary.lock:
+        summary.refresh()
+        return summary.members(group_id)
+
+def get_cache_stats() -> Dict:
+    with _summaries_lock:
+        return {
+            group_by: {"nodes": len(s.nodes), "edges": len(s.edges), **s.stats}
+            for group_by, s in _summaries.items()
+        }
@@ -0,0 +1,106 @@
+"""
+Nodes inside a rectangle of a saved layout, for pan/zoom fetching.
+
+Positions are found through the graph_layouts_rtree R*Tree (migration M12),
+whose third dimension is the layout owner, so a box query only touches
+that user's points in the box. Edges come from one statement that takes
+each visible node's heaviest edges through the M11 (node, amount DESC)
+indexes, so a hub in view costs `edges_per_node` rows, not its degree.
+"""
+import json
+from typing import Dict, Optional
+
+import database
+
+DEFAULT_MAX_NODES = 2000
+MAX_NODES = 10000
+DEFAULT_MAX_EDGES = 5000
+MAX_EDGES = 50000
+DEFAULT_EDGES_PER_NODE = 20
+MAX_EDGES_PER_NODE = 200
+
+def _user_code(user_id: str) -> Optional[int]:
+    row = database.query_db("SELECT user_code FROM layout_users WHERE user_id = ?", (user_id,), one=True)
+    return row['user_code'] if row else None
+
+def get_viewport(
+    x0: float, y0: float, x1: float, y1: float,
+    user_id: str,
+    max_nodes: int = DEFAULT_MAX_NODES,
+    max_edges: int = DEFAULT_MAX_EDGES,
+    edges_per_node: int = DEFAULT_EDGES_PER_NODE
+) -> Dict:
+    """
+    Visible nodes with positions in the box and up to `max_edges` of their
+    incident edges (which may lead off-screen). `truncated` is set when
+    either cap was hit.
+    """
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    max_nodes = max(1, min(max_nodes, MAX_NODES))
+    max_edges = max(1, min(max_edges, MAX_EDGES))
+    edges_per_node = max(1, min(edges_per_node, MAX_EDGES_PER_NODE))
+    result = {"bbox": [x0, y0, x1, y1], "user_id": user_id, "nodes": [], "edges": [], "truncated": False}
+    code = _user_code(user_id)
+    if code is None:
+        return result
+
+    # The R*Tree stores float32 boxes, so it is queried for overlap and the
+    # exact bounds are re-checked on graph_layouts
+    rows = database.query_db(
+        """
+        SELECT g.node_id, g.position_x, g.position_y, n.type, n.attributes
+        FROM graph_layouts_rtree r
+        JOIN graph_layouts g ON g.layout_id = r.id
+        JOIN nodes n ON n.node_id = g.node_id
+        WHERE r.min_x <= ? AND r.max_x >= ? AND r.min_y <= ? AND r.max_y >= ?
+          AND r.min_u <= ? AND r.max_u >= ?
+          AND g.position_x BETWEEN ? AND ? AND g.position_y BETWEEN ? AND ?
+          AND json_extract(n.attributes, '$.status') IS NOT 'merged'
+        LIMIT ?
+        """,
+        (x1, x0, y1, y0, code, code, x0, x1, y0, y1, max_nodes + 1)
+    )
+    node_truncated = len(rows) > max_nodes
+    rows = rows[:max_nodes]
+    result["nodes"] = [
+        {
+            "node_id": row['node_id'],
+            "type": row['type'],
+            "x": row['position_x'],
+            "y": row['position_y'],
+            "attributes": json.loads(row['attributes'])
+        }
+        for row in rows
+    ]
+    if not rows:
+        result["truncated"] = node_truncated
+        return result
+
+    node_ids = json.dumps([row['node_id'] for row in rows])
+    edge_rows = database.query_db(
+        """
+        SELECT e.edge_id, e.type, e.from_node_id, e.to_node_id, e.attributes, e.amount
+        FROM json_each(?) j, edges e
+        WHERE e.rowid IN (SELECT rowid FROM edges WHERE from_node_id = j.value ORDER BY amount DESC LIMIT ?)
+        UNION
+        SELECT e.edge_id, e.type, e.from_node_id, e.to_node_id, e.attributes, e.amount
+        FROM json_each(?) j, edges e
+        WHERE e.rowid IN (SELECT rowid FROM edges WHERE to_node_id = j.value ORDER BY amount DESC LIMIT ?)
+        ORDER BY amount DESC
+        LIMIT ?
+        """,
+        (node_ids, edges_per_node, node_ids, edges_per_node, max_edges + 1)
+    )
+    result["edges"] = [
+        {
+            "edge_id": row['edge_id'],
+            "type": row['type'],
+            "from_node": row['from_node_id'],
+            "to_node": row['to_node_id'],
+            "attributes": json.loads(row['attributes'])
+        }
+        for row in edge_rows[:max_edges]
+    ]
+    result["truncated"] = node_truncated or len(edge_rows) > max_edges
+    return result
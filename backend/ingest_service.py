@@ -0,0 +1,370 @@
+"""
+Invoice ingestion: vendor resolution, graph writes and invoice records.
+Shared by the single-invoice endpoint, the batch endpoint, file loads and
+reconciliation.
+"""
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from rapidfuzz import process, fuzz
+
+import database
+import resolution
+import audit
+import invoice_service
+import response_cache
+from models import InvoiceIngest
+
+BATCH_CHUNK_SIZE = 500
+MAX_BATCH_CHUNK_SIZE = 5000
+
+def new_vendor_node(name: str) -> Tuple[str, Dict]:
+    """Allocate a vendor node id and its initial attributes."""
+    vendor_id = str(uuid.uuid4())[:8]
+    attrs = {
+        "vendor_id": vendor_id,
+        "name": name,
+        "aliases": [name],
+        "status": "active"
+    }
+    return f"node:vendor:{vendor_id}", attrs
+
+def job_node_attrs(job_id: str) -> Dict:
+    return {"job_id": job_id, "name": f"Job {job_id}"}
+
+def payment_edge_attrs(record: Dict) -> Dict:
+    return {
+        "amount": record["amount"],
+        "currency": record["currency"],
+        "date": record["date"],
+        "source_id": record["source_id"],
+        "source": record["source"],
+        "cost_codes": record.get("cost_codes") or [],
+        "description": record.get("description")
+    }
+
+def invoice_id_for(source: str, source_id: str) -> str:
+    return f"inv:{source}:{source_id}"
+
+def create_vendor_node(name: str, actor: str = "system", reason: str = "ingestion") -> str:
+    """Create a new Vendor node for `name` and return its node id."""
+    vendor_node_id, vendor_attrs = new_vendor_node(name)
+    database.execute_db(
+        "INSERT INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
+        (vendor_node_id, "Vendor", json.dumps(vendor_attrs))
+    )
+    resolution.index_vendor(vendor_node_id, [vendor_attrs["name"]] + vendor_attrs["aliases"])
+    resolution.add_vendor_aliases(resolution.vendor_alias_entries(vendor_node_id, vendor_attrs))
+    # A reconciler's decision is a user action; plain ingestion is logged asynchronously
+    audit.log_action("NODE_CREATED", actor, vendor_node_id, {"reason": reason}, durable=actor != "system")
+    return vendor_node_id
+
+def ensure_job_node(job_id: str) -> str:
+    """Return the Job node id for `job_id`, creating the node if needed."""
+    job_node_id = f"node:job:{job_id}"
+    existing = database.query_db("SELECT 1 FROM nodes WHERE node_id = ?", (job_node_id,), one=True)
+    if not existing:
+        database.execute_db(
+            "INSERT INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
+            (job_node_id, "Job", json.dumps(job_node_attrs(job_id)))
+        )
+        audit.log_action("NODE_CREATED", "system", job_node_id, {"reason": "ingestion"}, durable=False)
+    return job_node_id
+
+def create_payment_edge(vendor_node_id: str, job_node_id: str, record: Dict) -> str:
+    """Create a PaymentFlow edge from vendor to job and return its edge id."""
+    edge_id = f"edge:txn:{uuid.uuid4()}"
+    database.execute_db(
+        "INSERT INTO edges (edge_id, type, from_node_id, to_node_id, attributes) VALUES (?, ?, ?, ?, ?)",
+        (edge_id, "PaymentFlow", vendor_node_id, job_node_id, json.dumps(payment_edge_attrs(record)))
+    )
+    # The endpoints' flow totals changed
+    response_cache.invalidate(nodes=[vendor_node_id, job_node_id])
+    return edge_id
+
+def ingest_invoice(invoice: InvoiceIngest) -> Dict:
+    """
+    Ingest a single invoice: resolve the vendor, then write the vendor/job
+    nodes, the PaymentFlow edge and the invoice record in one transaction.
+    """
+    # 1. Resolve Vendor
+    match_id, match_type, score = resolution.resolve_vendor(invoice.vendor_name)
+
+    if match_type == "CANDIDATE":
+        resolution.create_reconciliation_task(invoice.dict(), match_id, score)
+        return {"status": "queued", "message": "Vendor match uncertain. Added to reconciliation queue."}
+
+    # Everything below commits once, or not at all
+    with database.transaction():
+        if match_type == "AUTO":
+            vendor_node_id = match_id
+        else:
+            vendor_node_id = create_vendor_node(invoice.vendor_name)
+
+        # 2. Create/Link Job Node (if provided)
+        job_node_id = None
+        if invoice.job_id:
+            job_node_id = ensure_job_node(invoice.job_id)
+
+        # 3. Create Edge (Payment Flow) and detailed invoice record
+        edge_id = None
+        if vendor_node_id and job_node_id:
+            edge_id = create_payment_edge(vendor_node_id, job_node_id, invoice.dict())
+            audit.log_action("EDGE_CREATED", "system", edge_id, {"amount": invoice.amount}, durable=False)
+
+            invoice_service.create_invoice(
+                invoice_id=invoice_id_for(invoice.source, invoice.source_id),
+                source=invoice.source,
+                source_id=invoice.source_id,
+                vendor_node_id=vendor_node_id,
+                job_node_id=job_node_id,
+                amount=invoice.amount,
+                currency=invoice.currency,
+                invoice_date=invoice.date,
+                status="unapproved",
+                cost_codes=invoice.cost_codes,
+                description=invoice.description,
+                raw_payload=invoice.dict(),
+                edge_id=edge_id
+            )
+
+    return {"status": "ingested", "vendor_node": vendor_node_id, "match_type": match_type, "edge_id": edge_id}
+
+# --- Batch ingestion ---
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'record'}: {err['msg']}"
+        for err in error.errors(include_url=False)
+    )
+
+class BatchIngest:
+    """
+    Set-based ingestion of many invoices.
+
+    Vendor names are resolved once per distinct name, and names that resolve
+    to NEW are also matched against each other so that one batch never
+    creates two vendors that a sequential load would have merged. Each chunk
+    is written with executemany in a single transaction; a failing chunk is
+    rolled back and reported without affecting the others.
+    """
+
+    def __init__(self):
+        # vendor name -> (match_type, vendor_node_id, score)
+        self.decisions: Dict[str, Tuple[str, Optional[str], float]] = {}
+        # vendor node ids planned by this batch -> attributes
+        self.planned_vendors: Dict[str, Dict] = {}
+        self.created_vendors = set()
+
+    def validate(self, records: List[Any], offset: int = 0) -> Tuple[List[Tuple[int, InvoiceIngest]], List[Dict]]:
+        valid = []
+        failed = []
+        for position, record in enumerate(records):
+            index = offset + position
+            try:
+                valid.append((index, InvoiceIngest.model_validate(record)))
+            except ValidationError as e:
+                failed.append({"index": index, "status": "failed", "error": _format_validation_error(e)})
+        return valid, failed
+
+    def resolve(self, names: List[str]):
+        """Resolve every name not seen yet by this batch."""
+        pending_names = list(dict.fromkeys(name for name in names if name not in self.decisions))
+        # name -> vendor node id for vendors this batch will create
+        new_names = {attrs["name"]: node_id for node_id, attrs in self.planned_vendors.items()}
+        new_keys = {resolution.normalize_vendor_name(name): node_id for name, node_id in new_names.items()}
+
+        resolved = resolution.resolve_vendors_batch(pending_names)
+        for name in pending_names:
+            match_id, match_type, score = resolved[name]
+            if match_type != "NEW":
+                self.decisions[name] = (match_type, match_id, score)
+                continue
+
+            # Match against vendors this batch is about to create
+            key = resolution.normalize_vendor_name(name)
+            if key and key in new_keys:
+                self.decisions[name] = ("AUTO", new_keys[key], 100.0)
+                continue
+            result = process.extractOne(name, list(new_names), scorer=fuzz.token_sort_ratio) if new_names else None
+            if result and result[1] >= resolution.AUTO_MATCH_THRESHOLD:
+                self.decisions[name] = ("AUTO", new_names[result[0]], result[1])
+            elif result and result[1] >= resolution.CANDIDATE_MATCH_THRESHOLD:
+                self.decisions[name] = ("CANDIDATE", new_names[result[0]], result[1])
+            else:
+                vendor_node_id, vendor_attrs = new_vendor_node(name)
+                self.planned_vendors[vendor_node_id] = vendor_attrs
+                new_names[name] = vendor_node_id
+                if key:
+                    new_keys[key] = vendor_node_id
+                self.decisions[name] = ("NEW", vendor_node_id, score)
+
+    def write_chunk(self, chunk: List[Tuple[int, InvoiceIngest]]) -> List[Dict]:
+        """Write one chunk of validated, resolved invoices in a single transaction."""
+        try:
+            with database.transaction():
+                results, created = self._write_chunk(chunk)
+        except Exception as e:
+            return [{"index": index, "status": "failed", "error": f"chunk rolled back: {e}"} for index, _ in chunk]
+        self.created_vendors.update(created)
+        return results
+
+    def _write_chunk(self, chunk: List[Tuple[int, InvoiceIngest]]) -> Tuple[List[Dict], set]:
+        results = []
+        queued = []
+        ingest = []
+
+        invoice_ids = [invoice_id_for(inv.source, inv.source_id) for _, inv in chunk]
+        existing_invoices = set()
+        if invoice_ids:
+            placeholders = ",".join("?" * len(invoice_ids))
+            rows = database.query_db(
+                f"SELECT invoice_id FROM invoices WHERE invoice_id IN ({placeholders})",
+                tuple(invoice_ids)
+            )
+            existing_invoices = {row['invoice_id'] for row in rows}
+
+        seen_in_chunk = set()
+        for (index, inv), invoice_id in zip(chunk, invoice_ids):
+            match_type, vendor_node_id, score = self.decisions[inv.vendor_name]
+            if match_type == "CANDIDATE":
+                queued.append((index, inv, vendor_node_id, score))
+                continue
+            if invoice_id in existing_invoices or invoice_id in seen_in_chunk:
+                results.append({"index": index, "status": "failed", "error": f"duplicate invoice {invoice_id}"})
+                continue
+            seen_in_chunk.add(invoice_id)
+            ingest.append((index, inv, invoice_id, vendor_node_id, match_type))
+
+        # 1. Vendor nodes first used by this chunk (including queued candidates)
+        needed_vendors = [v for _, _, _, v, _ in ingest] + [v for _, _, v, _ in queued]
+        to_create = [
+            v for v in dict.fromkeys(needed_vendors)
+            if v in self.planned_vendors and v not in self.created_vendors
+        ]
+        if to_create:
+            database.executemany_db(
+                "INSERT INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
+                [(v, "Vendor", json.dumps(self.planned_vendors[v])) for v in to_create]
+            )
+            resolution.index_vendors([
+                (v, [self.planned_vendors[v]["name"]] + self.planned_vendors[v]["aliases"])
+                for v in to_create
+            ])
+            resolution.add_vendor_aliases([
+                entry for v in to_create
+                for entry in resolution.vendor_alias_entries(v, self.planned_vendors[v])
+            ])
+        audit_entries = [("NODE_CREATED", "system", v, {"reason": "ingestion"}) for v in to_create]
+
+        # 2. Missing Job nodes
+        job_ids = list(dict.fromkeys(inv.job_id for _, inv, _, _, _ in ingest if inv.job_id))
+        if job_ids:
+            placeholders = ",".join("?" * len(job_ids))
+            rows = database.query_db(
+                f"SELECT node_id FROM nodes WHERE node_id IN ({placeholders})",
+                tuple(f"node:job:{job_id}" for job_id in job_ids)
+            )
+            existing_jobs = {row['node_id'] for row in rows}
+            missing_jobs = [job_id for job_id in job_ids if f"node:job:{job_id}" not in existing_jobs]
+            if missing_jobs:
+                database.executemany_db(
+                    "INSERT INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
+                    [(f"node:job:{job_id}", "Job", json.dumps(job_node_attrs(job_id))) for job_id in missing_jobs]
+                )
+                audit_entries += [("NODE_CREATED", "system", f"node:job:{job_id}", {"reason": "ingestion"}) for job_id in missing_jobs]
+
+        # 3. PaymentFlow edges and invoice records
+        edge_rows = []
+        invoice_rows = []
+        first_use = set(to_create)
+        for index, inv, invoice_id, vendor_node_id, match_type in ingest:
+            if match_type == "NEW":
+                # Only the record that creates the vendor reports NEW, like a sequential load
+                match_type = "NEW" if vendor_node_id in first_use else "AUTO"
+                first_use.discard(vendor_node_id)
+
+            edge_id = None
+            if inv.job_id:
+                job_node_id = f"node:job:{inv.job_id}"
+                edge_id = f"edge:txn:{uuid.uuid4()}"
+                record = inv.dict()
+                edge_rows.append((edge_id, "PaymentFlow", vendor_node_id, job_node_id, json.dumps(payment_edge_attrs(record))))
+                audit_entries.append(("EDGE_CREATED", "system", edge_id, {"amount": inv.amount}))
+                invoice_rows.append({
+                    "invoice_id": invoice_id,
+                    "source": inv.source,
+                    "source_id": inv.source_id,
+                    "vendor_node_id": vendor_node_id,
+                    "job_node_id": job_node_id,
+                    "amount": inv.amount,
+                    "currency": inv.currency,
+                    "invoice_date": inv.date,
+                    "status": "unapproved",
+                    "cost_codes": inv.cost_codes,
+                    "description": inv.description,
+                    "raw_payload": record,
+                    "edge_id": edge_id
+                })
+            results.append({
+                "index": index,
+                "status": "ingested",
+                "vendor_node": vendor_node_id,
+                "match_type": match_type,
+                "edge_id": edge_id
+            })
+
+        if edge_rows:
+            database.executemany_db(
+                "INSERT INTO edges (edge_id, type, from_node_id, to_node_id, attributes) VALUES (?, ?, ?, ?, ?)",
+                edge_rows
+            )
+            response_cache.invalidate(nodes={node for row in edge_rows for node in row[2:4]})
+        if invoice_rows:
+            invoice_service.create_invoices(invoice_rows)
+
+        # 4. Uncertain matches go to the reconciliation queue
+        if queued:
+            resolution.create_reconciliation_tasks([(inv.dict(), candidate_id, score) for _, inv, candidate_id, score in queued])
+            results += [
+                {"index": index, "status": "queued", "candidate_id": candidate_id, "score": score}
+                for index, _, candidate_id, score in queued
+            ]
+
+        if audit_entries:
+            audit.log_actions(audit_entries, durable=False)
+
+        return results, set(to_create)
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    summary = {"total": len(results), "ingested": 0, "queued": 0, "failed": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return {
+        "summary": summary,
+        "elapsed_seconds": round(elapsed, 3),
+        "records_per_second": round(len(results) / elapsed, 1) if elapsed > 0 else None
+    }
+
+def ingest_batch(records: List[Any], chunk_size: int = BATCH_CHUNK_SIZE) -> Dict:
+    """
+    Validate, resolve and ingest many invoice records.
+    Returns per-record outcomes (ingested / queued / failed) in input order
+    along with throughput.
+    """
+    started = time.perf_counter()
+    chunk_size = max(1, min(chunk_size, MAX_BATCH_CHUNK_SIZE))
+    batch = BatchIngest()
+
+    valid, failed = batch.validate(records)
+    batch.resolve([inv.vendor_name for _, inv in valid])
+
+    results = failed
+    for start in range(0, len(valid), chunk_size):
+        results += batch.write_chunk(valid[start:start + chunk_size])
+    results.sort(key=lambda result: result["index"])
+
+    return {**summarize(results, time.perf_counter() - started), "results": results}
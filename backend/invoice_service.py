@@ -4,6 +4,7 @@ Invoice management service for detailed transaction tracking.
 import json
 from typing import List, Dict, Optional
 import database
+import response_cache
 
 def create_invoice(
     invoice_id: str,
@@ -46,8 +47,44 @@ def create_invoice(
             edge_id
         )
     )
+    if edge_id:
+        response_cache.invalidate(edges=[edge_id])
     return invoice_id
 
+def create_invoices(invoices: List[Dict]) -> int:
+    """
+    Create many invoice records in one statement.
+    Each dict takes the same keys as create_invoice's arguments.
+    """
+    count = database.executemany_db(
+        """
+        INSERT INTO invoices 
+        (invoice_id, source, source_id, vendor_node_id, job_node_id, 
+         amount, currency, invoice_date, status, cost_codes, description, raw_payload, edge_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                inv["invoice_id"],
+                inv["source"],
+                inv["source_id"],
+                inv.get("vendor_node_id"),
+                inv.get("job_node_id"),
+                inv["amount"],
+                inv["currency"],
+                inv["invoice_date"],
+                inv.get("status", "unapproved"),
+                json.dumps(inv["cost_codes"]) if inv.get("cost_codes") else None,
+                inv.get("description"),
+                json.dumps(inv["raw_payload"]) if inv.get("raw_payload") else None,
+                inv.get("edge_id")
+            )
+            for inv in invoices
+        ]
+    )
+    response_cache.invalidate(edges={inv["edge_id"] for inv in invoices if inv.get("edge_id")})
+    return count
+
 def get_invoices_by_edge(edge_id: str) -> List[Dict]:
     """
     Get all invoices associated with an edge.
@@ -112,16 +149,18 @@ def update_invoice_status(invoice_id: str, new_status: str, actor: str):
     """
     Update invoice status and log the change.
     """
-    database.execute_db(
-        "UPDATE invoices SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE invoice_id = ?",
-        (new_status, invoice_id)
-    )
+    with database.transaction():
+        database.execute_db(
+            "UPDATE invoices SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE invoice_id = ?",
+            (new_status, invoice_id)
+        )
+        response_cache.invalidate(invoices=[invoice_id])
     
-    # Log the change
-    import audit
-    audit.log_action(
-        "INVOICE_STATUS_CHANGE",
-        actor,
-        invoice_id,
-        {"new_status": new_status}
-    )
+        # Log the change
+        import audit
+        audit.log_action(
+            "INVOICE_STATUS_CHANGE",
+            actor,
+            invoice_id,
+            {"new_status": new_status}
+        )
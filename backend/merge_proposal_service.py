@@ -19,32 +19,33 @@ def create_merge_proposal(
     # Calculate preview of consequences
     metadata = _calculate_merge_consequences(survivor_id, victim_ids)
     
-    proposal_id = database.execute_db(
-        """
-        INSERT INTO merge_proposals 
-        (survivor_id, victim_ids, proposed_by, reason, metadata)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (
-            survivor_id,
-            json.dumps(victim_ids),
-            proposed_by,
-            reason,
-            json.dumps(metadata)
+    with database.transaction():
+        proposal_id = database.execute_db(
+            """
+            INSERT INTO merge_proposals 
+            (survivor_id, victim_ids, proposed_by, reason, metadata)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                survivor_id,
+                json.dumps(victim_ids),
+                proposed_by,
+                reason,
+                json.dumps(metadata)
+            )
         )
-    )
     
-    # Log proposal creation
-    audit.log_action(
-        "MERGE_PROPOSED",
-        proposed_by,
-        survivor_id,
-        {
-            "proposal_id": proposal_id,
-            "victim_ids": victim_ids,
-            "reason": reason
-        }
-    )
+        # Log proposal creation
+        audit.log_action(
+            "MERGE_PROPOSED",
+            proposed_by,
+            survivor_id,
+            {
+                "proposal_id": proposal_id,
+                "victim_ids": victim_ids,
+                "reason": reason
+            }
+        )
     
     return proposal_id
 
@@ -69,33 +70,34 @@ def approve_merge_proposal(proposal_id: int, approved_by: str, notes: Optional[s
     survivor_id = proposal['survivor_id']
     victim_ids = json.loads(proposal['victim_ids'])
     
-    # Execute merge for each victim
-    import merge_service
-    for victim_id in victim_ids:
-        merge_service.merge_vendors(
-            survivor_id,
-            victim_id,
-            approved_by,
-            f"Approved proposal #{proposal_id}"
+    with database.transaction():
+        # Execute merge for each victim
+        import merge_service
+        for victim_id in victim_ids:
+            merge_service.merge_vendors(
+                survivor_id,
+                victim_id,
+                approved_by,
+                f"Approved proposal #{proposal_id}"
+            )
+    
+        # Update proposal status
+        database.execute_db(
+            "UPDATE merge_proposals SET status = 'approved', approved_by = ?, approved_at = CURRENT_TIMESTAMP WHERE proposal_id = ?",
+            (approved_by, proposal_id)
         )
     
-    # Update proposal status
-    database.execute_db(
-        "UPDATE merge_proposals SET status = 'approved', approved_by = ?, approved_at = CURRENT_TIMESTAMP WHERE proposal_id = ?",
-        (approved_by, proposal_id)
-    )
-    
-    # Log approval
-    audit.log_action(
-        "MERGE_APPROVED",
-        approved_by,
-        survivor_id,
-        {
-            "proposal_id": proposal_id,
-            "victim_ids": victim_ids,
-            "notes": notes
-        }
-    )
+        # Log approval
+        audit.log_action(
+            "MERGE_APPROVED",
+            approved_by,
+            survivor_id,
+            {
+                "proposal_id": proposal_id,
+                "victim_ids": victim_ids,
+                "notes": notes
+            }
+        )
     
     return True
 
@@ -103,27 +105,28 @@ def reject_merge_proposal(proposal_id: int, rejected_by: str, reason: str) -> bo
     """
     Reject a merge proposal.
     """
-    database.execute_db(
-        "UPDATE merge_proposals SET status = 'rejected', approved_by = ?, approved_at = CURRENT_TIMESTAMP, rejection_reason = ? WHERE proposal_id = ?",
-        (rejected_by, reason, proposal_id)
-    )
+    with database.transaction():
+        database.execute_db(
+            "UPDATE merge_proposals SET status = 'rejected', approved_by = ?, approved_at = CURRENT_TIMESTAMP, rejection_reason = ? WHERE proposal_id = ?",
+            (rejected_by, reason, proposal_id)
+        )
     
-    # Log rejection
-    proposal = database.query_db(
-        "SELECT * FROM merge_proposals WHERE proposal_id = ?",
-        (proposal_id,),
-        one=True
-    )
+        # Log rejection
+        proposal = database.query_db(
+            "SELECT * FROM merge_proposals WHERE proposal_id = ?",
+            (proposal_id,),
+            one=True
+        )
     
-    audit.log_action(
-        "MERGE_REJECTED",
-        rejected_by,
-        proposal['survivor_id'],
-        {
-            "proposal_id": proposal_id,
-            "reason": reason
-        }
-    )
+        audit.log_action(
+            "MERGE_REJECTED",
+            rejected_by,
+            proposal['survivor_id'],
+            {
+                "proposal_id": proposal_id,
+                "reason": reason
+            }
+        )
     
     return True
 
@@ -191,7 +194,7 @@ def _calculate_merge_consequences(survivor_id: str, victim_ids: List[str]) -> Di
         
         # Sum transaction values
         total_flow = database.query_db(
-            "SELECT SUM(CAST(json_extract(attributes, '$.amount') AS REAL)) as total FROM edges WHERE from_node_id = ? OR to_node_id = ?",
+            "SELECT SUM(amount) as total FROM edges WHERE from_node_id = ? OR to_node_id = ?",
             (victim_id, victim_id),
             one=True
         )
@@ -0,0 +1,30 @@
+-- Migration M10: Change counters for the graph summary cache
+
+-- Inserts are picked up incrementally by rowid; these counters only move on
+-- updates and deletes, which make the cached grouping rebuild
+INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('node_change_version', 0);
+INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('edge_change_version', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_node_change_update
+AFTER UPDATE OF type, attributes ON nodes
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'node_change_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_node_change_delete
+AFTER DELETE ON nodes
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'node_change_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_edge_change_update
+AFTER UPDATE OF type, from_node_id, to_node_id, attributes ON edges
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'edge_change_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_edge_change_delete
+AFTER DELETE ON edges
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'edge_change_version';
+END;
@@ -0,0 +1,4 @@
+-- Migration M11: Heaviest-edges-first lookups for neighborhood fan-out caps
+
+CREATE INDEX IF NOT EXISTS idx_edges_from_amount ON edges(from_node_id, amount DESC);
+CREATE INDEX IF NOT EXISTS idx_edges_to_amount ON edges(to_node_id, amount DESC);
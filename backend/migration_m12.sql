@@ -0,0 +1,51 @@
+-- Migration M12: Spatial index over saved layout positions
+
+-- Small integer code per layout owner, so the owner can be an R*Tree dimension
+CREATE TABLE IF NOT EXISTS layout_users (
+    user_code INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL UNIQUE
+);
+
+-- One point per graph_layouts row (id = layout_id); min_u = max_u = user_code.
+-- The triggers avoid OR IGNORE/OR REPLACE: inside a trigger the outer
+-- statement's conflict policy wins, and REPLACE would renumber user codes.
+CREATE VIRTUAL TABLE IF NOT EXISTS graph_layouts_rtree USING rtree(
+    id, min_x, max_x, min_y, max_y, min_u, max_u
+);
+
+-- Initial fill; a no-op once the index has rows
+INSERT OR IGNORE INTO layout_users (user_id) SELECT DISTINCT user_id FROM graph_layouts;
+INSERT INTO graph_layouts_rtree (id, min_x, max_x, min_y, max_y, min_u, max_u)
+SELECT g.layout_id, g.position_x, g.position_x, g.position_y, g.position_y, u.user_code, u.user_code
+FROM graph_layouts g JOIN layout_users u ON u.user_id = g.user_id
+WHERE g.position_x IS NOT NULL AND g.position_y IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM graph_layouts_rtree);
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_layouts_rtree_insert
+AFTER INSERT ON graph_layouts
+WHEN NEW.position_x IS NOT NULL AND NEW.position_y IS NOT NULL
+BEGIN
+    INSERT INTO layout_users (user_id)
+    SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM layout_users WHERE user_id = NEW.user_id);
+    INSERT INTO graph_layouts_rtree (id, min_x, max_x, min_y, max_y, min_u, max_u)
+    SELECT NEW.layout_id, NEW.position_x, NEW.position_x, NEW.position_y, NEW.position_y, user_code, user_code
+    FROM layout_users WHERE user_id = NEW.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_layouts_rtree_update
+AFTER UPDATE OF position_x, position_y, user_id ON graph_layouts
+BEGIN
+    DELETE FROM graph_layouts_rtree WHERE id = OLD.layout_id;
+    INSERT INTO layout_users (user_id)
+    SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM layout_users WHERE user_id = NEW.user_id);
+    INSERT INTO graph_layouts_rtree (id, min_x, max_x, min_y, max_y, min_u, max_u)
+    SELECT NEW.layout_id, NEW.position_x, NEW.position_x, NEW.position_y, NEW.position_y, user_code, user_code
+    FROM layout_users
+    WHERE user_id = NEW.user_id AND NEW.position_x IS NOT NULL AND NEW.position_y IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_layouts_rtree_delete
+AFTER DELETE ON graph_layouts
+BEGIN
+    DELETE FROM graph_layouts_rtree WHERE id = OLD.layout_id;
+END;
@@ -0,0 +1,113 @@
+-- Migration M13: Graph version for conditional reads
+
+-- Bumped by any row change in the tables behind the polled read endpoints,
+-- so an unchanged version means an unchanged response (ETag / 304)
+INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('graph_version', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_nodes_insert
+AFTER INSERT ON nodes
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_nodes_update
+AFTER UPDATE ON nodes
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_nodes_delete
+AFTER DELETE ON nodes
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_edges_insert
+AFTER INSERT ON edges
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_edges_update
+AFTER UPDATE ON edges
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_edges_delete
+AFTER DELETE ON edges
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_invoices_insert
+AFTER INSERT ON invoices
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_invoices_update
+AFTER UPDATE ON invoices
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_invoices_delete
+AFTER DELETE ON invoices
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_attachments_insert
+AFTER INSERT ON attachments
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_attachments_update
+AFTER UPDATE ON attachments
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_attachments_delete
+AFTER DELETE ON attachments
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_reconciliation_queue_insert
+AFTER INSERT ON reconciliation_queue
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_reconciliation_queue_update
+AFTER UPDATE ON reconciliation_queue
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_reconciliation_queue_delete
+AFTER DELETE ON reconciliation_queue
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_merge_proposals_insert
+AFTER INSERT ON merge_proposals
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_merge_proposals_update
+AFTER UPDATE ON merge_proposals
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_version_merge_proposals_delete
+AFTER DELETE ON merge_proposals
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'graph_version';
+END;
@@ -0,0 +1,55 @@
+-- Migration M14: Change log for delta sync and live push
+
+-- One row per node/edge create, update, delete or merge, appended by
+-- triggers so it commits (or rolls back) with the change itself.
+-- AUTOINCREMENT keeps sequence numbers from being reused after pruning.
+CREATE TABLE IF NOT EXISTS graph_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,      -- 'node' | 'edge'
+    op TEXT NOT NULL,          -- 'create' | 'update' | 'delete' | 'merge'
+    entity_id TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_changes_node_insert
+AFTER INSERT ON nodes
+BEGIN
+    INSERT INTO graph_changes (entity, op, entity_id) VALUES ('node', 'create', NEW.node_id);
+END;
+
+-- A node whose status turns 'merged' is reported as a merge
+CREATE TRIGGER IF NOT EXISTS trg_graph_changes_node_update
+AFTER UPDATE ON nodes
+BEGIN
+    INSERT INTO graph_changes (entity, op, entity_id) VALUES (
+        'node',
+        CASE WHEN json_extract(NEW.attributes, '$.status') = 'merged'
+              AND json_extract(OLD.attributes, '$.status') IS NOT 'merged'
+             THEN 'merge' ELSE 'update' END,
+        NEW.node_id
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_changes_node_delete
+AFTER DELETE ON nodes
+BEGIN
+    INSERT INTO graph_changes (entity, op, entity_id) VALUES ('node', 'delete', OLD.node_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_changes_edge_insert
+AFTER INSERT ON edges
+BEGIN
+    INSERT INTO graph_changes (entity, op, entity_id) VALUES ('edge', 'create', NEW.edge_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_changes_edge_update
+AFTER UPDATE ON edges
+BEGIN
+    INSERT INTO graph_changes (entity, op, entity_id) VALUES ('edge', 'update', NEW.edge_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_graph_changes_edge_delete
+AFTER DELETE ON edges
+BEGIN
+    INSERT INTO graph_changes (entity, op, entity_id) VALUES ('edge', 'delete', OLD.edge_id);
+END;
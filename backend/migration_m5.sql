@@ -0,0 +1,17 @@
+-- Migration M5: Resumable file ingestion
+
+-- One row per source file; byte_offset is the end of the last committed chunk
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    source_path TEXT PRIMARY KEY,
+    format TEXT NOT NULL,          -- 'ndjson' or 'csv'
+    byte_offset INTEGER NOT NULL DEFAULT 0,
+    file_size INTEGER,
+    records_read INTEGER DEFAULT 0,
+    ingested INTEGER DEFAULT 0,
+    queued INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    status TEXT DEFAULT 'running', -- 'running', 'completed', 'failed'
+    error TEXT,
+    started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
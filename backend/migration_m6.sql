@@ -0,0 +1,28 @@
+-- Migration M6: Change counters for in-process indexes
+
+-- Monotonic counters bumped by triggers, so every process (and any
+-- out-of-band write) can tell when its cached view is stale
+CREATE TABLE IF NOT EXISTS graph_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('vendor_version', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_vendor_version_insert
+AFTER INSERT ON nodes WHEN NEW.type = 'Vendor'
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'vendor_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_vendor_version_update
+AFTER UPDATE OF type, attributes ON nodes WHEN OLD.type = 'Vendor' OR NEW.type = 'Vendor'
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'vendor_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_vendor_version_delete
+AFTER DELETE ON nodes WHEN OLD.type = 'Vendor'
+BEGIN
+    UPDATE graph_meta SET value = value + 1 WHERE key = 'vendor_version';
+END;
@@ -0,0 +1,11 @@
+-- Migration M7: Normalized vendor alias keys
+
+-- vendor_aliases.alias holds normalized keys (see resolution.normalize_vendor_name);
+-- one row per (vendor, key)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_vendor_aliases_vendor_alias ON vendor_aliases(vendor_node_id, alias);
+
+CREATE TRIGGER IF NOT EXISTS trg_vendor_aliases_delete
+AFTER DELETE ON nodes WHEN OLD.type = 'Vendor'
+BEGIN
+    DELETE FROM vendor_aliases WHERE vendor_node_id = OLD.node_id;
+END;
@@ -0,0 +1,12 @@
+-- Migration M8: Indexed edge amount/date columns
+-- (the generated columns themselves are added by database._add_edge_columns,
+-- since ALTER TABLE ADD COLUMN cannot be made idempotent in SQL)
+
+-- Per-node flows by date; amount is included so sums are answered from the index
+CREATE INDEX IF NOT EXISTS idx_edges_from_date ON edges(from_node_id, date, amount);
+CREATE INDEX IF NOT EXISTS idx_edges_to_date ON edges(to_node_id, date, amount);
+CREATE INDEX IF NOT EXISTS idx_edges_date_amount ON edges(date, amount);
+
+-- Superseded by the composite indexes above
+DROP INDEX IF EXISTS idx_edges_from;
+DROP INDEX IF EXISTS idx_edges_to;
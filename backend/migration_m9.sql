@@ -0,0 +1,74 @@
+-- Migration M9: Incrementally maintained node flow totals
+
+-- Per-node inflow/outflow totals, kept current by the edge triggers below in
+-- the same transaction as the edge write. Verify/rebuild with node_stats.py.
+CREATE TABLE IF NOT EXISTS node_stats (
+    node_id TEXT PRIMARY KEY,
+    inflow_total REAL NOT NULL DEFAULT 0,
+    inflow_count INTEGER NOT NULL DEFAULT 0,
+    outflow_total REAL NOT NULL DEFAULT 0,
+    outflow_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Initial fill; a no-op once the table has rows
+INSERT INTO node_stats (node_id, inflow_total, inflow_count, outflow_total, outflow_count)
+SELECT node_id, SUM(inflow_total), SUM(inflow_count), SUM(outflow_total), SUM(outflow_count)
+FROM (
+    SELECT to_node_id AS node_id, COALESCE(SUM(amount), 0) AS inflow_total, COUNT(*) AS inflow_count,
+           0 AS outflow_total, 0 AS outflow_count
+    FROM edges GROUP BY to_node_id
+    UNION ALL
+    SELECT from_node_id, 0, 0, COALESCE(SUM(amount), 0), COUNT(*)
+    FROM edges GROUP BY from_node_id
+)
+WHERE NOT EXISTS (SELECT 1 FROM node_stats)
+GROUP BY node_id;
+
+CREATE TRIGGER IF NOT EXISTS trg_node_stats_edge_insert
+AFTER INSERT ON edges
+BEGIN
+    INSERT OR IGNORE INTO node_stats (node_id) VALUES (NEW.to_node_id), (NEW.from_node_id);
+    UPDATE node_stats SET inflow_total = inflow_total + COALESCE(NEW.amount, 0), inflow_count = inflow_count + 1
+    WHERE node_id = NEW.to_node_id;
+    UPDATE node_stats SET outflow_total = outflow_total + COALESCE(NEW.amount, 0), outflow_count = outflow_count + 1
+    WHERE node_id = NEW.from_node_id;
+END;
+
+-- Edge moves (merge_vendors) and amount edits
+CREATE TRIGGER IF NOT EXISTS trg_node_stats_edge_update
+AFTER UPDATE OF from_node_id, to_node_id, attributes ON edges
+BEGIN
+    UPDATE node_stats SET inflow_total = inflow_total - COALESCE(OLD.amount, 0), inflow_count = inflow_count - 1
+    WHERE node_id = OLD.to_node_id;
+    UPDATE node_stats SET outflow_total = outflow_total - COALESCE(OLD.amount, 0), outflow_count = outflow_count - 1
+    WHERE node_id = OLD.from_node_id;
+    INSERT OR IGNORE INTO node_stats (node_id) VALUES (NEW.to_node_id), (NEW.from_node_id);
+    UPDATE node_stats SET inflow_total = inflow_total + COALESCE(NEW.amount, 0), inflow_count = inflow_count + 1
+    WHERE node_id = NEW.to_node_id;
+    UPDATE node_stats SET outflow_total = outflow_total + COALESCE(NEW.amount, 0), outflow_count = outflow_count + 1
+    WHERE node_id = NEW.from_node_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_node_stats_edge_delete
+AFTER DELETE ON edges
+BEGIN
+    UPDATE node_stats SET inflow_total = inflow_total - COALESCE(OLD.amount, 0), inflow_count = inflow_count - 1
+    WHERE node_id = OLD.to_node_id;
+    UPDATE node_stats SET outflow_total = outflow_total - COALESCE(OLD.amount, 0), outflow_count = outflow_count - 1
+    WHERE node_id = OLD.from_node_id;
+END;
+
+-- Aggregates now come from node_stats instead of an OR join over edges
+DROP VIEW IF EXISTS vendor_stats;
+CREATE VIEW vendor_stats AS
+SELECT 
+    n.node_id,
+    n.type,
+    json_extract(n.attributes, '$.name') as vendor_name,
+    COALESCE(s.inflow_total, 0) as total_inflow,
+    COALESCE(s.outflow_total, 0) as total_outflow,
+    COALESCE(s.inflow_count, 0) as inflow_count,
+    COALESCE(s.outflow_count, 0) as outflow_count
+FROM nodes n
+LEFT JOIN node_stats s ON s.node_id = n.node_id
+WHERE n.type IN ('Vendor', 'Company', 'Job');
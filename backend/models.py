@@ -29,6 +29,12 @@ class InvoiceIngest(BaseModel):
     description: Optional[str] = None
     attachments: Optional[List[str]] = None
 
+class FileIngestRequest(BaseModel):
+    path: str
+    format: Optional[str] = None  # 'ndjson' or 'csv'; inferred from the extension
+    chunk_size: int = 1000
+    restart: bool = False
+
 class MergeRequest(BaseModel):
     survivor_id: str
     victim_id: str
@@ -76,6 +82,13 @@ class GraphLayout(BaseModel):
     position_y: float
     user_id: str = "default"
 
+class GraphLayoutDelta(BaseModel):
+    """Packed positions: positions[2*i], positions[2*i+1] are x, y of node_ids[i]."""
+    node_ids: List[str]
+    positions: List[float]
+    threshold: float = 0.0
+    user_id: str = "default"
+
 class SystemMetric(BaseModel):
     metric_name: str
     metric_value: float
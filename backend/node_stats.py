@@ -0,0 +1,101 @@
+"""
+Per-node flow totals (migration M9).
+
+`node_stats` is maintained by edge triggers inside whatever transaction
+writes the edge, so reads are a primary-key lookup. This module reads it
+and can check or rebuild it from the edges table.
+
+Usage:
+    python node_stats.py            # verify, exit 1 on mismatch
+    python node_stats.py --rebuild  # recompute from edges
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+import database
+
+# Totals are float sums built up incrementally; allow for rounding drift
+TOLERANCE = 0.01
+
+STAT_FIELDS = ("inflow_total", "inflow_count", "outflow_total", "outflow_count")
+
+EXPECTED_STATS_SQL = """
+SELECT node_id, SUM(inflow_total) AS inflow_total, SUM(inflow_count) AS inflow_count,
+       SUM(outflow_total) AS outflow_total, SUM(outflow_count) AS outflow_count
+FROM (
+    SELECT to_node_id AS node_id, COALESCE(SUM(amount), 0) AS inflow_total, COUNT(*) AS inflow_count,
+           0 AS outflow_total, 0 AS outflow_count
+    FROM edges GROUP BY to_node_id
+    UNION ALL
+    SELECT from_node_id, 0, 0, COALESCE(SUM(amount), 0), COUNT(*)
+    FROM edges GROUP BY from_node_id
+)
+GROUP BY node_id
+"""
+
+def get_node_stats(node_id: str) -> Dict:
+    row = database.query_db("SELECT * FROM node_stats WHERE node_id = ?", (node_id,), one=True)
+    if not row:
+        return {field: 0 for field in STAT_FIELDS}
+    return {field: row[field] for field in STAT_FIELDS}
+
+def get_top_nodes(node_type: str, order_by: str = "outflow_total", limit: int = 10) -> List[Dict]:
+    """Nodes of `node_type` with the largest `order_by` stat, for dashboards."""
+    if order_by not in STAT_FIELDS:
+        raise ValueError(f"order_by must be one of {STAT_FIELDS}")
+    rows = database.query_db(
+        f"""
+        SELECT n.node_id, json_extract(n.attributes, '$.name') AS name, s.*
+        FROM node_stats s JOIN nodes n ON n.node_id = s.node_id
+        WHERE n.type = ?
+        ORDER BY s.{order_by} DESC
+        LIMIT ?
+        """,
+        (node_type, limit)
+    )
+    return [
+        {"node_id": row['node_id'], "name": row['name'], **{field: row[field] for field in STAT_FIELDS}}
+        for row in rows
+    ]
+
+def verify_node_stats() -> Dict:
+    """Compare stored totals with a fresh aggregation over edges."""
+    expected = {row['node_id']: row for row in database.query_db(EXPECTED_STATS_SQL)}
+    stored = {row['node_id']: row for row in database.query_db("SELECT * FROM node_stats")}
+
+    mismatches = []
+    for node_id in expected.keys() | stored.keys():
+        want, have = expected.get(node_id), stored.get(node_id)
+        for field in STAT_FIELDS:
+            want_value = want[field] if want else 0
+            have_value = have[field] if have else 0
+            if abs(want_value - have_value) > TOLERANCE:
+                mismatches.append({"node_id": node_id, "field": field, "expected": want_value, "stored": have_value})
+    return {"checked": len(expected.keys() | stored.keys()), "mismatches": mismatches}
+
+def rebuild_node_stats() -> int:
+    """Recompute every row from edges; returns the number of nodes with flows."""
+    with database.transaction():
+        database.execute_db("DELETE FROM node_stats")
+        database.execute_db(
+            f"INSERT INTO node_stats (node_id, {', '.join(STAT_FIELDS)}) {EXPECTED_STATS_SQL}"
+        )
+        row = database.query_db("SELECT COUNT(*) AS cnt FROM node_stats", one=True)
+    return row['cnt']
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild node_stats against the edges table.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all totals from edges")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.rebuild:
+        print(f"Rebuilt node_stats for {rebuild_node_stats()} nodes")
+    result = verify_node_stats()
+    print(json.dumps({"checked": result["checked"], "mismatches": result["mismatches"][:20]}, indent=2))
+    sys.exit(1 if result["mismatches"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,283 @@
 from rapidfuzz import process, fuzz
-from typing import List, Dict, Optional, Tuple
+from array import array
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
+import numpy as np
 import json
+import re
+import threading
+import time
 import database
 
 # Thresholds from PRD
 AUTO_MATCH_THRESHOLD = 95.0
 CANDIDATE_MATCH_THRESHOLD = 75.0
 
+# Candidate blocking: below BLOCKING_MIN_CHOICES the index is scored
+# exhaustively; above it, only the BLOCKING_CANDIDATES choices sharing the
+# largest fraction of trigrams with the query are scored. A blocked best in
+# the CANDIDATE band is confirmed against every choice in the length window,
+# so review tasks point at the same vendor an exhaustive scan would pick;
+# AUTO and NEW answers come from the blocked set alone.
+BLOCKING_MIN_CHOICES = 5000
+BLOCKING_CANDIDATES = 1000
+# fuzz.ratio = 200 * LCS / (len_a + len_b) <= 200 * short / (short + long),
+# so a choice can only reach the candidate threshold when
+# short / long >= T / (200 - T); anything outside that window is skipped.
+BLOCKING_MIN_LENGTH_RATIO = CANDIDATE_MATCH_THRESHOLD / (200.0 - CANDIDATE_MATCH_THRESHOLD)
+
+# Batch resolution scores names x choices in one cdist matrix; queries are
+# split so a single matrix stays under BATCH_MATRIX_CELLS float64 scores.
+BATCH_MATRIX_CELLS = 4_000_000
+BATCH_WORKERS = -1  # all cores
+
 def get_canonical_vendors() -> List[Dict]:
     """Fetch all existing vendor nodes to match against."""
-    rows = database.query_db("SELECT node_id, attributes FROM nodes WHERE type = 'Vendor'")
+    rows = database.query_db("SELECT node_id, attributes FROM nodes WHERE type = 'Vendor' ORDER BY rowid")
     vendors = []
     for row in rows:
         attrs = json.loads(row['attributes'])
         vendors.append({
             "id": row['node_id'],
             "name": attrs.get("name", ""),
-            "aliases": attrs.get("aliases", [])
+            "aliases": attrs.get("aliases", []),
+            "merged_into": attrs.get("merged_into") if attrs.get("status") == "merged" else None
         })
     return vendors
 
-def resolve_vendor(raw_name: str) -> Tuple[Optional[str], str, float]:
+def _sort_tokens(name: str) -> str:
+    # token_sort_ratio(a, b) == ratio(_sort_tokens(a), _sort_tokens(b)), so
+    # choices are stored pre-sorted and scored with the cheaper fuzz.ratio
+    return " ".join(sorted(name.split()))
+
+def _trigrams(processed: str) -> set:
+    padded = f" {processed.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Trailing legal-form tokens dropped by normalize_vendor_name
+LEGAL_SUFFIXES = {
+    "co", "company", "corp", "corporation", "inc", "incorporated", "llc", "llp",
+    "lp", "ltd", "limited", "plc", "pty", "gmbh"
+}
+
+def normalize_vendor_name(name: str) -> str:
     """
-    Attempts to match a raw vendor name against the canonical graph.
-    Returns: (match_id, match_type, score)
-    match_type: "AUTO", "CANDIDATE", "NEW"
+    Exact-match key for a vendor name: case-folded, punctuation collapsed to
+    single spaces and trailing legal suffixes removed, so "ACME Supply Co."
+    and "Acme Supply" share the key "acme supply". Dots and apostrophes are
+    dropped rather than split on, keeping "L.L.C." and "O'Neil" whole.
     """
-    vendors = get_canonical_vendors()
-    
-    if not vendors:
-        return None, "NEW", 0.0
+    folded = re.sub(r"[.'’]", "", name.casefold())
+    tokens = re.sub(r"[\W_]+", " ", folded).split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+def get_vendor_version() -> int:
+    """Counter bumped by the M6 triggers on every Vendor node write."""
+    row = database.query_db("SELECT value FROM graph_meta WHERE key = 'vendor_version'", one=True)
+    return row['value'] if row else 0
+
+def _extract(processed_query: str, choices: Dict[str, str]):
+    # extractOne over a mapping returns (processed_value, score, raw_key)
+    return process.extractOne(processed_query, choices, scorer=fuzz.ratio) if choices else None
+
+class VendorIndex:
+    """
+    Resident matching index over vendor names and aliases.
+
+    `choices` maps each raw name/alias to its vendor id, exactly like the
+    dict resolve_vendor used to rebuild per call, and `processed` holds the
+    same keys with their tokens pre-sorted. The index remembers which
+    vendor_version it reflects: in-process writes patch it on commit, and
+    any other change (another worker, a script) makes it rebuild lazily.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version: Optional[int] = None
+        self.choices: Dict[str, str] = {}
+        self.processed: Dict[str, str] = {}
+        # Blocking: trigram -> positions into `keys` (insertion order of choices),
+        # plus each key's processed length and distinct trigram count
+        self.keys: List[str] = []
+        self.postings: Dict[str, array] = {}
+        self.lengths = array('i')
+        self.gram_counts = array('i')
+        self.stats = {
+            "rebuilds": 0, "incremental_updates": 0, "stale_updates": 0,
+            "blocked_lookups": 0, "confirmed_lookups": 0, "exhaustive_lookups": 0
+        }
+
+    def rebuild(self, version: int):
+        self.choices = {}
+        self.processed = {}
+        self.keys = []
+        self.postings = {}
+        self.lengths = array('i')
+        self.gram_counts = array('i')
+        vendors = get_canonical_vendors()
+        merged_into = {v["id"]: v["merged_into"] for v in vendors if v["merged_into"]}
+        for v in vendors:
+            # Names of merged vendors resolve to the end of the merge chain
+            target, hops = v["id"], 0
+            while target in merged_into and hops < len(merged_into):
+                target, hops = merged_into[target], hops + 1
+            self.add(target, [v["name"]] + v["aliases"])
+        self.version = version
+        self.stats["rebuilds"] += 1
+
+    def ensure_current(self):
+        version = get_vendor_version()
+        if version != self.version:
+            self.rebuild(version)
+
+    def add(self, vendor_id: str, names: List[str]):
+        for name in names:
+            if name not in self.choices:
+                processed = _sort_tokens(name)
+                self.processed[name] = processed
+                position = len(self.keys)
+                self.keys.append(name)
+                grams = _trigrams(processed)
+                self.lengths.append(len(processed))
+                self.gram_counts.append(len(grams))
+                for gram in grams:
+                    self.postings.setdefault(gram, array('i')).append(position)
+            self.choices[name] = vendor_id
+
+    def redirect(self, old_id: str, new_id: str):
+        for name, vendor_id in self.choices.items():
+            if vendor_id == old_id:
+                self.choices[name] = new_id
+
+    def apply(self, version: int, bumps: int, update: Callable[["VendorIndex"], None]):
+        """Apply a committed write that moved vendor_version by `bumps` to `version`."""
+        with self.lock:
+            if self.version is not None and self.version + bumps == version:
+                update(self)
+                self.version = version
+                self.stats["incremental_updates"] += 1
+            else:
+                # Something else changed vendors in between; rebuild on next use
+                self.version = None
+                self.stats["stale_updates"] += 1
+
+    def candidates(self, processed_query: str, blocked: bool = True) -> Dict[str, str]:
+        """
+        Choices whose length can still reach the candidate threshold, blocked
+        down to the BLOCKING_CANDIDATES with the highest trigram overlap
+        (shared / max(query grams, choice grams)) unless `blocked` is False.
+        Returned in insertion order so ties break exactly as they do in an
+        exhaustive scan.
+        """
+        lengths = np.frombuffer(self.lengths, dtype=np.int32)
+        query_length = len(processed_query)
+        in_window = (
+            (lengths >= query_length * BLOCKING_MIN_LENGTH_RATIO)
+            & (lengths * BLOCKING_MIN_LENGTH_RATIO <= query_length)
+        )
+        if not blocked:
+            return {self.keys[p]: self.processed[self.keys[p]] for p in np.flatnonzero(in_window).tolist()}
+
+        grams = _trigrams(processed_query)
+        lists = [np.frombuffer(self.postings[gram], dtype=np.int32) for gram in grams if gram in self.postings]
+        if not lists:
+            return {}
+        # Shared trigrams per choice, counted over every posting list in one pass
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+        eligible = np.flatnonzero((shared > 0) & in_window)
+        if len(eligible) > BLOCKING_CANDIDATES:
+            gram_counts = np.frombuffer(self.gram_counts, dtype=np.int32)[eligible]
+            similarity = shared[eligible] / np.maximum(gram_counts, len(grams))
+            eligible = np.sort(eligible[np.argpartition(-similarity, BLOCKING_CANDIDATES - 1)[:BLOCKING_CANDIDATES]])
+        return {self.keys[p]: self.processed[self.keys[p]] for p in eligible.tolist()}
+
+    def best_match(self, raw_name: str, exhaustive: bool = False) -> Optional[Tuple[str, float]]:
+        """
+        Best (vendor_id, score) for `raw_name`. Above BLOCKING_MIN_CHOICES
+        only the blocked candidates are scored, and a CANDIDATE-band best is
+        confirmed over the whole length window; `exhaustive` scores every
+        choice and exists for check_blocking_recall.
+        """
+        if not self.choices:
+            return None
+        processed_query = _sort_tokens(raw_name)
+        if exhaustive or len(self.processed) <= BLOCKING_MIN_CHOICES:
+            self.stats["exhaustive_lookups"] += 1
+            result = _extract(processed_query, self.processed)
+        else:
+            self.stats["blocked_lookups"] += 1
+            result = _extract(processed_query, self.candidates(processed_query))
+            # Anything scoring >= CANDIDATE lies in the length window, so
+            # rescoring the window gives the exhaustive answer for this band
+            if result and CANDIDATE_MATCH_THRESHOLD <= result[1] < AUTO_MATCH_THRESHOLD:
+                self.stats["confirmed_lookups"] += 1
+                result = _extract(processed_query, self.candidates(processed_query, blocked=False))
+        if not result:
+            return None
+        _, score, match_name = result
+        return self.choices[match_name], score
+
+    def best_matches(self, raw_names: List[str], workers: int = BATCH_WORKERS) -> List[Optional[Tuple[str, float]]]:
+        """
+        best_match(name, exhaustive=True) for many names at once, scored as
+        one names x choices matrix across `workers` cores. argmax keeps the
+        first of equal scores, the same tie-break as extractOne.
+        """
+        if not self.choices:
+            return [None] * len(raw_names)
+        keys = list(self.processed)
+        choices = list(self.processed.values())
+        queries = [_sort_tokens(name) for name in raw_names]
+        rows = max(1, BATCH_MATRIX_CELLS // len(choices))
+
+        matches = []
+        for start in range(0, len(queries), rows):
+            scores = process.cdist(
+                queries[start:start + rows], choices,
+                scorer=fuzz.ratio, dtype=np.float64, workers=workers
+            )
+            best = scores.argmax(axis=1)
+            for row, column in enumerate(best):
+                matches.append((self.choices[keys[column]], float(scores[row, column])))
+        return matches
+
+_index = VendorIndex()
+
+def _schedule_index_update(bumps: int, update: Callable[[VendorIndex], None]):
+    """
+    Called right after a Vendor write inside the writer's transaction: the
+    version read here already includes that write, and the index is only
+    patched once the transaction commits.
+    """
+    version = get_vendor_version()
+    database.on_commit(lambda: _index.apply(version, bumps, update))
+
+def index_vendor(vendor_id: str, names: List[str]):
+    """Register a newly inserted vendor with the index."""
+    _schedule_index_update(1, lambda index: index.add(vendor_id, names))
+
+def index_vendors(vendors: List[Tuple[str, List[str]]]):
+    """Register several newly inserted vendors (one row each) with the index."""
+    def update(index):
+        for vendor_id, names in vendors:
+            index.add(vendor_id, names)
+    _schedule_index_update(len(vendors), update)
+
+def index_vendor_merge(survivor_id: str, victim_id: str):
+    """Point a merged vendor's names at its survivor."""
+    _schedule_index_update(1, lambda index: index.redirect(victim_id, survivor_id))
+
+def get_index_stats() -> Dict:
+    with _index.lock:
+        return {"version": _index.version, "choices": len(_index.choices), **_index.stats}
 
-    # Prepare a list of choices (name and aliases)
-    # We map back to ID via a dictionary for lookup
-    choices = {}
-    for v in vendors:
-        choices[v["name"]] = v["id"]
-        for alias in v["aliases"]:
-            choices[alias] = v["id"]
-    
-    # Extract best match
-    # process.extractOne returns (match_string, score, index)
-    result = process.extractOne(raw_name, choices.keys(), scorer=fuzz.token_sort_ratio)
-    
+def _classify(result: Optional[Tuple[str, float]]) -> Tuple[Optional[str], str, float]:
     if not result:
         return None, "NEW", 0.0
-        
-    match_name, score, _ = result
-    match_id = choices[match_name]
-    
+
+    match_id, score = result
+
     if score >= AUTO_MATCH_THRESHOLD:
         return match_id, "AUTO", score
     elif score >= CANDIDATE_MATCH_THRESHOLD:
@@ -56,6 +285,147 @@ def resolve_vendor(raw_name: str) -> Tuple[Optional[str], str, float]:
     else:
         return None, "NEW", score
 
+def add_vendor_aliases(entries: Iterable[Tuple[str, str, str, float]]):
+    """Record (vendor_node_id, name, source, score) entries under their normalized keys."""
+    rows = [
+        (vendor_node_id, key, source, score)
+        for vendor_node_id, name, source, score in entries
+        for key in [normalize_vendor_name(name)] if key
+    ]
+    if rows:
+        database.executemany_db(
+            "INSERT OR IGNORE INTO vendor_aliases (vendor_node_id, alias, source, score) VALUES (?, ?, ?, ?)",
+            rows
+        )
+
+def vendor_alias_entries(vendor_node_id: str, attrs: Dict, source: str = "vendor") -> List[Tuple[str, str, str, float]]:
+    """add_vendor_aliases entries for a vendor's name and aliases."""
+    names = [attrs.get("name", "")] + attrs.get("aliases", [])
+    return [(vendor_node_id, name, source, 100.0) for name in names]
+
+def repoint_vendor_aliases(victim_id: str, survivor_id: str):
+    """Move a merged vendor's keys to its survivor."""
+    database.execute_db(
+        "UPDATE OR IGNORE vendor_aliases SET vendor_node_id = ? WHERE vendor_node_id = ?",
+        (survivor_id, victim_id)
+    )
+    # Keys the survivor already had
+    database.execute_db("DELETE FROM vendor_aliases WHERE vendor_node_id = ?", (victim_id,))
+
+def sync_vendor_aliases() -> int:
+    """
+    Add keys for vendors that have none yet (created before M7, or by seed
+    scripts writing nodes directly); merged vendors' keys go to the end of
+    their merge chain. Returns the number of vendors backfilled.
+    """
+    rows = database.query_db(
+        """
+        SELECT node_id, attributes FROM nodes
+        WHERE type = 'Vendor'
+          AND node_id NOT IN (SELECT vendor_node_id FROM vendor_aliases)
+        """
+    )
+    if not rows:
+        return 0
+    merged_into = {v["id"]: v["merged_into"] for v in get_canonical_vendors() if v["merged_into"]}
+    entries = []
+    for row in rows:
+        target, hops = row['node_id'], 0
+        while target in merged_into and hops < len(merged_into):
+            target, hops = merged_into[target], hops + 1
+        entries += vendor_alias_entries(target, json.loads(row['attributes']), "backfill")
+    add_vendor_aliases(entries)
+    return len(rows)
+
+def _lookup_alias_keys(keys: List[str]) -> Dict[str, str]:
+    """normalized key -> vendor id, for keys that belong to exactly one vendor."""
+    owners: Dict[str, set] = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = database.query_db(
+            f"SELECT alias, vendor_node_id FROM vendor_aliases WHERE alias IN ({placeholders})",
+            tuple(chunk)
+        )
+        for row in rows:
+            owners.setdefault(row['alias'], set()).add(row['vendor_node_id'])
+    # A key shared by distinct vendors is ambiguous; leave it to fuzzy scoring
+    return {key: ids.pop() for key, ids in owners.items() if len(ids) == 1}
+
+def resolve_vendor(raw_name: str) -> Tuple[Optional[str], str, float]:
+    """
+    Attempts to match a raw vendor name against the canonical graph.
+    Returns: (match_id, match_type, score)
+    match_type: "AUTO", "CANDIDATE", "NEW"
+    """
+    key = normalize_vendor_name(raw_name)
+    if key:
+        exact = _lookup_alias_keys([key])
+        if key in exact:
+            return exact[key], "AUTO", 100.0
+
+    with _index.lock:
+        _index.ensure_current()
+        result = _index.best_match(raw_name)
+    return _classify(result)
+
+def resolve_vendors_batch(names: Iterable[str]) -> Dict[str, Tuple[Optional[str], str, float]]:
+    """
+    resolve_vendor for many names at once. Names are deduplicated, exact
+    normalized keys are looked up together and the rest are scored with
+    rapidfuzz cdist; returns {name: (match_id, match_type, score)}.
+    """
+    distinct = list(dict.fromkeys(names))
+    keys = {name: normalize_vendor_name(name) for name in distinct}
+    exact = _lookup_alias_keys(list(set(keys.values()) - {""}))
+    resolved = {name: (exact[keys[name]], "AUTO", 100.0) for name in distinct if keys[name] in exact}
+
+    pending = [name for name in distinct if name not in resolved]
+    if pending:
+        with _index.lock:
+            _index.ensure_current()
+            results = _index.best_matches(pending)
+        resolved.update((name, _classify(result)) for name, result in zip(pending, results))
+    return {name: resolved[name] for name in distinct}
+
+def check_blocking_recall(queries: Iterable[str], index: Optional[VendorIndex] = None) -> Dict:
+    """
+    Compare blocked resolution with exhaustive scoring for `queries`.
+    A query agrees when both return the same (match_id, match_type); NEW
+    scores may differ since they are below every threshold.
+    """
+    if index is None:
+        index = _index
+        with index.lock:
+            index.ensure_current()
+
+    checked = agree = 0
+    mismatches = []
+    blocked_time = exhaustive_time = 0.0
+    with index.lock:
+        for query in queries:
+            started = time.perf_counter()
+            blocked = _classify(index.best_match(query))
+            blocked_time += time.perf_counter() - started
+            started = time.perf_counter()
+            exhaustive = _classify(index.best_match(query, exhaustive=True))
+            exhaustive_time += time.perf_counter() - started
+
+            checked += 1
+            if blocked[:2] == exhaustive[:2]:
+                agree += 1
+            elif len(mismatches) < 20:
+                mismatches.append({"query": query, "blocked": blocked, "exhaustive": exhaustive})
+
+    return {
+        "checked": checked,
+        "agree": agree,
+        "recall": round(agree / checked, 4) if checked else 1.0,
+        "blocked_ms_per_query": round(1000 * blocked_time / checked, 3) if checked else 0.0,
+        "exhaustive_ms_per_query": round(1000 * exhaustive_time / checked, 3) if checked else 0.0,
+        "mismatches": mismatches
+    }
+
 def create_reconciliation_task(source_record: Dict, candidate_id: str, score: float):
     """Log a task for manual review."""
     task = {
@@ -70,3 +440,18 @@ def create_reconciliation_task(source_record: Dict, candidate_id: str, score: fl
         "INSERT INTO reconciliation_queue (task_data, status) VALUES (?, ?)",
         (json.dumps(task), "pending")
     )
+
+def create_reconciliation_tasks(tasks: List[Tuple[Dict, str, float]]):
+    """Queue many (source_record, candidate_id, score) tasks in one statement."""
+    database.executemany_db(
+        "INSERT INTO reconciliation_queue (task_data, status) VALUES (?, ?)",
+        [
+            (json.dumps({
+                "source_record": source_record,
+                "candidate_id": candidate_id,
+                "score": score,
+                "status": "pending"
+            }), "pending")
+            for source_record, candidate_id, score in tasks
+        ]
+    )
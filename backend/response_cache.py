@@ -0,0 +1,185 @@
+"""
+Bounded in-process cache for hot read endpoints.
+
+Entries are keyed by endpoint plus normalized query parameters and evicted
+least-recently-used once the byte budget is exceeded, or when older than
+the TTL. Two kinds of entry:
+
+    tagged     node/edge detail; dropped by invalidate() for any node, edge
+               or invoice id they were built from. Write paths call
+               invalidate() after their transaction commits.
+    versioned  whole-graph results (metrics counts, edge listings); only
+               served while the M13 graph_version is unchanged.
+
+The TTL bounds staleness for writes made outside this process, which do
+not call invalidate().
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import database
+import single_flight
+
+MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL", "60"))
+# A single entry may use at most this share of the budget
+MAX_ENTRY_SHARE = 0.25
+
+Tag = Tuple[str, str]
+
+class _Entry:
+    __slots__ = ("value", "size", "expires", "tags", "version")
+
+    def __init__(self, value: Any, size: int, expires: float, tags: Set[Tag], version: Optional[int]):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.tags = tags
+        self.version = version
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = MAX_BYTES, ttl: float = TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self.by_tag: Dict[Tag, Set[Tuple]] = {}
+        self.bytes = 0
+        # Bumped by every invalidation; a fill that raced one is not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    def _remove(self, key: Tuple) -> _Entry:
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+        for tag in entry.tags:
+            keys = self.by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_tag[tag]
+        return entry
+
+    def get(self, key: Tuple, version: Optional[int] = None) -> Tuple[bool, Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires < time.monotonic():
+                    self._remove(key)
+                    self.expirations += 1
+                elif entry.version is not None and entry.version != version:
+                    self._remove(key)
+                    self.invalidations += 1
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry.value
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Tuple, value: Any, size: int, tags: Iterable[Tag] = (),
+            version: Optional[int] = None, generation: Optional[int] = None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            if size > self.max_bytes * MAX_ENTRY_SHARE:
+                self.rejected += 1
+                return
+            if key in self.entries:
+                self._remove(key)
+            entry = _Entry(value, size, time.monotonic() + self.ttl, set(tags), version)
+            self.entries[key] = entry
+            self.bytes += size
+            for tag in entry.tags:
+                self.by_tag.setdefault(tag, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags: Iterable[Tag]):
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self.by_tag.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.by_tag.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "rejected": self.rejected
+            }
+
+_cache = ResponseCache()
+
+def cache_key(endpoint: str, params: Dict[str, Any]) -> Tuple:
+    """Endpoint plus its parameters, ignoring unset ones and argument order."""
+    return (endpoint,) + tuple(sorted((name, value) for name, value in params.items() if value is not None))
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+def cached(endpoint: str, params: Dict[str, Any], compute: Callable[[], Any],
+           tags: Optional[Callable[[Any], Iterable[Tag]]] = None, versioned: bool = False,
+           size: Optional[Callable[[Any], int]] = None) -> Any:
+    """
+    Return the cached result for (endpoint, params) or compute and store it.
+    `compute` must return a JSON-serializable value that callers treat as
+    read-only. `tags(value)` names the ("node"|"edge"|"invoice", id) pairs
+    it was built from; `versioned` entries are checked against graph_version.
+    `size(value)` replaces the serialized-length estimate for large results.
+    Concurrent misses for the same key share one computation.
+    """
+    key = cache_key(endpoint, params)
+    version = database.get_graph_version() if versioned else None
+    hit, value = _cache.get(key, version)
+    if hit:
+        return value
+    generation = _cache.generation
+
+    def fill():
+        value = compute()
+        _cache.put(key, value, size(value) if size else _size(value), tags(value) if tags else (), version, generation)
+        return value
+
+    # Scoped to the version/generation seen, so a miss after a write never joins an older fill
+    return single_flight.do(("cache", key, version, generation), fill)
+
+def invalidate(nodes: Iterable[str] = (), edges: Iterable[str] = (), invoices: Iterable[str] = ()):
+    """Drop entries built from these ids once the current transaction commits."""
+    tags = [("node", n) for n in nodes] + [("edge", e) for e in edges] + [("invoice", i) for i in invoices]
+    if tags:
+        database.on_commit(lambda: _cache.invalidate(tags))
+
+def clear():
+    _cache.clear()
+
+def get_cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
@@ -23,19 +23,7 @@ CREATE TABLE IF NOT EXISTS edges (
     FOREIGN KEY (to_node_id) REFERENCES nodes(node_id)
 );
 
--- Invoices Table: The source of truth documents
-CREATE TABLE IF NOT EXISTS invoices (
-    invoice_id TEXT PRIMARY KEY, -- Source ID (e.g., "VST-9876")
-    source TEXT NOT NULL,        -- "VISTA", "AP_WIZARD"
-    job_id TEXT,                 -- Reference to Job Node ID (optional if not linked yet)
-    vendor_id TEXT,              -- Reference to Vendor Node ID
-    amount DECIMAL(20, 2) NOT NULL,
-    currency TEXT DEFAULT 'USD',
-    status TEXT NOT NULL,        -- "approved", "unapproved", "paid"
-    invoice_date DATE,
-    raw_payload JSON,            -- The original data for audit
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-);
+-- Invoices Table: defined in migration_m4.sql
 
 -- Audit Log: Immutable record of all changes
 CREATE TABLE IF NOT EXISTS audit_logs (
@@ -49,6 +37,4 @@ CREATE TABLE IF NOT EXISTS audit_logs (
 
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(type);
-CREATE INDEX IF NOT EXISTS idx_edges_from ON edges(from_node_id);
-CREATE INDEX IF NOT EXISTS idx_edges_to ON edges(to_node_id);
-CREATE INDEX IF NOT EXISTS idx_invoices_vendor ON invoices(vendor_id);
+-- Edge indexes: see migration_m8.sql
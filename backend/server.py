@@ -1,20 +1,36 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Annotated, List, Optional, Dict, Any, Union
+import asyncio
 import json
 import database
 import resolution
 import audit
 import merge_service
-import uuid
 
 # Import new services
 import invoice_service
 import attachment_service
 import merge_proposal_service
+import ingest_service
+import file_ingest
+import node_stats
+import graph_snapshot
+import graph_summary
+import graph_neighborhood
+import graph_engine
+import graph_layout
+import graph_viewport
+import export_service
+import response_cache
+import single_flight
+import change_feed
+import os
 from models import (
-    Node, Edge, InvoiceIngest, ReconciliationTask, MergeRequest,
-    MergeProposal, MergeApproval, Invoice, Attachment, GraphLayout
+    Node, Edge, InvoiceIngest, FileIngestRequest, ReconciliationTask, MergeRequest,
+    MergeProposal, MergeApproval, Invoice, Attachment, GraphLayout, GraphLayoutDelta
 )
 app = FastAPI(title="APW Ontology API", version="1.4.0 - M4+")
 
@@ -25,50 +41,204 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Keyset pagination for the graph listing endpoints
+MAX_PAGE_SIZE = 10000
+
+ListingCursor = Annotated[Optional[str], Query(
+    description="Return rows whose id sorts after this value: the previous page's X-Next-Cursor header"
+)]
+ListingLimit = Annotated[Optional[int], Query(
+    description=f"Page size, at most {MAX_PAGE_SIZE}; omit to return every matching row"
+)]
+ListingFormat = Annotated[str, Query(
+    description="'json' for an array, or 'ndjson' to stream one object per line off the database cursor"
+)]
+
+def _listing_responses(model) -> Dict[int, Dict[str, Any]]:
+    """OpenAPI for the listings: a JSON array or an NDJSON stream, plus the cursor header."""
+    return {200: {
+        "model": List[model],
+        "description": "A page of results, as JSON or, with format=ndjson, one JSON object per line",
+        "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        "headers": {"X-Next-Cursor": {
+            "description": "Set when a `limit` page is full; pass it back as `after` for the next page",
+            "schema": {"type": "string"}
+        }}
+    }}
+
+# Read endpoints whose body only changes with the graph version (M13).
+# Metrics is not one of them: its pool, cache and writer counters move
+# between graph writes.
+CONDITIONAL_PATHS = {
+    "/api/graph/nodes": "nodes",
+    "/api/graph/edges": "edges",
+    "/api/graph/snapshot": "snapshot",
+    "/api/reconciliation/queue": "reconciliation",
+}
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """
+    ETag from the graph version; a matching If-None-Match gets a 304 after
+    one graph_meta lookup. The version is read before the body is built, so
+    a write that races the request only ever makes the tag too old.
+    """
+    name = CONDITIONAL_PATHS.get(request.url.path)
+    if request.method != "GET" or name is None:
+        return await call_next(request)
+    version = await run_in_threadpool(database.get_graph_version)
+    etag = f'"{name}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
 # --- Endpoints ---
 
 @app.on_event("startup")
 def startup_event():
     database.init_db()
+    resolution.sync_vendor_aliases()
+    graph_engine.warm_start()
+    change_feed.prune()
+
+@app.on_event("startup")
+async def start_change_log_pruning():
+    # Every write path appends to graph_changes, so the log is trimmed on a timer
+    app.state.change_log_pruning = asyncio.create_task(change_feed.prune_periodically())
+
+@app.on_event("shutdown")
+def shutdown_event():
+    app.state.change_log_pruning.cancel()
+    audit.flush()
 
 @app.get("/")
 def read_root():
     return {"status": "online", "system": "APW Ontology Graph", "version": "M3"}
 
-@app.get("/api/graph/nodes", response_model=List[Node])
-def get_nodes(type: Optional[str] = None):
-    query = "SELECT * FROM nodes"
-    args = ()
-    if type:
-        query += " WHERE type = ?"
-        args = (type,)
-    
-    rows = database.query_db(query, args)
-    results = []
+def _node_dict(row) -> Dict[str, Any]:
+    return {
+        "node_id": row['node_id'],
+        "type": row['type'],
+        "attributes": json.loads(row['attributes'])
+    }
+
+def _edge_dict(row) -> Dict[str, Any]:
+    return {
+        "edge_id": row['edge_id'],
+        "type": row['type'],
+        "from_node": row['from_node_id'],
+        "to_node": row['to_node_id'],
+        "attributes": json.loads(row['attributes'])
+    }
+
+def _ndjson_stream(rows, to_dict):
     for row in rows:
-        attrs = json.loads(row['attributes'])
-        # Filter out merged nodes from main view
-        if attrs.get('status') == 'merged':
-            continue
-            
-        results.append(Node(
-            node_id=row['node_id'],
-            type=row['type'],
-            attributes=attrs
-        ))
-    return results
+        yield json.dumps(to_dict(row)) + "\n"
+
+def _graph_listing(query: str, args: list, key: str, after: Optional[str], limit: Optional[int],
+                   format: str, to_dict, response: Response, cache_endpoint: Optional[str] = None):
+    """
+    Shared body of the node/edge listings: keyset pagination on `key` and
+    either a JSON list or an NDJSON stream serialized straight off the cursor.
+    JSON pages are cached against the graph version when `cache_endpoint` is set.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if after:
+        query += f" AND {key} > ?"
+        args.append(after)
+    query += f" ORDER BY {key}"
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query += " LIMIT ?"
+        args.append(limit)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson_stream(database.iter_query(query, tuple(args)), to_dict),
+            media_type="application/x-ndjson"
+        )
+
+    def fetch():
+        rows = database.query_db(query, tuple(args))
+        return {
+            "items": [to_dict(row) for row in rows],
+            # Pass back as `after` to fetch the next page
+            "next_cursor": rows[-1][key] if limit is not None and len(rows) == limit else None,
+            "bytes": sum(len(row['attributes']) + 128 for row in rows)
+        }
 
-@app.get("/api/graph/edges", response_model=List[Edge])
+    if cache_endpoint:
+        # The SQL and its arguments are the normalized form of the filters
+        page = response_cache.cached(
+            cache_endpoint, {"query": query, "args": tuple(args)}, fetch,
+            versioned=True, size=lambda page: page["bytes"]
+        )
+    else:
+        page = single_flight.do_versioned(("listing", query, tuple(args)), fetch)
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
+
+# Pages can hold MAX_PAGE_SIZE rows, so items are returned as dicts without model validation
+@app.get("/api/graph/nodes", response_model=None, responses=_listing_responses(Node))
+def get_nodes(
+    response: Response,
+    type: Optional[str] = None,
+    after: ListingCursor = None,
+    limit: ListingLimit = None,
+    format: ListingFormat = "json"
+) -> Union[List[Dict[str, Any]], StreamingResponse]:
+    """
+    Nodes ordered by node_id, excluding merged ones, optionally by type.
+    Paginate with `after`/`limit`; `format=ndjson` streams the result.
+    """
+    # Merged nodes are excluded from the main view
+    query = "SELECT * FROM nodes WHERE json_extract(attributes, '$.status') IS NOT 'merged'"
+    args = []
+    if type:
+        query += " AND type = ?"
+        args.append(type)
+    return _graph_listing(query, args, "node_id", after, limit, format, _node_dict, response)
+
+@app.get("/api/graph/edges", response_model=None, responses=_listing_responses(Edge))
 def get_edges(
+    response: Response,
     from_node: Optional[str] = None, 
     to_node: Optional[str] = None,
     date_start: Optional[str] = None,
     date_end: Optional[str] = None,
     min_amount: Optional[float] = None,
-    max_amount: Optional[float] = None
-):
+    max_amount: Optional[float] = None,
+    after: ListingCursor = None,
+    limit: ListingLimit = None,
+    format: ListingFormat = "json"
+) -> Union[List[Dict[str, Any]], StreamingResponse]:
+    """
+    Edges ordered by edge_id, filtered by endpoint, date and amount.
+    Paginate with `after`/`limit`; `format=ndjson` streams the result.
+    """
     query = "SELECT * FROM edges WHERE 1=1"
     args = []
     
@@ -79,59 +249,193 @@ def get_edges(
         query += " AND to_node_id = ?"
         args.append(to_node)
     if date_start:
-        query += " AND json_extract(attributes, '$.date') >= ?"
+        query += " AND date >= ?"
         args.append(date_start)
     if date_end:
-        query += " AND json_extract(attributes, '$.date') <= ?"
+        query += " AND date <= ?"
         args.append(date_end)
     if min_amount:
-        query += " AND CAST(json_extract(attributes, '$.amount') AS REAL) >= ?"
+        query += " AND amount >= ?"
         args.append(min_amount)
     if max_amount:
-        query += " AND CAST(json_extract(attributes, '$.amount') AS REAL) <= ?"
+        query += " AND amount <= ?"
         args.append(max_amount)
-        
-    rows = database.query_db(query, tuple(args))
-    results = []
-    for row in rows:
-        results.append(Edge(
-            edge_id=row['edge_id'],
-            type=row['type'],
-            from_node=row['from_node_id'],
-            to_node=row['to_node_id'],
-            attributes=json.loads(row['attributes'])
-        ))
-    return results
+
+    return _graph_listing(query, args, "edge_id", after, limit, format, _edge_dict, response, cache_endpoint="edges")
+
+@app.get("/api/graph/snapshot")
+def get_graph_snapshot(fields: Optional[str] = None, edge_ids: bool = False):
+    """
+    Whole graph in the compact columnar format described in graph_snapshot.py.
+    `fields` is a comma-separated list of node attributes to include.
+    """
+    projection = [f.strip() for f in fields.split(",") if f.strip()] if fields else []
+    try:
+        payload = single_flight.do_versioned(
+            ("snapshot", tuple(projection), edge_ids), lambda: graph_snapshot.build_snapshot(projection, edge_ids)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=payload, media_type="application/octet-stream")
+
+@app.get("/api/graph/summary")
+def get_graph_summary(group_by: str = "type", refresh: bool = False):
+    """
+    Supernodes grouped by type, vendor_type, job or community, with the
+    PaymentFlow/Invoice/Payment flows between them aggregated.
+    """
+    try:
+        return graph_summary.get_summary(group_by, refresh)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/graph/summary/members")
+def get_graph_summary_members(group_id: str, group_by: str = "type"):
+    """
+    Expand one supernode into its member nodes and their flows.
+    """
+    try:
+        return graph_summary.get_members(group_by, group_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+@app.get("/api/graph/viewport")
+def get_graph_viewport(
+    x0: float, y0: float, x1: float, y1: float,
+    user_id: str = graph_layout.LAYOUT_USER,
+    max_nodes: int = graph_viewport.DEFAULT_MAX_NODES,
+    max_edges: int = graph_viewport.DEFAULT_MAX_EDGES,
+    edges_per_node: int = graph_viewport.DEFAULT_EDGES_PER_NODE
+):
+    """
+    Nodes whose saved position (default: the server layout) falls in the
+    box, with their heaviest incident edges.
+    """
+    return graph_viewport.get_viewport(x0, y0, x1, y1, user_id, max_nodes, max_edges, edges_per_node)
 
 @app.get("/api/graph/node/{node_id}", response_model=Node)
 def get_node_details(node_id: str):
+    return response_cache.cached(
+        "node", {"node_id": node_id}, lambda: _node_details(node_id),
+        tags=lambda node: [("node", node_id)]
+    )
+
+def _node_details(node_id: str) -> Dict[str, Any]:
     row = database.query_db("SELECT * FROM nodes WHERE node_id = ?", (node_id,), one=True)
     if not row:
         raise HTTPException(status_code=404, detail="Node not found")
     
     attrs = json.loads(row['attributes'])
     
-    # Calculate Aggregates (Real-time)
-    # Total Inflow (Edges coming INTO this node)
-    inflow = database.query_db(
-        "SELECT SUM(json_extract(attributes, '$.amount')) as total FROM edges WHERE to_node_id = ?", 
-        (node_id,), one=True
-    )
-    # Total Outflow (Edges going OUT of this node)
-    outflow = database.query_db(
-        "SELECT SUM(json_extract(attributes, '$.amount')) as total FROM edges WHERE from_node_id = ?", 
-        (node_id,), one=True
-    )
-    
+    # Aggregates, maintained by the edge triggers (M9)
+    stats = node_stats.get_node_stats(node_id)
     attrs['stats'] = {
-        "total_inflow": inflow['total'] or 0,
-        "total_outflow": outflow['total'] or 0
+        "total_inflow": stats['inflow_total'],
+        "total_outflow": stats['outflow_total'],
+        "inflow_count": stats['inflow_count'],
+        "outflow_count": stats['outflow_count']
     }
 
-    return Node(
-        node_id=row['node_id'],
-        type=row['type'],
-        attributes=attrs
+    return {
+        "node_id": row['node_id'],
+        "type": row['type'],
+        "attributes": attrs
+    }
+
+@app.get("/api/graph/node/{node_id}/neighborhood")
+def get_node_neighborhood(
+    node_id: str,
+    hops: int = 1,
+    max_edges_per_node: int = graph_neighborhood.DEFAULT_EDGES_PER_NODE,
+    max_nodes: int = graph_neighborhood.DEFAULT_MAX_NODES
+):
+    """
+    K-hop ego network around a node, keeping each node's heaviest edges.
+    """
+    result = graph_neighborhood.get_neighborhood(node_id, hops, max_edges_per_node, max_nodes)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return result
+
+def _edge_type_filter(edge_types: Optional[str]) -> Optional[List[str]]:
+    return [t.strip() for t in edge_types.split(",") if t.strip()] if edge_types else None
+
+@app.get("/api/graph/trace/bfs")
+def trace_bfs(node_id: str, max_hops: int = 3, direction: str = "both", edge_types: Optional[str] = None,
+              limit: int = graph_engine.DEFAULT_RESULT_LIMIT):
+    """
+    Every node within max_hops of node_id, served from the in-memory engine.
+    """
+    if direction not in graph_engine.DIRECTIONS:
+        raise HTTPException(status_code=400, detail="direction must be one of out, in, both")
+    try:
+        return graph_engine.bfs(node_id, max_hops, direction, _edge_type_filter(edge_types), limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Node not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/graph/trace/path")
+def trace_path(source: str, target: str, weight: str = "hops", direction: str = "both",
+               edge_types: Optional[str] = None, max_hops: int = graph_engine.MAX_TRACE_HOPS):
+    """
+    Shortest path by hop count, or (weight=amount) the path through the largest flows.
+    """
+    if direction not in graph_engine.DIRECTIONS:
+        raise HTTPException(status_code=400, detail="direction must be one of out, in, both")
+    try:
+        result = graph_engine.shortest_path(
+            source, target, weight, direction, _edge_type_filter(edge_types), max_hops
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Node not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="No path found")
+    return result
+
+@app.get("/api/graph/trace/flow")
+def trace_flow(node_id: str, direction: str = "out", max_hops: int = 3, edge_types: Optional[str] = None,
+               limit: int = graph_engine.DEFAULT_RESULT_LIMIT):
+    """
+    Where money from (direction=out) or into (direction=in) a node goes, hop by hop.
+    """
+    try:
+        return graph_engine.trace_flow(node_id, direction, max_hops, _edge_type_filter(edge_types), limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Node not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/graph/changes")
+def get_graph_changes(since: Optional[int] = None, limit: int = change_feed.DEFAULT_CHANGE_LIMIT):
+    """
+    Node/edge changes after sequence number `since`, each with the entity's
+    current state. Without `since`, only the current `last_seq`, to take
+    before loading the full graph.
+    """
+    if since is None:
+        return {"changes": [], "last_seq": change_feed.latest_seq(), "has_more": False, "reset": False}
+    return change_feed.get_changes(since, limit)
+
+@app.get("/api/graph/changes/stream")
+async def stream_graph_changes(
+    request: Request,
+    since: Optional[int] = None,
+    last_event_id: Optional[int] = Header(default=None)
+):
+    """
+    Server-Sent Events push of the change feed. EventSource reconnects
+    resume from Last-Event-ID.
+    """
+    start = last_event_id if last_event_id is not None else since
+    return StreamingResponse(
+        change_feed.stream_changes(start, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 @app.get("/api/graph/node/{node_id}/history")
@@ -146,84 +450,67 @@ def manual_merge(req: MergeRequest):
 # --- Ingestion & Resolution ---
 
 @app.post("/api/ingest/invoice")
-def ingest_invoice(invoice: InvoiceIngest):
-    # 1. Resolve Vendor
-    match_id, match_type, score = resolution.resolve_vendor(invoice.vendor_name)
-    
-    vendor_node_id = None
-    
-    if match_type == "AUTO":
-        vendor_node_id = match_id
-    elif match_type == "CANDIDATE":
-        resolution.create_reconciliation_task(invoice.dict(), match_id, score)
-        return {"status": "queued", "message": "Vendor match uncertain. Added to reconciliation queue."}
-    else:
-        # Create new vendor
-        vendor_id = str(uuid.uuid4())[:8]
-        vendor_node_id = f"node:vendor:{vendor_id}"
-        vendor_attrs = {
-            "vendor_id": vendor_id,
-            "name": invoice.vendor_name,
-            "aliases": [invoice.vendor_name],
-            "status": "active"
-        }
-        database.execute_db(
-            "INSERT INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
-            (vendor_node_id, "Vendor", json.dumps(vendor_attrs))
-        )
-        audit.log_action("NODE_CREATED", "system", vendor_node_id, {"reason": "ingestion"})
-
-    # 2. Create/Link Job Node (if provided)
-    job_node_id = None
-    if invoice.job_id:
-        job_node_id = f"node:job:{invoice.job_id}"
-        existing = database.query_db("SELECT 1 FROM nodes WHERE node_id = ?", (job_node_id,), one=True)
-        if not existing:
-            database.execute_db(
-                "INSERT INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
-                (job_node_id, "Job", json.dumps({"job_id": invoice.job_id, "name": f"Job {invoice.job_id}"}))
-            )
-            audit.log_action("NODE_CREATED", "system", job_node_id, {"reason": "ingestion"})
+def ingest_invoice(invoice: InvoiceIngest, background_tasks: BackgroundTasks):
+    background_tasks.add_task(graph_layout.request_relayout)
+    return ingest_service.ingest_invoice(invoice)
+
+@app.post("/api/ingest/invoices/batch")
+def ingest_invoice_batch(
+    invoices: List[Dict[str, Any]],
+    background_tasks: BackgroundTasks,
+    chunk_size: int = ingest_service.BATCH_CHUNK_SIZE
+):
+    """
+    Ingest many invoices in one call. Records are validated individually,
+    vendors are resolved once per distinct name and writes are committed
+    in chunks of `chunk_size`.
+    """
+    background_tasks.add_task(graph_layout.schedule_relayout)
+    background_tasks.add_task(change_feed.prune)
+    return ingest_service.ingest_batch(invoices, chunk_size)
 
-    # 3. Create Edge (Payment Flow)
-    edge_id = None
-    if vendor_node_id and job_node_id:
-        edge_id = f"edge:txn:{uuid.uuid4()}"
-        edge_attrs = {
-            "amount": invoice.amount,
-            "currency": invoice.currency,
-            "date": invoice.date,
-            "source_id": invoice.source_id,
-            "source": invoice.source,
-            "cost_codes": invoice.cost_codes or [],
-            "description": invoice.description
-        }
-        database.execute_db(
-            "INSERT INTO edges (edge_id, type, from_node_id, to_node_id, attributes) VALUES (?, ?, ?, ?, ?)",
-            (edge_id, "PaymentFlow", vendor_node_id, job_node_id, json.dumps(edge_attrs))
-        )
-        audit.log_action("EDGE_CREATED", "system", edge_id, {"amount": invoice.amount})
-
-    # 4. Create detailed invoice record
-    if vendor_node_id and job_node_id:
-        invoice_id = f"inv:{invoice.source}:{invoice.source_id}"
-        invoice_service.create_invoice(
-            invoice_id=invoice_id,
-            source=invoice.source,
-            source_id=invoice.source_id,
-            vendor_node_id=vendor_node_id,
-            job_node_id=job_node_id,
-            amount=invoice.amount,
-            currency=invoice.currency,
-            invoice_date=invoice.date,
-            status="unapproved",
-            cost_codes=invoice.cost_codes,
-            description=invoice.description,
-            raw_payload=invoice.dict(),
-            edge_id=edge_id
-        )
+def _import_path(path: str) -> str:
+    # Rejected before touching the file, so paths outside the root cannot be probed
+    try:
+        return file_ingest.resolve_import_path(path)
+    except file_ingest.ImportPathError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+@app.post("/api/ingest/file")
+def ingest_file(request: FileIngestRequest, background_tasks: BackgroundTasks):
+    """
+    Start a streaming load of an NDJSON/CSV export under the import root
+    (INGEST_ROOT). Resumes from the last committed chunk unless `restart` is set.
+    """
+    path = _import_path(request.path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        fmt = request.format or file_ingest.detect_format(path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt not in file_ingest.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+    if file_ingest.is_running(path):
+        raise HTTPException(status_code=409, detail="File is already being ingested")
+
+    background_tasks.add_task(
+        file_ingest.run_in_background, path, fmt, request.chunk_size, request.restart
+    )
+    # Background tasks run in order, so this lays out the loaded file
+    background_tasks.add_task(graph_layout.schedule_relayout)
+    background_tasks.add_task(change_feed.prune)
+    return {"status": "started", "source_path": path, "format": fmt}
 
-    return {"status": "ingested", "vendor_node": vendor_node_id, "match_type": match_type, "edge_id": edge_id}
+@app.get("/api/ingest/file/status")
+def get_file_ingest_status(path: str):
+    """
+    Progress of a file load: byte offset, percent complete and outcome counts.
+    """
+    progress = file_ingest.get_progress(_import_path(path))
+    if not progress:
+        raise HTTPException(status_code=404, detail="No ingestion recorded for this file")
+    return progress
 
 @app.get("/api/reconciliation/queue", response_model=List[ReconciliationTask])
 def get_reconciliation_queue():
@@ -240,56 +527,45 @@ def get_reconciliation_queue():
 
 @app.post("/api/reconciliation/resolve/{task_id}")
 def resolve_task(task_id: int, action: str, target_vendor_id: Optional[str] = None):
-    task_row = database.query_db("SELECT * FROM reconciliation_queue WHERE task_id = ?", (task_id,), one=True)
-    if not task_row:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    task_data = json.loads(task_row['task_data'])
-    invoice_data = task_data['source_record']
-    
-    final_vendor_id = None
-
-    if action == 'merge':
-        if not target_vendor_id:
-             target_vendor_id = task_data['candidate_id']
-        final_vendor_id = target_vendor_id
-        # Log the decision
-        audit.log_action("RECONCILIATION_MERGE", "user:reconciler", final_vendor_id, {"task_id": task_id})
-        
-    elif action == 'create_new':
-        vendor_id = str(uuid.uuid4())[:8]
-        final_vendor_id = f"node:vendor:{vendor_id}"
-        vendor_attrs = {
-            "vendor_id": vendor_id,
-            "name": invoice_data['vendor_name'],
-            "aliases": [invoice_data['vendor_name']],
-            "status": "active"
-        }
-        database.execute_db(
-            "INSERT INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
-            (final_vendor_id, "Vendor", json.dumps(vendor_attrs))
+    # BEGIN IMMEDIATE holds the write lock from the status check on, so two
+    # reviewers resolving the same task cannot both create its edge
+    with database.transaction():
+        task_row = database.query_db(
+            "SELECT * FROM reconciliation_queue WHERE task_id = ? AND status = 'pending'", (task_id,), one=True
         )
-        audit.log_action("NODE_CREATED", "user:reconciler", final_vendor_id, {"reason": "reconciliation_new"})
+        if not task_row:
+            if database.query_db("SELECT 1 FROM reconciliation_queue WHERE task_id = ?", (task_id,), one=True):
+                raise HTTPException(status_code=409, detail="Task is already resolved")
+            raise HTTPException(status_code=404, detail="Task not found")
+
+        task_data = json.loads(task_row['task_data'])
+        invoice_data = task_data['source_record']
+        final_vendor_id = None
+
+        if action == 'merge':
+            if not target_vendor_id:
+                 target_vendor_id = task_data['candidate_id']
+            final_vendor_id = target_vendor_id
+            # Log the decision
+            audit.log_action("RECONCILIATION_MERGE", "user:reconciler", final_vendor_id, {"task_id": task_id})
+            # The reviewed spelling now resolves straight to this vendor
+            resolution.add_vendor_aliases([
+                (final_vendor_id, invoice_data['vendor_name'], "reconciliation", task_data.get('score'))
+            ])
+        
+        elif action == 'create_new':
+            final_vendor_id = ingest_service.create_vendor_node(
+                invoice_data['vendor_name'], "user:reconciler", "reconciliation_new"
+            )
     
-    # Create Edge
-    if invoice_data.get('job_id'):
-        job_node_id = f"node:job:{invoice_data['job_id']}"
-        edge_id = f"edge:txn:{uuid.uuid4()}"
-        edge_attrs = {
-            "amount": invoice_data['amount'],
-            "currency": invoice_data['currency'],
-            "date": invoice_data['date'],
-            "source_id": invoice_data['source_id'],
-            "source": invoice_data['source']
-        }
-        database.execute_db(
-            "INSERT INTO edges (edge_id, type, from_node_id, to_node_id, attributes) VALUES (?, ?, ?, ?, ?)",
-            (edge_id, "PaymentFlow", final_vendor_id, job_node_id, json.dumps(edge_attrs))
-        )
+        # Create Edge
+        if invoice_data.get('job_id'):
+            job_node_id = f"node:job:{invoice_data['job_id']}"
+            ingest_service.create_payment_edge(final_vendor_id, job_node_id, invoice_data)
+
+        # Update Task Status
+        database.execute_db("UPDATE reconciliation_queue SET status = 'resolved' WHERE task_id = ?", (task_id,))
 
-    # Update Task Status
-    database.execute_db("UPDATE reconciliation_queue SET status = 'resolved' WHERE task_id = ?", (task_id,))
-    
     return {"status": "resolved", "vendor_node": final_vendor_id}
 
 # --- Enhanced Endpoints (M4+) ---
@@ -299,6 +575,13 @@ def get_edge_details(edge_id: str):
     """
     Get detailed information about an edge, including all invoices that contributed to it.
     """
+    return response_cache.cached(
+        "edge_details", {"edge_id": edge_id}, lambda: _edge_details(edge_id),
+        tags=lambda details: [("edge", edge_id), ("node", details["from_node"]), ("node", details["to_node"])]
+        + [("invoice", invoice["invoice_id"]) for invoice in details["invoices"]]
+    )
+
+def _edge_details(edge_id: str) -> Dict[str, Any]:
     edge_row = database.query_db("SELECT * FROM edges WHERE edge_id = ?", (edge_id,), one=True)
     if not edge_row:
         raise HTTPException(status_code=404, detail="Edge not found")
@@ -452,27 +735,56 @@ def reject_merge(proposal_id: int, rejected_by: str, reason: str):
 @app.post("/api/graph/layout")
 def save_layout(layouts: List[GraphLayout]):
     """
-    Save graph node positions.
+    Save graph node positions in one transaction.
     """
-    for layout in layouts:
-        database.execute_db(
-            """
-            INSERT OR REPLACE INTO graph_layouts (user_id, node_id, position_x, position_y, updated_at)
-            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """,
-            (layout.user_id, layout.node_id, layout.position_x, layout.position_y)
-        )
+    with database.transaction():
+        for user_id in {layout.user_id for layout in layouts}:
+            graph_layout.save_positions(user_id, (
+                (layout.node_id, layout.position_x, layout.position_y)
+                for layout in layouts if layout.user_id == user_id
+            ))
     return {"status": "saved", "count": len(layouts)}
 
+@app.post("/api/graph/layout/delta")
+def save_layout_delta(delta: GraphLayoutDelta):
+    """
+    Save packed positions, writing only nodes that moved more than `threshold`.
+    """
+    try:
+        result = graph_layout.save_layout_delta(delta.user_id, delta.node_ids, delta.positions, delta.threshold)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "saved", **result}
+
+@app.post("/api/graph/layout/compute")
+def compute_layout(background_tasks: BackgroundTasks, full: bool = False):
+    """
+    Precompute the server layout (user_id "server") in the background.
+    Incremental unless `full`; progress is reported by /api/graph/layout/status.
+    """
+    background_tasks.add_task(graph_layout.schedule_relayout, full)
+    return {"status": "scheduled", "user_id": graph_layout.LAYOUT_USER, "full": full}
+
+@app.get("/api/graph/layout/status")
+def get_layout_status():
+    return graph_layout.get_layout_status()
+
 @app.get("/api/graph/layout")
-def get_layout(user_id: str = "default"):
+def get_layout(user_id: str = "default", format: str = "json", since: Optional[str] = None):
     """
-    Get saved graph layout for a user.
+    Get saved graph layout for a user. format=packed returns parallel
+    node_ids/positions arrays; `since` (a previous as_of) returns only changes.
     """
-    rows = database.query_db(
-        "SELECT node_id, position_x, position_y FROM graph_layouts WHERE user_id = ?",
-        (user_id,)
-    )
+    if format == "packed":
+        return graph_layout.get_packed_layout(user_id, since)
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'packed'")
+    query = "SELECT node_id, position_x, position_y FROM graph_layouts WHERE user_id = ?"
+    args = [user_id]
+    if since:
+        query += " AND updated_at >= ?"
+        args.append(since)
+    rows = database.query_db(query, tuple(args))
     return [dict(row) for row in rows]
 
 # Metrics & Monitoring
@@ -482,7 +794,26 @@ def get_metrics():
     """
     Get system metrics for monitoring.
     """
-    # Real-time stats
+    # Graph counts only change with the graph version
+    counts = response_cache.cached("metrics", {}, _metric_counts, versioned=True)
+    
+    return {
+        **counts,
+        "database": {
+            "pool": database.get_pool_stats()
+        },
+        "resolution": {
+            "vendor_index": resolution.get_index_stats()
+        },
+        "graph_summary": graph_summary.get_cache_stats(),
+        "graph_engine": graph_engine.get_engine_stats(),
+        "graph_layout": graph_layout.get_layout_status(),
+        "response_cache": response_cache.get_cache_stats(),
+        "single_flight": single_flight.get_stats(),
+        "audit_writer": audit.get_writer_stats()
+    }
+
+def _metric_counts() -> Dict[str, Any]:
     node_count = database.query_db("SELECT COUNT(*) as cnt FROM nodes", one=True)
     edge_count = database.query_db("SELECT COUNT(*) as cnt FROM edges", one=True)
     invoice_count = database.query_db("SELECT COUNT(*) as cnt FROM invoices", one=True)
@@ -494,7 +825,6 @@ def get_metrics():
         "SELECT COUNT(*) as cnt FROM merge_proposals WHERE status = 'pending'",
         one=True
     )
-    
     return {
         "nodes": {
             "total": node_count['cnt']
@@ -513,49 +843,70 @@ def get_metrics():
         }
     }
 
+@app.get("/api/analytics/top-nodes")
+def get_top_nodes(type: str = "Vendor", order_by: str = "outflow_total", limit: int = 10):
+    """
+    Nodes with the largest flow totals, read from node_stats.
+    """
+    # Clamped before keying, so out-of-range limits share one entry
+    limit = max(1, min(limit, 1000))
+    try:
+        return single_flight.do_versioned(
+            ("top_nodes", type, order_by, limit), lambda: node_stats.get_top_nodes(type, order_by, limit)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/export/csv")
 def export_csv(
     entity_type: str = "edges",
     date_start: Optional[str] = None,
-    date_end: Optional[str] = None
+    date_end: Optional[str] = None,
+    gzip: bool = False
 ):
     """
-    Export data as CSV (for now, returns JSON - frontend can convert).
+    Stream an export as CSV (see /api/export/{entity_type}).
     """
-    import csv
-    from io import StringIO
-    
-    if entity_type == "edges":
-        query = "SELECT * FROM edges WHERE 1=1"
-        args = []
-        
-        if date_start:
-            query += " AND json_extract(attributes, '$.date') >= ?"
-            args.append(date_start)
-        if date_end:
-            query += " AND json_extract(attributes, '$.date') <= ?"
-            args.append(date_end)
-        
-        rows = database.query_db(query, tuple(args))
-        
-        # Convert to CSV-friendly format
-        data = []
-        for row in rows:
-            attrs = json.loads(row['attributes'])
-            data.append({
-                "edge_id": row['edge_id'],
-                "type": row['type'],
-                "from_node": row['from_node_id'],
-                "to_node": row['to_node_id'],
-                "amount": attrs.get('amount', 0),
-                "currency": attrs.get('currency', 'USD'),
-                "date": attrs.get('date', ''),
-                "status": attrs.get('status', '')
-            })
-        
-        return {"data": data, "format": "json"}  # Frontend can convert to CSV
-    
-    return {"error": "Unsupported entity type"}
+    return export_entity(entity_type, "csv", date_start, date_end, gzip)
+
+@app.get("/api/export/{entity_type}")
+def export_entity(
+    entity_type: str,
+    format: str = "csv",
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    gzip: bool = False
+):
+    """
+    Stream edges, nodes, invoices or audit_logs as CSV (optionally gzipped),
+    Parquet or an Arrow IPC stream, batch by batch off the database cursor.
+    """
+    if entity_type not in export_service.ENTITIES:
+        raise HTTPException(status_code=400, detail=f"Unsupported entity type '{entity_type}'")
+    if format not in export_service.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+
+    if format == "csv":
+        headers = {"Content-Disposition": f'attachment; filename="{entity_type}.csv"'}
+        if gzip:
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(
+            export_service.stream_csv(entity_type, date_start, date_end, compress=gzip),
+            media_type="text/csv", headers=headers
+        )
+
+    try:
+        stream = export_service.stream_arrow(entity_type, date_start, date_end, format)
+    except export_service.ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    extension, media_type = {
+        "parquet": ("parquet", "application/vnd.apache.parquet"),
+        "arrow": ("arrows", "application/vnd.apache.arrow.stream"),
+    }[format]
+    return StreamingResponse(
+        stream, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{entity_type}.{extension}"'}
+    )
 
 @app.post("/api/ingest/mock")
 def ingest_mock_data():
@@ -577,7 +928,7 @@ def ingest_mock_data():
         "INSERT OR REPLACE INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
         ("node:vendor:12345", "Vendor", json.dumps(vendor_attrs))
     )
-    
+
     # 2. Create Job Node
     job_attrs = {
         "job_id": "8899",
@@ -588,7 +939,7 @@ def ingest_mock_data():
         "INSERT OR REPLACE INTO nodes (node_id, type, attributes) VALUES (?, ?, ?)",
         ("node:job:8899", "Job", json.dumps(job_attrs))
     )
-    
+
     # 3. Create Edge (Payment Flow)
     edge_attrs = {
         "amount": 12500.50,
@@ -603,7 +954,9 @@ def ingest_mock_data():
         "INSERT OR REPLACE INTO edges (edge_id, type, from_node_id, to_node_id, attributes) VALUES (?, ?, ?, ?, ?)",
         ("edge:txn:98765", "PaymentFlow", "node:vendor:12345", "node:job:8899", json.dumps(edge_attrs))
     )
-    
+    resolution.sync_vendor_aliases()
+    response_cache.invalidate(nodes=["node:vendor:12345", "node:job:8899"], edges=["edge:txn:98765"])
+
     return {"status": "seeded", "message": "Mock data ingested successfully"}
 
 if __name__ == "__main__":
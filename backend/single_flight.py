@@ -0,0 +1,84 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+The first request for a key runs the computation; requests for the same
+key that arrive while it is running wait for it and share its result (or
+its exception) instead of repeating the scan. Nothing is kept once the
+computation finishes; response_cache.py does the caching.
+
+Keys for graph reads include the graph_version (do_versioned), so a
+request that starts after a committed write never joins a computation
+that began before it.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import database
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                self.executed += 1
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self.calls),
+                "max_waiters": self.max_waiters
+            }
+
+_flights = SingleFlight()
+
+def do(key: Hashable, fn: Callable[[], Any]) -> Any:
+    """Run `fn`, or wait for the identical call already running."""
+    return _flights.do(key, fn)
+
+def do_versioned(key: Hashable, fn: Callable[[], Any]) -> Any:
+    """`do` for reads of graph tables, scoped to the current graph_version."""
+    return _flights.do((key, database.get_graph_version()), fn)
+
+def get_stats() -> Dict[str, Any]:
+    return _flights.stats()
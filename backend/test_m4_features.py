@@ -2,6 +2,9 @@
 Comprehensive test for all M4+ features.
 """
 import requests
+import csv
+import gzip
+import io
 import json
 
 API_BASE = "http://localhost:8002/api"
@@ -108,9 +111,32 @@ def test_metrics():
 def test_export():
     print("\n=== Testing Export Endpoint ===")
     res = requests.get(f"{API_BASE}/export/csv?entity_type=edges&date_start=2025-01-01&date_end=2025-12-31")
-    export_data = res.json()
-    print(f"Exported {len(export_data['data'])} records")
-    print(f"Sample: {export_data['data'][0] if export_data['data'] else 'None'}")
+    assert res.status_code == 200
+    assert res.headers["Content-Type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    print(f"Exported {len(rows)} records")
+    print(f"Sample: {rows[0] if rows else 'None'}")
+    assert all("2025-01-01" <= row["date"] <= "2025-12-31" for row in rows)
+
+    # Gzipped: the raw body is a gzip stream of the same CSV
+    res = requests.get(f"{API_BASE}/export/csv?entity_type=edges&date_start=2025-01-01&date_end=2025-12-31&gzip=true", stream=True)
+    assert res.headers["Content-Encoding"] == "gzip"
+    body = gzip.decompress(res.raw.read(decode_content=False)).decode("utf-8")
+    assert list(csv.DictReader(io.StringIO(body))) == rows
+    print(f"Gzipped export matches ({len(body)} bytes uncompressed)")
+
+    expected_columns = {
+        "nodes": ["node_id", "type", "name", "status", "attributes", "created_at"],
+        "invoices": ["invoice_id", "source", "source_id", "vendor_node_id", "job_node_id", "amount",
+                     "currency", "invoice_date", "status", "cost_codes", "description", "edge_id", "created_at"],
+        "audit_logs": ["log_id", "action", "actor", "target_id", "details", "timestamp"],
+    }
+    for entity, columns in expected_columns.items():
+        res = requests.get(f"{API_BASE}/export/{entity}?format=csv")
+        assert res.status_code == 200
+        reader = csv.DictReader(io.StringIO(res.text))
+        assert reader.fieldnames == columns
+        print(f"{entity}: exported {len(list(reader))} records")
 
 if __name__ == "__main__":
     print("🚀 APW Ontology - M4+ Comprehensive Test Suite\n")
@@ -0,0 +1,51 @@
+"""
+The suite runs against a fresh database in a temp directory, shared by
+the whole session, with the app started (migrations, warm-up) through
+TestClient. Tests create their own uniquely named vendors and jobs, so
+they do not depend on each other's data.
+"""
+import os
+import uuid
+
+import pytest
+
+import database
+
+@pytest.fixture(scope="session", autouse=True)
+def db_path(tmp_path_factory):
+    root = tmp_path_factory.mktemp("ontology")
+    previous = database.DB_PATH
+    database.DB_PATH = str(root / "ontology.db")
+    os.environ["INGEST_ROOT"] = str(root / "imports")
+    database.init_db()
+    yield database.DB_PATH
+    database.close_pool()
+    database.DB_PATH = previous
+
+@pytest.fixture(scope="session")
+def client(db_path):
+    from fastapi.testclient import TestClient
+    import server
+
+    with TestClient(server.app) as client:
+        yield client
+
+@pytest.fixture
+def ingest(client):
+    """POST one invoice; returns the response body. Vendor and job default to new ones."""
+    def ingest(vendor_name=None, amount=100.0, job_id=None, **fields):
+        invoice = {
+            "source": "TEST",
+            "source_id": uuid.uuid4().hex,
+            "vendor_name": vendor_name or uuid.uuid4().hex,
+            "amount": amount,
+            "date": "2025-06-01",
+            "job_id": job_id or uuid.uuid4().hex[:8],
+            **fields
+        }
+        res = client.post("/api/ingest/invoice", json=invoice)
+        assert res.status_code == 200, res.text
+        body = res.json()
+        body["invoice"] = invoice
+        return body
+    return ingest
@@ -0,0 +1,91 @@
+import sqlite3
+import uuid
+
+import pytest
+
+import audit
+import database
+
+def _logged(target_id):
+    return [row['action'] for row in database.query_db(
+        "SELECT action FROM audit_logs WHERE target_id = ? ORDER BY log_id", (target_id,)
+    )]
+
+@pytest.fixture
+def target():
+    return f"test:{uuid.uuid4().hex}"
+
+def test_durable_record_is_committed_on_return(db_path, target):
+    audit.log_action("DURABLE", "user:test", target, {})
+    assert _logged(target) == ["DURABLE"]
+
+def test_async_records_are_committed_by_flush(db_path, target):
+    audit.log_actions([("ASYNC", "system", target, {"i": i}) for i in range(50)], durable=False)
+    audit.flush()
+    assert _logged(target) == ["ASYNC"] * 50
+    assert audit.get_writer_stats()["pending"] == 0
+
+def test_records_commit_with_their_transaction(db_path, target):
+    with database.transaction():
+        audit.log_action("DURABLE", "user:test", target, {})
+        audit.log_action("ASYNC", "system", target, {}, durable=False)
+        # The durable record is part of the transaction; the other waits for its commit
+        assert _logged(target) == ["DURABLE"]
+    audit.flush()
+    assert sorted(_logged(target)) == ["ASYNC", "DURABLE"]
+
+def test_rolled_back_records_are_dropped(db_path, target):
+    with pytest.raises(RuntimeError):
+        with database.transaction():
+            audit.log_action("DURABLE", "user:test", target, {})
+            audit.log_action("ASYNC", "system", target, {}, durable=False)
+            raise RuntimeError("abort")
+    audit.flush()
+    assert _logged(target) == []
+
+def test_history_includes_queued_records(client, target):
+    audit.log_action("ASYNC", "system", target, {}, durable=False)
+    history = client.get(f"/api/graph/node/{target}/history").json()
+    assert [entry["action"] for entry in history] == ["ASYNC"]
+
+def test_sync_mode_writes_inline(db_path, target, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_WRITER_MODE", "sync")
+    audit.log_action("SYNC", "system", target, {}, durable=False)
+    assert _logged(target) == ["SYNC"]
+
+def test_failed_batch_surfaces_error(db_path, target, monkeypatch):
+    writer = audit.AuditWriter()
+    monkeypatch.setattr(audit, "INSERT_SQL", audit.INSERT_SQL.replace("audit_logs", "audit_logs_missing"))
+    record = ("FAILS", "user:test", target, "{}", "2025-01-01T00:00:00")
+
+    # Durable callers get the batch's error
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit([record], wait=True)
+    # A failed asynchronous batch is logged and counted, not thrown at later callers
+    writer.submit([record])
+    writer.flush()
+    assert writer.stats()["last_error"].startswith("OperationalError")
+    # Unless the caller asks for the outcome of the batch it waited for
+    writer.submit([record])
+    with pytest.raises(sqlite3.OperationalError):
+        writer.flush(raise_errors=True)
+
+    stats = writer.stats()
+    assert stats["records_failed"] == 3
+    assert stats["records_written"] == 0
+    assert stats["pending"] == 0
+
+    # The writer keeps going once the database accepts records again
+    monkeypatch.undo()
+    writer.submit([record], wait=True)
+    assert _logged(target) == ["FAILS"]
+
+def test_history_ignores_unrelated_failures(client, target, monkeypatch):
+    monkeypatch.setattr(audit, "INSERT_SQL", audit.INSERT_SQL.replace("audit_logs", "audit_logs_missing"))
+    audit.log_action("FAILS", "system", "test:other", {}, durable=False)
+    audit.flush()
+    monkeypatch.undo()
+    audit.log_action("DURABLE", "user:test", target, {})
+    res = client.get(f"/api/graph/node/{target}/history")
+    assert res.status_code == 200
+    assert [entry["action"] for entry in res.json()] == ["DURABLE"]
@@ -0,0 +1,58 @@
+import uuid
+
+import database
+
+def _record(vendor_name, job_id, amount=100.0, **fields):
+    return {
+        "source": "TEST", "source_id": uuid.uuid4().hex, "vendor_name": vendor_name,
+        "amount": amount, "date": "2025-06-01", "job_id": job_id, **fields
+    }
+
+def _batch(client, records, chunk_size=2):
+    res = client.post("/api/ingest/invoices/batch", json=records, params={"chunk_size": chunk_size})
+    assert res.status_code == 200, res.text
+    return res.json()
+
+def test_batch_matches_a_sequential_load(client, ingest):
+    existing = ingest()
+    name, job = uuid.uuid4().hex[:20], uuid.uuid4().hex[:8]
+    duplicate = _record(name, job)
+    records = [
+        _record(name, job, amount=10.0),
+        _record(existing["invoice"]["vendor_name"], job),
+        {"vendor_name": "missing required fields"},
+        _record(name, job, amount=20.0),
+        duplicate,
+        dict(duplicate),
+        # One token, three characters changed from a vendor created earlier in this batch
+        _record(name[:17] + "xyz", job),
+    ]
+    body = _batch(client, records)
+    results = body["results"]
+
+    assert [result["index"] for result in results] == list(range(len(records)))
+    assert body["summary"] == {"total": 7, "ingested": 4, "queued": 1, "failed": 2}
+    # The name is created once; later records reuse it, as they would one by one
+    assert results[0]["match_type"] == "NEW"
+    assert results[3]["match_type"] == results[4]["match_type"] == "AUTO"
+    assert results[0]["vendor_node"] == results[3]["vendor_node"] == results[4]["vendor_node"]
+    assert results[1]["vendor_node"] == existing["vendor_node"]
+    assert results[2]["status"] == "failed"
+    assert results[5]["status"] == "failed" and "duplicate invoice" in results[5]["error"]
+    assert results[6]["status"] == "queued" and results[6]["candidate_id"] == results[0]["vendor_node"]
+
+    vendors = database.query_db(
+        "SELECT COUNT(*) AS n FROM nodes WHERE type = 'Vendor' AND json_extract(attributes, '$.name') = ?",
+        (name,), one=True
+    )
+    assert vendors["n"] == 1
+    edges = database.query_db(
+        "SELECT COUNT(*) AS n, SUM(amount) AS total FROM edges WHERE to_node_id = ?", (f"node:job:{job}",), one=True
+    )
+    assert (edges["n"], edges["total"]) == (4, 230.0)
+
+def test_batch_rerun_reports_duplicates(client):
+    records = [_record(uuid.uuid4().hex, uuid.uuid4().hex[:8]) for _ in range(3)]
+    assert _batch(client, records)["summary"]["ingested"] == 3
+    # Invoice ids come from source and source_id, so a replay writes nothing
+    assert _batch(client, records)["summary"] == {"total": 3, "ingested": 0, "queued": 0, "failed": 3}
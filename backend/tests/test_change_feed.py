@@ -0,0 +1,84 @@
+import asyncio
+
+import change_feed
+
+def _changes(client, since, limit=None):
+    params = {"since": since}
+    if limit:
+        params["limit"] = limit
+    res = client.get("/api/graph/changes", params=params)
+    assert res.status_code == 200
+    return res.json()
+
+def test_changes_are_ordered_and_complete(client, ingest):
+    since = change_feed.latest_seq()
+    body = ingest()
+    page = _changes(client, since)
+    seqs = [change["seq"] for change in page["changes"]]
+    assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+    assert seqs[0] > since
+    assert page["last_seq"] == seqs[-1]
+    assert not page["has_more"] and not page["reset"]
+
+    created = {(change["entity"], change["id"]) for change in page["changes"] if change["op"] == "create"}
+    assert ("node", body["vendor_node"]) in created
+    assert ("edge", body["edge_id"]) in created
+    edge = next(change for change in page["changes"] if change["id"] == body["edge_id"])
+    assert edge["data"]["from_node"] == body["vendor_node"]
+
+    # Nothing new: same cursor back, no changes
+    assert _changes(client, page["last_seq"]) == {
+        "changes": [], "last_seq": page["last_seq"], "has_more": False, "reset": False
+    }
+
+def test_paging_returns_the_same_sequence(client, ingest):
+    since = change_feed.latest_seq()
+    for _ in range(3):
+        ingest()
+    full = [change["seq"] for change in _changes(client, since)["changes"]]
+
+    paged, cursor = [], since
+    while True:
+        page = _changes(client, cursor, limit=2)
+        paged += [change["seq"] for change in page["changes"]]
+        cursor = page["last_seq"]
+        if not page["has_more"]:
+            break
+    assert paged == full
+
+def test_merge_is_recorded(client, ingest):
+    survivor, victim = ingest(), ingest()
+    since = change_feed.latest_seq()
+    client.post("/api/graph/merge", json={
+        "survivor_id": survivor["vendor_node"], "victim_id": victim["vendor_node"], "reason": "duplicate"
+    })
+    changes = _changes(client, since)["changes"]
+    merge = next(change for change in changes if change["op"] == "merge")
+    assert merge["id"] == victim["vendor_node"]
+    assert merge["data"]["attributes"]["merged_into"] == survivor["vendor_node"]
+    moved = [change for change in changes if change["entity"] == "edge" and change["id"] == victim["edge_id"]]
+    assert moved[0]["op"] == "update" and moved[0]["data"]["from_node"] == survivor["vendor_node"]
+
+def test_reset_after_pruning(client, ingest):
+    stale = change_feed.latest_seq()
+    ingest()
+    recent = change_feed.latest_seq()
+    ingest()
+    # Keep only what came after `recent`
+    assert change_feed.prune(keep=change_feed.latest_seq() - recent) > 0
+
+    assert _changes(client, stale)["reset"] is True
+    page = _changes(client, recent)
+    assert page["reset"] is False
+    assert page["changes"][0]["seq"] == recent + 1
+
+def test_prune_runs_periodically(monkeypatch):
+    pruned = []
+    monkeypatch.setattr(change_feed, "prune", lambda: pruned.append(True))
+
+    async def run():
+        task = asyncio.create_task(change_feed.prune_periodically(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+    asyncio.run(run())
+    assert len(pruned) >= 2
@@ -0,0 +1,82 @@
+import uuid
+
+import pytest
+
+import ingest_service
+
+CONDITIONAL_PATHS = ["/api/graph/nodes", "/api/graph/edges", "/api/graph/snapshot", "/api/reconciliation/queue"]
+
+def _invoice_id(body):
+    return ingest_service.invoice_id_for(body["invoice"]["source"], body["invoice"]["source_id"])
+
+def _near_duplicate(ingest):
+    """Ingest a vendor, then a spelling close enough to queue a reconciliation task."""
+    name = uuid.uuid4().hex[:20]
+    # One token, three characters changed: ratio 85, between the candidate and auto thresholds
+    vendor = ingest(vendor_name=name)
+    queued = ingest(vendor_name=name[:17] + "xyz", job_id=vendor["invoice"]["job_id"])
+    assert queued["status"] == "queued"
+    return vendor
+
+def _propose(client, ingest):
+    res = client.post("/api/graph/merge/propose", json={
+        "survivor_id": ingest()["vendor_node"], "victim_ids": [ingest()["vendor_node"]], "reason": "duplicate"
+    })
+    return res.json()["proposal_id"]
+
+# Each write path, given the vendors it needs; they are created before the ETags are read
+WRITES = {
+    "ingest_invoice": (0, lambda client, ingest, bodies: ingest()),
+    "ingest_batch": (0, lambda client, ingest, bodies: client.post("/api/ingest/invoices/batch", json=[
+        {"source": "TEST", "source_id": uuid.uuid4().hex, "vendor_name": uuid.uuid4().hex,
+         "amount": 5.0, "date": "2025-06-03", "job_id": "batch"}
+    ])),
+    "merge": (2, lambda client, ingest, bodies: client.post("/api/graph/merge", json={
+        "survivor_id": bodies[0]["vendor_node"], "victim_id": bodies[1]["vendor_node"], "reason": "duplicate"
+    })),
+    "invoice_status": (1, lambda client, ingest, bodies: client.post(
+        f"/api/invoices/{_invoice_id(bodies[0])}/status", params={"new_status": "approved"}
+    )),
+    "attachment": (1, lambda client, ingest, bodies: client.post("/api/attachments", json={
+        "attachment_id": "", "source": "TEST", "source_id": uuid.uuid4().hex, "file_name": "scan.pdf",
+        "file_url": None, "file_size": 10, "mime_type": "application/pdf",
+        "related_to_type": "edge", "related_to_id": bodies[0]["edge_id"]
+    })),
+    "merge_proposal": (2, lambda client, ingest, bodies: client.post("/api/graph/merge/propose", json={
+        "survivor_id": bodies[0]["vendor_node"], "victim_ids": [bodies[1]["vendor_node"]], "reason": "duplicate"
+    })),
+    "reconciliation_queued": (0, lambda client, ingest, bodies: _near_duplicate(ingest)),
+}
+
+@pytest.mark.parametrize("write", sorted(WRITES))
+def test_every_write_changes_etags(client, ingest, write):
+    needed, perform = WRITES[write]
+    bodies = [ingest() for _ in range(needed)]
+    etags = {path: client.get(path).headers["ETag"] for path in CONDITIONAL_PATHS}
+    for path, etag in etags.items():
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    perform(client, ingest, bodies)
+
+    for path, etag in etags.items():
+        res = client.get(path, headers={"If-None-Match": etag})
+        assert res.status_code == 200, path
+        assert res.headers["ETag"] != etag
+
+def _assert_changes_etag(client, perform):
+    etag = client.get("/api/graph/edges").headers["ETag"]
+    assert perform().status_code == 200
+    assert client.get("/api/graph/edges", headers={"If-None-Match": etag}).status_code == 200
+
+def test_proposal_approval_changes_etag(client, ingest):
+    proposal_id = _propose(client, ingest)
+    _assert_changes_etag(client, lambda: client.post(
+        f"/api/graph/merge/proposals/{proposal_id}/approve", json={"approved_by": "user:approver"}
+    ))
+
+def test_reconciliation_resolve_changes_etag(client, ingest):
+    _near_duplicate(ingest)
+    task_id = max(task["task_id"] for task in client.get("/api/reconciliation/queue").json())
+    _assert_changes_etag(client, lambda: client.post(
+        f"/api/reconciliation/resolve/{task_id}", params={"action": "merge"}
+    ))
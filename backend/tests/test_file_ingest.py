@@ -0,0 +1,64 @@
+import json
+import os
+import uuid
+
+import pytest
+
+import database
+import file_ingest
+
+@pytest.fixture
+def export(client):
+    """An NDJSON export of 10 invoices (and one bad line) under the import root."""
+    root = file_ingest.import_root()
+    os.makedirs(root, exist_ok=True)
+    source = f"FILE-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(root, f"{source}.ndjson")
+    with open(path, "w") as f:
+        for i in range(10):
+            f.write(json.dumps({
+                "source": source, "source_id": str(i), "vendor_name": uuid.uuid4().hex,
+                "amount": 10.0 + i, "date": "2025-06-01", "job_id": source
+            }) + "\n")
+            if i == 4:
+                f.write("{not json\n")
+    return path, source
+
+def _invoices(source):
+    rows = database.query_db("SELECT source_id FROM invoices WHERE source = ?", (source,))
+    return sorted(int(row['source_id']) for row in rows)
+
+def test_resume_after_a_mid_file_failure(export, monkeypatch):
+    path, source = export
+    ingest_chunk = file_ingest._ingest_chunk
+    calls = []
+
+    def failing_chunk(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise RuntimeError("disk full")
+        return ingest_chunk(*args)
+    monkeypatch.setattr(file_ingest, "_ingest_chunk", failing_chunk)
+
+    with pytest.raises(RuntimeError):
+        file_ingest.ingest_file(path, chunk_size=3)
+    checkpoint = file_ingest.get_checkpoint(path)
+    assert checkpoint["status"] == "failed" and checkpoint["error"] == "disk full"
+    # Two chunks of three lines committed, the bad line among them
+    assert checkpoint["records_read"] == 6
+    assert _invoices(source) == [0, 1, 2, 3, 4]
+
+    monkeypatch.undo()
+    result = file_ingest.ingest_file(path, chunk_size=3)
+    assert result["status"] == "completed" and result["percent"] == 100.0
+    # Every record exactly once: nothing re-read, nothing skipped
+    assert (result["records_read"], result["ingested"], result["failed"]) == (11, 10, 1)
+    assert _invoices(source) == list(range(10))
+
+def test_api_paths_stay_under_the_import_root(client, export):
+    path, _ = export
+    assert client.post("/api/ingest/file", json={"path": "/etc/passwd"}).status_code == 403
+    res = client.post("/api/ingest/file", json={"path": os.path.basename(path)})
+    assert res.status_code == 200
+    status = client.get("/api/ingest/file/status", params={"path": os.path.basename(path)}).json()
+    assert status["status"] == "completed" and status["ingested"] == 10
@@ -0,0 +1,68 @@
+import uuid
+
+import numpy as np
+
+import graph_engine
+import graph_store
+
+def test_cheapest_path_keeps_its_hop_bound(ingest):
+    job, detour = uuid.uuid4().hex[:8], uuid.uuid4().hex[:8]
+    first = ingest(amount=10.0, job_id=job)
+    start = first["vendor_node"]
+    goal = ingest(amount=1000.0, job_id=job)["vendor_node"]
+    # start -> detour -> hub -> job is far cheaper than start -> job, but it
+    # only reaches the job in round 3, after the goal was reached through it
+    ingest(vendor_name=first["invoice"]["vendor_name"], amount=1e6, job_id=detour)
+    hub = ingest(amount=1e6, job_id=detour)
+    ingest(vendor_name=hub["invoice"]["vendor_name"], amount=1e6, job_id=job)
+
+    path = graph_engine.shortest_path(start, goal, weight="amount", max_hops=3)
+    assert path["nodes"] == [start, f"node:job:{job}", goal]
+    assert path["cost"] == sum(1.0 / edge["amount"] for edge in path["edges"])
+
+    # With a fourth hop the detour wins
+    path = graph_engine.shortest_path(start, goal, weight="amount", max_hops=4)
+    assert path["nodes"] == [start, f"node:job:{detour}", hub["vendor_node"], f"node:job:{job}", goal]
+    assert path["cost"] == sum(1.0 / edge["amount"] for edge in path["edges"])
+
+def test_limit_must_be_positive(client, ingest):
+    vendor = ingest()["vendor_node"]
+    for path in ("/api/graph/trace/bfs", "/api/graph/trace/flow"):
+        assert client.get(path, params={"node_id": vendor, "limit": 0}).status_code == 400
+
+def _worker():
+    """A second engine, as another uvicorn worker would hold."""
+    worker = graph_engine.GraphEngine()
+    with worker.lock:
+        worker.refresh()
+    return worker
+
+def _assert_same_graph(engine, other):
+    assert list(engine.node_ids) == list(other.node_ids)
+    assert list(engine.edge_ids) == list(other.edge_ids)
+    for name in graph_engine.ARRAY_COLUMNS:
+        assert np.array_equal(getattr(engine, name), getattr(other, name))
+
+def test_workers_share_the_published_file(ingest):
+    vendor = ingest()["vendor_node"]
+    graph_engine.bfs(vendor)
+    engine = graph_engine._engine
+
+    # A current file is mapped instead of read from the database
+    worker = _worker()
+    assert worker.stats["files_mapped"] == 1 and worker.stats["reloads"] == 0
+    assert worker.mapped.state == graph_store.GraphFile(graph_store.graph_file_path()).state
+    _assert_same_graph(engine, worker)
+    assert np.array_equal(worker.bfs(vendor)[0], engine.bfs(vendor)[0])
+
+    # After a write the stale file is not mapped; the worker catches up and
+    # publishes, and the first engine then maps that file
+    job = ingest()["invoice"]["job_id"]
+    ingest(job_id=job)
+    with worker.lock:
+        worker.refresh()
+    assert worker.stats["incremental_updates"] == 1 and worker.stats["files_published"] == 1
+    mapped = engine.stats["files_mapped"]
+    graph_engine.bfs(vendor)
+    assert engine.stats["files_mapped"] == mapped + 1
+    _assert_same_graph(engine, worker)
@@ -0,0 +1,62 @@
+import uuid
+
+import database
+import graph_layout
+
+def test_coalesced_full_request_is_kept(monkeypatch):
+    runs = []
+
+    def compute_layout(full):
+        runs.append(full)
+        if len(runs) == 1:
+            # Arrive while the first run is in progress
+            graph_layout.schedule_relayout(full=True)
+            graph_layout.schedule_relayout()
+    monkeypatch.setattr(graph_layout, "compute_layout", compute_layout)
+
+    graph_layout.schedule_relayout()
+    assert runs == [False, True]
+    status = graph_layout.get_layout_status()
+    assert not status["running"] and not status["pending_full"]
+
+def _delta(client, user_id, node_ids, positions, threshold=0.0):
+    res = client.post("/api/graph/layout/delta", json={
+        "user_id": user_id, "node_ids": node_ids, "positions": positions, "threshold": threshold
+    })
+    assert res.status_code == 200, res.text
+    return res.json()
+
+def _packed(client, user_id, since=None):
+    params = {"user_id": user_id, "format": "packed"}
+    if since:
+        params["since"] = since
+    return client.get("/api/graph/layout", params=params).json()
+
+def test_delta_skips_nodes_within_threshold(client):
+    user_id = f"test-{uuid.uuid4().hex}"
+    nodes = ["node:a", "node:b", "node:c"]
+    assert _delta(client, user_id, nodes, [0, 0, 10, 10, 20, 20])["saved"] == 3
+
+    # a moves 0.5, b moves 5, d has no stored position yet
+    result = _delta(client, user_id, nodes[:2] + ["node:d"], [0.3, 0.4, 13, 14, 30, 30], threshold=1.0)
+    assert (result["received"], result["saved"], result["skipped"]) == (3, 2, 1)
+
+    packed = _packed(client, user_id)
+    layout = dict(zip(packed["node_ids"], zip(packed["positions"][::2], packed["positions"][1::2])))
+    assert layout == {"node:a": (0, 0), "node:b": (13, 14), "node:c": (20, 20), "node:d": (30, 30)}
+    # The packed form carries the same rows as the JSON listing
+    rows = client.get("/api/graph/layout", params={"user_id": user_id}).json()
+    assert {row["node_id"]: (row["position_x"], row["position_y"]) for row in rows} == layout
+
+    # Only rows written after `since` come back
+    database.execute_db("UPDATE graph_layouts SET updated_at = '2000-01-01 00:00:00' WHERE user_id = ?", (user_id,))
+    _delta(client, user_id, ["node:b"], [50, 50], threshold=1.0)
+    changed = _packed(client, user_id, "2000-01-01 00:00:01")
+    assert (changed["node_ids"], changed["positions"]) == (["node:b"], [50, 50])
+    assert changed["as_of"] > "2000-01-01 00:00:01"
+
+def test_delta_rejects_mismatched_positions(client):
+    res = client.post("/api/graph/layout/delta", json={
+        "user_id": "test", "node_ids": ["node:a", "node:b"], "positions": [1, 2, 3]
+    })
+    assert res.status_code == 400
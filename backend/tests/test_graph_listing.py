@@ -0,0 +1,38 @@
+import json
+
+def test_pages_follow_the_cursor_header(client, ingest):
+    job_id = "listing"
+    for _ in range(3):
+        ingest(job_id=job_id)
+    everything = client.get("/api/graph/edges", params={"to_node": f"node:job:{job_id}"}).json()
+    assert len(everything) == 3
+
+    pages, after = [], None
+    while True:
+        params = {"to_node": f"node:job:{job_id}", "limit": 2}
+        if after:
+            params["after"] = after
+        res = client.get("/api/graph/edges", params=params)
+        pages += res.json()
+        after = res.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+    assert pages == everything
+
+def test_ndjson_streams_the_same_rows(client, ingest):
+    ingest(job_id="listing-ndjson")
+    params = {"to_node": "node:job:listing-ndjson"}
+    res = client.get("/api/graph/edges", params={**params, "format": "ndjson"})
+    assert res.headers["Content-Type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in res.text.splitlines()] == client.get("/api/graph/edges", params=params).json()
+
+def test_openapi_documents_both_formats(client):
+    spec = client.get("/openapi.json").json()
+    for path, model in (("/api/graph/nodes", "Node"), ("/api/graph/edges", "Edge")):
+        operation = spec["paths"][path]["get"]
+        response = operation["responses"]["200"]
+        assert response["content"]["application/json"]["schema"]["items"]["$ref"].endswith(f"/{model}")
+        assert "application/x-ndjson" in response["content"]
+        assert "X-Next-Cursor" in response["headers"]
+        documented = {param["name"] for param in operation["parameters"] if param.get("description")}
+        assert {"after", "limit", "format"} <= documented
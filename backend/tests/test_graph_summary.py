@@ -0,0 +1,38 @@
+import pytest
+
+import graph_summary
+
+def _assert_conserved(summary):
+    supernodes = summary["supernodes"]
+    assert sum(group["member_count"] for group in supernodes) == summary["node_count"]
+    links = sum(group["internal_edges"] for group in supernodes) + sum(edge["count"] for edge in summary["superedges"])
+    assert links == summary["edge_count"]
+
+# Groupings that do not depend on edges come out the same either way
+@pytest.mark.parametrize("group_by", ["type", "vendor_type"])
+def test_incremental_summary_matches_rebuild(client, ingest, group_by):
+    graph_summary.get_summary(group_by)
+    first = ingest(amount=50.0)
+    ingest(vendor_name=first["invoice"]["vendor_name"], amount=25.0)
+    ingest(amount=10.0, job_id=first["invoice"]["job_id"])
+
+    incremental = graph_summary.get_summary(group_by)
+    _assert_conserved(incremental)
+    assert incremental == graph_summary.get_summary(group_by, refresh=True)
+
+# Edge-driven groupings place new nodes greedily, so only totals are compared
+@pytest.mark.parametrize("group_by", ["job", "community"])
+def test_greedy_summary_conserves_nodes_and_flows(client, ingest, group_by):
+    graph_summary.get_summary(group_by)
+    first = ingest()
+    ingest(job_id=first["invoice"]["job_id"])
+    _assert_conserved(graph_summary.get_summary(group_by))
+
+    # A new vendor joins the group of the job it first paid into
+    group_id = graph_summary._get(group_by).node_group[first["vendor_node"]]
+    members = client.get("/api/graph/summary/members", params={"group_by": group_by, "group_id": group_id}).json()
+    assert f"node:job:{first['invoice']['job_id']}" in {node["node_id"] for node in members["nodes"]}
+    assert len(members["nodes"]) == members["group"]["member_count"]
+    assert len(members["edges"]) == members["group"]["internal_edges"]
+
+    _assert_conserved(graph_summary.get_summary(group_by, refresh=True))
@@ -0,0 +1,32 @@
+import random
+import uuid
+
+import graph_layout
+import graph_viewport
+
+def test_viewport_matches_a_bbox_scan(client, ingest):
+    user_id = f"test-{uuid.uuid4().hex}"
+    job_id = ingest()["invoice"]["job_id"]
+    nodes = [ingest(job_id=job_id)["vendor_node"] for _ in range(20)] + [f"node:job:{job_id}"]
+    rng = random.Random(7)
+    positions = {node_id: (rng.uniform(-100, 100), rng.uniform(-100, 100)) for node_id in nodes}
+    # One node exactly on the edge of the box, which is inclusive
+    positions[nodes[0]] = (10.0, -20.0)
+    graph_layout.save_positions(user_id, ((node_id, x, y) for node_id, (x, y) in positions.items()))
+
+    for box in [(-50, -20, 10, 60), (10, 60, -50, -20), (-100, -100, 100, 100), (200, 200, 300, 300)]:
+        view = graph_viewport.get_viewport(*box, user_id)
+        x0, x1 = sorted(box[0::2])
+        y0, y1 = sorted(box[1::2])
+        expected = {node_id for node_id, (x, y) in positions.items() if x0 <= x <= x1 and y0 <= y <= y1}
+        assert {node["node_id"] for node in view["nodes"]} == expected
+        for edge in view["edges"]:
+            assert edge["from_node"] in expected or edge["to_node"] in expected
+
+def test_viewport_caps_are_clamped(client, ingest):
+    user_id = f"test-{uuid.uuid4().hex}"
+    body = ingest()
+    graph_layout.save_positions(user_id, [(body["vendor_node"], 0.0, 0.0)])
+    view = graph_viewport.get_viewport(-1, -1, 1, 1, user_id, max_nodes=-5, max_edges=-5, edges_per_node=-5)
+    assert len(view["nodes"]) == 1
+    assert [edge["edge_id"] for edge in view["edges"]] == [body["edge_id"]]
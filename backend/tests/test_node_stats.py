@@ -0,0 +1,64 @@
+import json
+
+import database
+import ingest_service
+import node_stats
+
+def assert_consistent():
+    report = node_stats.verify_node_stats()
+    assert report["mismatches"] == []
+
+def test_ingest_keeps_stats_consistent(client, ingest):
+    job_id = "stats-ingest"
+    first = ingest(amount=120.5, job_id=job_id)
+    ingest(vendor_name=first["invoice"]["vendor_name"], amount=79.5, job_id=job_id)
+    assert_consistent()
+    stats = node_stats.get_node_stats(first["vendor_node"])
+    assert stats["outflow_total"] == 200.0
+    assert stats["outflow_count"] == 2
+
+    res = client.post("/api/ingest/invoices/batch", json=[
+        {"source": "TEST", "source_id": f"stats-batch-{i}", "vendor_name": first["invoice"]["vendor_name"],
+         "amount": 10.0, "date": "2025-06-02", "job_id": job_id}
+        for i in range(5)
+    ])
+    assert res.status_code == 200
+    assert_consistent()
+    assert node_stats.get_node_stats(first["vendor_node"])["outflow_total"] == 250.0
+
+def test_merge_keeps_stats_consistent(client, ingest):
+    survivor = ingest(amount=100.0)
+    victim = ingest(amount=300.0)
+    res = client.post("/api/graph/merge", json={
+        "survivor_id": survivor["vendor_node"], "victim_id": victim["vendor_node"], "reason": "duplicate"
+    })
+    assert res.status_code == 200
+    assert_consistent()
+    assert node_stats.get_node_stats(survivor["vendor_node"])["outflow_total"] == 400.0
+    assert node_stats.get_node_stats(victim["vendor_node"])["outflow_count"] == 0
+
+def test_status_changes_keep_stats_consistent(client, ingest):
+    body = ingest(amount=42.0)
+    invoice_id = ingest_service.invoice_id_for(body["invoice"]["source"], body["invoice"]["source_id"])
+    res = client.post(f"/api/invoices/{invoice_id}/status", params={"new_status": "approved"})
+    assert res.status_code == 200
+    assert_consistent()
+
+    # Status and amount live in the edge's JSON; rewriting it fires the update trigger
+    edge = database.query_db("SELECT attributes FROM edges WHERE edge_id = ?", (body["edge_id"],), one=True)
+    attrs = json.loads(edge["attributes"])
+    attrs.update(status="void", amount=40.0)
+    database.execute_db("UPDATE edges SET attributes = ? WHERE edge_id = ?", (json.dumps(attrs), body["edge_id"]))
+    assert_consistent()
+    assert node_stats.get_node_stats(body["vendor_node"])["outflow_total"] == 40.0
+
+    database.execute_db("DELETE FROM edges WHERE edge_id = ?", (body["edge_id"],))
+    assert_consistent()
+
+def test_top_nodes_limit_is_clamped(client, ingest):
+    ingest()
+    ingest()
+    for limit in (-1, 0, 1):
+        res = client.get("/api/analytics/top-nodes", params={"limit": limit})
+        assert res.status_code == 200
+        assert len(res.json()) == 1
@@ -0,0 +1,53 @@
+import uuid
+
+import ingest_service
+import response_cache
+
+def test_edge_details_follow_invoice_and_attachment_writes(client, ingest):
+    body = ingest()
+    path = f"/api/graph/edge/{body['edge_id']}/details"
+    assert client.get(path).json()["invoices"][0]["status"] == "unapproved"
+    hits = response_cache.get_cache_stats()["hits"]
+    client.get(path)
+    assert response_cache.get_cache_stats()["hits"] == hits + 1
+
+    invoice_id = ingest_service.invoice_id_for(body["invoice"]["source"], body["invoice"]["source_id"])
+    client.post(f"/api/invoices/{invoice_id}/status", params={"new_status": "approved"})
+    assert client.get(path).json()["invoices"][0]["status"] == "approved"
+
+    client.post("/api/attachments", json={
+        "attachment_id": "", "source": "TEST", "source_id": uuid.uuid4().hex, "file_name": "scan.pdf",
+        "file_url": None, "file_size": 10, "mime_type": "application/pdf",
+        "related_to_type": "edge", "related_to_id": body["edge_id"]
+    })
+    assert len(client.get(path).json()["attachments"]) == 1
+
+def test_node_and_edge_details_follow_merge(client, ingest):
+    survivor = ingest(amount=10.0)
+    victim = ingest(amount=20.0)
+    victim_edge = f"/api/graph/edge/{victim['edge_id']}/details"
+    assert client.get(victim_edge).json()["from_node"] == victim["vendor_node"]
+    assert client.get(f"/api/graph/node/{victim['vendor_node']}").json()["attributes"]["status"] == "active"
+    assert client.get(f"/api/graph/node/{survivor['vendor_node']}").json()["attributes"]["stats"]["total_outflow"] == 10.0
+
+    client.post("/api/graph/merge", json={
+        "survivor_id": survivor["vendor_node"], "victim_id": victim["vendor_node"], "reason": "duplicate"
+    })
+
+    assert client.get(victim_edge).json()["from_node"] == survivor["vendor_node"]
+    assert client.get(f"/api/graph/node/{victim['vendor_node']}").json()["attributes"]["status"] == "merged"
+    assert client.get(f"/api/graph/node/{survivor['vendor_node']}").json()["attributes"]["stats"]["total_outflow"] == 30.0
+
+def test_node_details_follow_new_edges(client, ingest):
+    first = ingest(amount=10.0)
+    path = f"/api/graph/node/{first['vendor_node']}"
+    assert client.get(path).json()["attributes"]["stats"]["outflow_count"] == 1
+    ingest(vendor_name=first["invoice"]["vendor_name"], amount=5.0)
+    assert client.get(path).json()["attributes"]["stats"]["outflow_count"] == 2
+
+def test_metric_counts_follow_writes(client, ingest):
+    before = client.get("/api/metrics").json()
+    ingest()
+    after = client.get("/api/metrics").json()
+    assert after["edges"]["total"] == before["edges"]["total"] + 1
+    assert after["invoices"]["total"] == before["invoices"]["total"] + 1
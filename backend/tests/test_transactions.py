@@ -0,0 +1,83 @@
+import uuid
+
+import pytest
+
+import database
+
+def _meta(key):
+    row = database.query_db("SELECT value FROM graph_meta WHERE key = ?", (key,), one=True)
+    return row['value'] if row else None
+
+def _set_meta(key, value):
+    database.execute_db("INSERT OR REPLACE INTO graph_meta (key, value) VALUES (?, ?)", (key, value))
+
+def test_on_commit_runs_after_commit():
+    ran = []
+    with database.transaction():
+        _set_meta("test_commit", 1)
+        database.on_commit(lambda: ran.append(_meta("test_commit")))
+        assert ran == []
+    # The hook sees the committed write
+    assert ran == [1]
+
+def test_on_commit_outside_transaction_runs_immediately():
+    ran = []
+    database.on_commit(lambda: ran.append(True))
+    assert ran == [True]
+
+def test_rolled_back_savepoint_drops_its_hooks():
+    ran = []
+    with database.transaction():
+        _set_meta("test_outer", 1)
+        database.on_commit(lambda: ran.append("outer"))
+        with pytest.raises(RuntimeError):
+            with database.transaction():
+                _set_meta("test_inner", 1)
+                database.on_commit(lambda: ran.append("inner"))
+                with database.transaction():
+                    database.on_commit(lambda: ran.append("nested"))
+                raise RuntimeError("inner failure")
+        database.on_commit(lambda: ran.append("after"))
+    assert ran == ["outer", "after"]
+    assert _meta("test_outer") == 1
+    assert _meta("test_inner") is None
+
+def test_released_savepoint_keeps_its_hooks():
+    ran = []
+    with database.transaction():
+        with database.transaction():
+            database.on_commit(lambda: ran.append("inner"))
+    assert ran == ["inner"]
+
+def test_outer_rollback_drops_every_hook():
+    ran = []
+    with pytest.raises(RuntimeError):
+        with database.transaction():
+            _set_meta("test_rolled_back", 1)
+            database.on_commit(lambda: ran.append("outer"))
+            with database.transaction():
+                database.on_commit(lambda: ran.append("inner"))
+            raise RuntimeError("outer failure")
+    assert ran == []
+    assert _meta("test_rolled_back") is None
+    assert not database.in_transaction()
+
+def test_execute_db_rowcount():
+    for i in range(3):
+        _set_meta(f"test_rowcount_{i}", 0)
+    updated = database.execute_db("UPDATE graph_meta SET value = 1 WHERE key LIKE 'test_rowcount_%'", rowcount=True)
+    assert updated == 3
+
+def test_task_resolves_once(client, ingest):
+    name = uuid.uuid4().hex[:20]
+    vendor = ingest(vendor_name=name)
+    assert ingest(vendor_name=name[:17] + "xyz", job_id=vendor["invoice"]["job_id"])["status"] == "queued"
+    task_id = database.query_db("SELECT MAX(task_id) AS id FROM reconciliation_queue", one=True)["id"]
+
+    resolve = lambda: client.post(f"/api/reconciliation/resolve/{task_id}", params={"action": "merge"})
+    assert resolve().status_code == 200
+    # A second resolve is refused and writes nothing
+    assert resolve().status_code == 409
+    edges = database.query_db("SELECT COUNT(*) AS n FROM edges WHERE from_node_id = ?", (vendor["vendor_node"],), one=True)
+    assert edges["n"] == 2
+    assert client.post("/api/reconciliation/resolve/999999999", params={"action": "merge"}).status_code == 404
@@ -0,0 +1,101 @@
+import uuid
+
+import pytest
+
+import database
+import ingest_service
+import resolution
+
+def _best_match(name):
+    with resolution._index.lock:
+        resolution._index.ensure_current()
+        return resolution._index.best_match(name)
+
+@pytest.fixture
+def index_stats(client):
+    # Build the index first, so later writes must patch rather than rebuild it
+    _best_match("warm up")
+    return resolution.get_index_stats()
+
+def test_insert_patches_index(ingest, index_stats):
+    body = ingest()
+    stats = resolution.get_index_stats()
+    assert stats["version"] == resolution.get_vendor_version()
+    assert stats["rebuilds"] == index_stats["rebuilds"]
+    assert stats["incremental_updates"] > index_stats["incremental_updates"]
+    assert _best_match(body["invoice"]["vendor_name"]) == (body["vendor_node"], 100.0)
+
+def test_merge_redirects_victim_names(client, ingest, index_stats):
+    survivor = ingest()
+    victim = ingest()
+    res = client.post("/api/graph/merge", json={
+        "survivor_id": survivor["vendor_node"], "victim_id": victim["vendor_node"], "reason": "duplicate"
+    })
+    assert res.status_code == 200
+    stats = resolution.get_index_stats()
+    assert stats["version"] == resolution.get_vendor_version()
+    assert stats["rebuilds"] == index_stats["rebuilds"]
+    assert _best_match(victim["invoice"]["vendor_name"]) == (survivor["vendor_node"], 100.0)
+
+def test_rollback_leaves_index_untouched(ingest, index_stats):
+    name = uuid.uuid4().hex
+    version = resolution.get_vendor_version()
+    with pytest.raises(RuntimeError):
+        with database.transaction():
+            ingest_service.create_vendor_node(name)
+            raise RuntimeError("abort ingest")
+    stats = resolution.get_index_stats()
+    assert resolution.get_vendor_version() == version
+    assert stats["version"] == version
+    assert stats["incremental_updates"] == index_stats["incremental_updates"]
+    assert name not in resolution._index.choices
+
+    # Still in step with the database for the next write
+    body = ingest()
+    assert resolution.get_index_stats()["rebuilds"] == index_stats["rebuilds"]
+    assert _best_match(body["invoice"]["vendor_name"]) == (body["vendor_node"], 100.0)
+
+@pytest.fixture
+def blocked_index(monkeypatch):
+    # Score a single blocked candidate, so the highest trigram overlap wins blocking
+    monkeypatch.setattr(resolution, "BLOCKING_MIN_CHOICES", 1)
+    monkeypatch.setattr(resolution, "BLOCKING_CANDIDATES", 1)
+    return resolution.VendorIndex()
+
+def test_candidate_band_is_confirmed(blocked_index):
+    # "northwind tra" shares more trigrams with the query but scores lower
+    blocked_index.add("decoy", ["northwind tra"])
+    blocked_index.add("target", ["nrthwind tradrs"])
+    match_id, score = blocked_index.best_match("northwind traders")
+    assert match_id == "target" and score == pytest.approx(93.75)
+    assert blocked_index.stats["confirmed_lookups"] == 1
+    recall = resolution.check_blocking_recall(["northwind traders"], blocked_index)
+    assert recall["recall"] == 1.0
+
+def test_blocking_miss_is_reported(blocked_index):
+    # The blocked best is below the candidate threshold, so it is not confirmed
+    blocked_index.add("decoy", ["northwind traxxxxx"])
+    blocked_index.add("target", ["nxrthwxnd trxders"])
+    recall = resolution.check_blocking_recall(["northwind traders"], blocked_index)
+    assert recall["recall"] == 0.0
+    [mismatch] = recall["mismatches"]
+    assert mismatch["blocked"][:2] == (None, "NEW")
+    assert mismatch["exhaustive"][:2] == ("target", "CANDIDATE")
+
+def test_batch_resolution_matches_single_lookups(client, ingest):
+    name = uuid.uuid4().hex[:20]
+    vendor = ingest(vendor_name=name)["vendor_node"]
+    names = [
+        name,                      # exact alias key
+        name.upper() + " Inc",     # same normalized key
+        name[:17] + "xyz",         # candidate (ratio 85)
+        name[:19] + "x",           # auto (ratio 95)
+        uuid.uuid4().hex,          # new
+        name,                      # repeated
+    ]
+    batch = resolution.resolve_vendors_batch(names)
+    assert list(batch) == list(dict.fromkeys(names))
+    for query in names:
+        assert batch[query] == resolution.resolve_vendor(query)
+    assert [batch[query][1] for query in names[:5]] == ["AUTO", "AUTO", "CANDIDATE", "AUTO", "NEW"]
+    assert batch[name][0] == vendor
@@ -98,3 +98,104 @@ export const manualMerge = async (survivorId: string, victimId: string, reason:
   });
   return response.data;
 };
+
+// Layout persistence: packed [x0, y0, x1, y1, ...] positions
+export interface PackedLayout {
+  user_id: string;
+  count: number;
+  as_of: string | null;
+  node_ids: string[];
+  positions: number[];
+}
+
+export const fetchLayout = async (userId = 'default', since?: string) => {
+  const params = new URLSearchParams({ user_id: userId, format: 'packed' });
+  if (since) params.append('since', since);
+  const response = await axios.get<PackedLayout>(`${API_URL}/graph/layout?${params.toString()}`);
+  return response.data;
+};
+
+// Sends only positions that moved more than `threshold` since they were last
+// saved (tracked in `saved`, which is updated); the server applies the same filter
+export const saveLayoutDelta = async (
+  positions: Record<string, { x: number; y: number }>,
+  saved: Record<string, { x: number; y: number }> = {},
+  threshold = 1,
+  userId = 'default'
+) => {
+  const nodeIds = Object.keys(positions).filter(id => {
+    const prev = saved[id];
+    return !prev || Math.hypot(positions[id].x - prev.x, positions[id].y - prev.y) > threshold;
+  });
+  if (nodeIds.length === 0) {
+    return { status: 'saved', received: 0, saved: 0, skipped: 0 };
+  }
+  const packed = new Array<number>(nodeIds.length * 2);
+  nodeIds.forEach((id, i) => {
+    packed[2 * i] = positions[id].x;
+    packed[2 * i + 1] = positions[id].y;
+  });
+  const response = await axios.post(`${API_URL}/graph/layout/delta`, {
+    user_id: userId,
+    node_ids: nodeIds,
+    positions: packed,
+    threshold,
+  });
+  nodeIds.forEach(id => {
+    saved[id] = { ...positions[id] };
+  });
+  return response.data;
+};
+
+// Nodes (with x/y) and incident edges inside a box of a saved layout
+export const fetchViewport = async (
+  box: { x0: number; y0: number; x1: number; y1: number },
+  userId = 'server',
+  maxNodes?: number
+) => {
+  const params = new URLSearchParams({
+    x0: box.x0.toString(), y0: box.y0.toString(), x1: box.x1.toString(), y1: box.y1.toString(),
+    user_id: userId,
+  });
+  if (maxNodes !== undefined) params.append('max_nodes', maxNodes.toString());
+  const response = await axios.get(`${API_URL}/graph/viewport?${params.toString()}`);
+  return response.data;
+};
+
+export interface GraphChange {
+  seq: number;
+  entity: 'node' | 'edge';
+  op: 'create' | 'update' | 'delete' | 'merge';
+  id: string;
+  at: string;
+  data: any | null; // current node/edge, null once deleted
+}
+
+export interface ChangePage {
+  changes: GraphChange[];
+  last_seq: number;
+  has_more: boolean;
+  reset: boolean; // `since` was pruned from the log; reload the graph
+}
+
+// Delta sync: omit `since` to get the current position before a full load
+export const fetchChanges = async (since?: number, limit?: number): Promise<ChangePage> => {
+  const params = new URLSearchParams();
+  if (since !== undefined) params.append('since', since.toString());
+  if (limit !== undefined) params.append('limit', limit.toString());
+  const response = await axios.get(`${API_URL}/graph/changes?${params.toString()}`);
+  return response.data;
+};
+
+// Live push over Server-Sent Events; returns a function that closes the stream
+export const subscribeChanges = (
+  since: number | undefined,
+  onChanges: (page: ChangePage) => void,
+  onReset?: () => void
+) => {
+  const query = since !== undefined ? `?since=${since}` : '';
+  const source = new EventSource(`${API_URL}/graph/changes/stream${query}`);
+  source.addEventListener('changes', event => onChanges(JSON.parse((event as MessageEvent).data)));
+  if (onReset) source.addEventListener('reset', () => onReset());
+  return () => source.close();
+};
@@ -0,0 +1,105 @@
+import axios from 'axios';
+
+const API_URL = 'http://localhost:8002/api';
+
+// Decoder for GET /api/graph/snapshot (layout documented in backend/graph_snapshot.py)
+
+interface SnapshotColumn {
+  name: string;
+  dtype: string;
+  offset: number;
+  length: number;
+}
+
+interface SnapshotHeader {
+  node_count: number;
+  edge_count: number;
+  dropped_edges: number;
+  node_types: string[];
+  edge_types: string[];
+  fields: string[];
+  columns: SnapshotColumn[];
+}
+
+export interface GraphSnapshot {
+  nodeCount: number;
+  edgeCount: number;
+  nodeTypes: string[];
+  edgeTypes: string[];
+  nodeIds: string[];
+  nodeType: Uint8Array;
+  nodeSize: Float32Array;
+  edgeSource: Int32Array;
+  edgeTarget: Int32Array;
+  edgeType: Uint8Array;
+  edgeAmount: Float32Array;
+  edgeIds?: string[];
+  // Projected node attributes, one string per node
+  nodeFields: Record<string, string[]>;
+}
+
+const ARRAY_TYPES: Record<string, any> = {
+  uint8: Uint8Array,
+  uint32: Uint32Array,
+  int32: Int32Array,
+  float32: Float32Array,
+};
+
+export const decodeGraphSnapshot = (buffer: ArrayBuffer): GraphSnapshot => {
+  const view = new DataView(buffer);
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+  if (magic !== 'APWG') {
+    throw new Error('Not a graph snapshot');
+  }
+  const headerLength = view.getUint32(8, true);
+  const header: SnapshotHeader = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+  const base = 12 + headerLength;
+
+  const columns: Record<string, any> = {};
+  header.columns.forEach(col => {
+    // Columns are 8-byte aligned, so these are zero-copy views
+    columns[col.name] = new ARRAY_TYPES[col.dtype](buffer, base + col.offset, col.length);
+  });
+
+  const decoder = new TextDecoder();
+  const strings = (name: string): string[] => {
+    const offsets: Uint32Array = columns[`${name}.offsets`];
+    const data: Uint8Array = columns[`${name}.data`];
+    const out = new Array<string>(offsets.length - 1);
+    for (let i = 0; i < out.length; i++) {
+      out[i] = decoder.decode(data.subarray(offsets[i], offsets[i + 1]));
+    }
+    return out;
+  };
+
+  const nodeFields: Record<string, string[]> = {};
+  header.fields.forEach(field => {
+    nodeFields[field] = strings(`node.${field}`);
+  });
+
+  return {
+    nodeCount: header.node_count,
+    edgeCount: header.edge_count,
+    nodeTypes: header.node_types,
+    edgeTypes: header.edge_types,
+    nodeIds: strings('node_id'),
+    nodeType: columns['node_type'],
+    nodeSize: columns['node_size'],
+    edgeSource: columns['edge_source'],
+    edgeTarget: columns['edge_target'],
+    edgeType: columns['edge_type'],
+    edgeAmount: columns['edge_amount'],
+    edgeIds: columns['edge_id.offsets'] ? strings('edge_id') : undefined,
+    nodeFields,
+  };
+};
+
+export const fetchGraphSnapshot = async (fields: string[] = ['name'], edgeIds = false) => {
+  const params = new URLSearchParams();
+  if (fields.length) params.append('fields', fields.join(','));
+  if (edgeIds) params.append('edge_ids', 'true');
+  const response = await axios.get<ArrayBuffer>(`${API_URL}/graph/snapshot?${params.toString()}`, {
+    responseType: 'arraybuffer',
+  });
+  return decodeGraphSnapshot(response.data);
+};